@@ -1,8 +1,10 @@
-from pydantic import BaseModel
-from typing import Optional
-
-class ExtractRequest(BaseModel):
-    url: Optional[str] = None
-    filename: Optional[str] = None
-
-__all__ = ["ExtractRequest"]
+from pydantic import BaseModel
+from typing import Optional
+
+class ExtractRequest(BaseModel):
+    url: Optional[str] = None
+    filename: Optional[str] = None
+    # File under SHARED_UPLOAD_DIR, relative to it (see /extract-ref)
+    path: Optional[str] = None
+
+__all__ = ["ExtractRequest"]
@@ -1,4 +1,4 @@
-from .Request import ExtractRequest
-from .Response import ExtractResponse
-
-__all__ = ["ExtractRequest", "ExtractResponse"]
+from .Request import ExtractRequest
+from .Response import ExtractResponse
+
+__all__ = ["ExtractRequest", "ExtractResponse"]
@@ -0,0 +1,63 @@
+"""
+Benchmark the tesseract CLI (pytesseract, one process per page) against the
+in-process tesserocr engine (see ocr_backend.py).
+
+Usage (from extraction_agent/):
+    python -m benchmarks.ocr_backend path/to/report_cards [--dpi 300] [--repeat 3]
+
+Runs single-pass OCR over the same pages with both backends and reports
+pages per second and whether the extracted text matches, so OCR_BACKEND
+can be checked on real samples before switching.
+"""
+import argparse
+import time
+from pathlib import Path
+from typing import List, Tuple
+
+from PIL import Image
+
+from benchmarks.ocr_single_pass import load_pages
+from ocr_backend import OcrBackend, get_backend
+from utils import text_from_ocr_data
+
+
+def run(backend: OcrBackend, pages: List[Image.Image], language: str, repeat: int) -> Tuple[float, List[str]]:
+    texts: List[str] = []
+    start = time.perf_counter()
+    for _ in range(repeat):
+        texts = [text_from_ocr_data(backend.image_to_data(page, language))[0] for page in pages]
+    return time.perf_counter() - start, texts
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("sample_dir", type=Path)
+    parser.add_argument("--dpi", type=int, default=300)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--lang", default="eng")
+    args = parser.parse_args()
+
+    pages = load_pages(args.sample_dir, args.dpi)
+    if not pages:
+        raise SystemExit(f"No PDF or image files found in {args.sample_dir}")
+    cli = get_backend("pytesseract")
+    engine = get_backend("tesserocr")
+    if engine.name != "tesserocr":
+        raise SystemExit("tesserocr is not installed or has no language data (set TESSDATA_PREFIX)")
+
+    # Warm-up: the first tesserocr call loads the model
+    engine.image_to_data(pages[0], args.lang)
+
+    processed = len(pages) * args.repeat
+    cli_seconds, cli_texts = run(cli, pages, args.lang, args.repeat)
+    engine_seconds, engine_texts = run(engine, pages, args.lang, args.repeat)
+    same = sum(a == b for a, b in zip(cli_texts, engine_texts))
+
+    print(f"pages: {len(pages)} x {args.repeat}   tesseract {engine.version()}")
+    print(f"pytesseract  {cli_seconds:7.2f} s  {processed / cli_seconds:6.2f} pages/s")
+    print(f"tesserocr    {engine_seconds:7.2f} s  {processed / engine_seconds:6.2f} pages/s")
+    print(f"speedup:     {cli_seconds / engine_seconds:.2f}x   identical text on {same}/{len(pages)} pages")
+
+
+if __name__ == "__main__":
+    main()
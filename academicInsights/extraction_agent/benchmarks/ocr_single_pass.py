@@ -0,0 +1,67 @@
+"""
+Benchmark single-pass OCR against the previous two-pass path
+(image_to_string + image_to_data on every page).
+
+Usage (from extraction_agent/):
+    python -m benchmarks.ocr_single_pass path/to/report_cards [--dpi 300] [--repeat 3]
+
+The sample directory should hold a fixed set of scanned report cards
+(.pdf / .png / .jpg / .tiff) so runs are comparable over time.
+"""
+import argparse
+import time
+from pathlib import Path
+from typing import List
+
+from pdf2image import convert_from_path
+from PIL import Image
+
+from utils import ocr_image
+
+IMAGE_SUFFIXES = {'.png', '.jpg', '.jpeg', '.tiff', '.bmp'}
+
+
+def load_pages(sample_dir: Path, dpi: int) -> List[Image.Image]:
+    pages: List[Image.Image] = []
+    for path in sorted(sample_dir.iterdir()):
+        suffix = path.suffix.lower()
+        if suffix == '.pdf':
+            pages.extend(convert_from_path(path, dpi=dpi))
+        elif suffix in IMAGE_SUFFIXES:
+            pages.append(Image.open(path).copy())
+    return pages
+
+
+def run(pages: List[Image.Image], single_pass: bool, language: str, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for page in pages:
+            ocr_image(page, language=language, single_pass=single_pass)
+    elapsed = time.perf_counter() - start
+    return (len(pages) * repeat) / elapsed if elapsed else 0.0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("sample_dir", type=Path)
+    parser.add_argument("--dpi", type=int, default=300)
+    parser.add_argument("--lang", default="eng")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    pages = load_pages(args.sample_dir, args.dpi)
+    if not pages:
+        raise SystemExit(f"No PDF or image files found in {args.sample_dir}")
+
+    two_pass = run(pages, single_pass=False, language=args.lang, repeat=args.repeat)
+    single_pass = run(pages, single_pass=True, language=args.lang, repeat=args.repeat)
+
+    print(f"pages:        {len(pages)} x {args.repeat}")
+    print(f"two-pass:     {two_pass:.2f} pages/s")
+    print(f"single-pass:  {single_pass:.2f} pages/s")
+    if two_pass:
+        print(f"speedup:      {single_pass / two_pass:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
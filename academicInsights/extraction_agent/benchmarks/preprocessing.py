@@ -0,0 +1,69 @@
+"""
+Benchmark OCR on raw page images against the preprocessing pipeline
+(grayscale / crop / deskew / scale / binarize, see preprocessing.py).
+
+Usage (from extraction_agent/):
+    python -m benchmarks.preprocessing path/to/report_cards [--steps default] [--x-height 20] [--dpi 300]
+
+Reports total OCR time (preprocessing included), mean word confidence and
+pixels per page for both runs, so a step list can be checked against a
+fixed sample set before it is enabled with OCR_PREPROCESS.
+"""
+import argparse
+import time
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+from PIL import Image
+
+from benchmarks.ocr_single_pass import load_pages
+from preprocessing import PreprocessOptions, preprocess
+from utils import ocr_image
+
+
+def run(pages: List[Image.Image], options: Optional[PreprocessOptions], language: str) -> Tuple[float, Optional[float], float]:
+    confs: List[float] = []
+    pixels = 0
+    start = time.perf_counter()
+    for page in pages:
+        image = preprocess(page, options)[0] if options else page
+        pixels += image.width * image.height
+        confs.extend(ocr_image(image, language=language)[1])
+    elapsed = time.perf_counter() - start
+    mean_conf = sum(confs) / len(confs) if confs else None
+    return elapsed, mean_conf, pixels / len(pages)
+
+
+def report(name: str, elapsed: float, mean_conf: Optional[float], pixels: float, pages: int) -> None:
+    conf = f"{mean_conf:5.1f}" if mean_conf is not None else "  n/a"
+    print(f"{name:<14} {elapsed:7.2f} s  {elapsed / pages:6.2f} s/page  conf {conf}  {pixels / 1e6:5.2f} MP/page")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("sample_dir", type=Path)
+    parser.add_argument("--steps", default="default", help="OCR_PREPROCESS-style step list")
+    parser.add_argument("--x-height", type=int, default=20)
+    parser.add_argument("--dpi", type=int, default=300)
+    parser.add_argument("--lang", default="eng")
+    args = parser.parse_args()
+
+    pages = load_pages(args.sample_dir, args.dpi)
+    if not pages:
+        raise SystemExit(f"No PDF or image files found in {args.sample_dir}")
+    options = PreprocessOptions.parse(args.steps, target_x_height=args.x_height)
+    if options is None:
+        raise SystemExit("--steps selects no preprocessing steps")
+
+    raw = run(pages, None, args.lang)
+    processed = run(pages, options, args.lang)
+
+    print(f"pages: {len(pages)}   steps: {', '.join(options.steps)}")
+    report("raw", *raw, len(pages))
+    report("preprocessed", *processed, len(pages))
+    if processed[0]:
+        print(f"speedup:       {raw[0] / processed[0]:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,53 +1,262 @@
-import logging
-from fastapi import APIRouter, UploadFile, File, HTTPException, status
-from fastapi.responses import JSONResponse
-from services.extraction_service import ExtractionService
-
-router = APIRouter()
-logger = logging.getLogger(__name__)
-
-service = ExtractionService()
-
-
-@router.post("/extract")
-async def extract_document(file: UploadFile = File(...)) -> JSONResponse:
-    try:
-        from pathlib import Path
-        import tempfile, shutil
-
-        file_extension = Path(file.filename).suffix.lower()
-        supported = {'.pdf', '.png', '.jpg', '.jpeg', '.tiff', '.bmp'}
-        if file_extension not in supported:
-            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Unsupported file type: {file_extension}")
-
-        with tempfile.NamedTemporaryFile(delete=False, suffix=file_extension) as temp_file:
-            temp_path = Path(temp_file.name)
-            shutil.copyfileobj(file.file, temp_file)
-
-        result = await service.extract(temp_path, file.filename)
-        try:
-            temp_path.unlink()
-        except Exception:
-            logger.exception("Failed to remove temp file")
-
-        return JSONResponse(content=result, status_code=status.HTTP_200_OK)
-
-    except HTTPException:
-        raise
-    except Exception as e:
-        logger.exception("Error extracting document: %s", e)
-        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
-    finally:
-        await file.close()
-
-
-@router.post("/extract-batch")
-async def extract_batch(files: list[UploadFile] = File(...)) -> JSONResponse:
-    results = []
-    for file in files:
-        try:
-            res = await extract_document(file)
-            results.append(res.body if hasattr(res, 'body') else res)
-        except Exception as e:
-            results.append({"filename": getattr(file, 'filename', None), "status": "error", "error": str(e)})
-    return JSONResponse(content={"results": results}, status_code=status.HTTP_200_OK)
+import asyncio
+import json
+import logging
+import shutil
+import tempfile
+from pathlib import Path
+from typing import Optional
+from fastapi import APIRouter, UploadFile, File, HTTPException, Request, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, StreamingResponse
+from Models import ExtractRequest
+from services.extraction_service import ExtractionService
+from worker_pool import WorkerPoolFull
+
+router = APIRouter()
+logger = logging.getLogger(__name__)
+
+service = ExtractionService()
+
+SUPPORTED_EXTENSIONS = {'.pdf', '.png', '.jpg', '.jpeg', '.tiff', '.bmp'}
+
+
+def _copy_to_temp(file: UploadFile, suffix: str) -> Path:
+    with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as temp_file:
+        shutil.copyfileobj(file.file, temp_file)
+        return Path(temp_file.name)
+
+
+def _check_extension(filename: str) -> str:
+    file_extension = Path(filename).suffix.lower()
+    if file_extension not in SUPPORTED_EXTENSIONS:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Unsupported file type: {file_extension}")
+    return file_extension
+
+
+async def _save_upload(file: UploadFile) -> Path:
+    file_extension = _check_extension(file.filename)
+    return await run_in_threadpool(_copy_to_temp, file, file_extension)
+
+
+async def _save_body(request: Request, suffix: str) -> Path:
+    """Write the raw request body to a temp file chunk by chunk as it arrives."""
+    temp_file = await run_in_threadpool(tempfile.NamedTemporaryFile, delete=False, suffix=suffix)
+    try:
+        async for chunk in request.stream():
+            if chunk:
+                await run_in_threadpool(temp_file.write, chunk)
+    except BaseException:
+        temp_file.close()
+        _remove_temp(Path(temp_file.name))
+        raise
+    temp_file.close()
+    return Path(temp_file.name)
+
+
+def _shared_path(relative_path: str) -> Path:
+    base = service.shared_upload_dir
+    if base is None:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="SHARED_UPLOAD_DIR is not configured")
+    path = (base / relative_path).resolve()
+    if not path.is_relative_to(base):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="path must stay inside SHARED_UPLOAD_DIR")
+    if not path.is_file():
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"No such file: {relative_path}")
+    return path
+
+
+def _remove_temp(temp_path: Path) -> None:
+    try:
+        temp_path.unlink(missing_ok=True)
+    except Exception:
+        logger.exception("Failed to remove temp file")
+
+
+def _extract_temp(temp_path: Path, filename: str, **kwargs) -> "asyncio.Task":
+    """
+    Start extracting an uploaded temp file; the file is removed from the
+    task's done-callback. The task only finishes once the OCR worker thread
+    has, so callers await it through asyncio.shield: a disconnected client
+    then stops waiting, but never deletes a file a worker is still reading
+    (the result is still cached).
+    """
+    task = asyncio.create_task(service.extract(temp_path, filename, **kwargs))
+
+    def done(task: asyncio.Task) -> None:
+        _remove_temp(temp_path)
+        # Mark a failure as seen; a caller that went away cannot report it
+        if not task.cancelled():
+            task.exception()
+
+    task.add_done_callback(done)
+    return task
+
+
+@router.post("/extract")
+async def extract_document(file: UploadFile = File(...)) -> JSONResponse:
+    try:
+        temp_path = await _save_upload(file)
+        result = await asyncio.shield(_extract_temp(temp_path, file.filename))
+        return JSONResponse(content=result, status_code=status.HTTP_200_OK)
+
+    except HTTPException:
+        raise
+    except WorkerPoolFull as e:
+        logger.warning("Rejecting %s: %s", file.filename, e)
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(e), headers={"Retry-After": "5"})
+    except Exception as e:
+        logger.exception("Error extracting document: %s", e)
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
+    finally:
+        await file.close()
+
+
+@router.post("/extract-raw")
+async def extract_raw(request: Request, filename: str) -> JSONResponse:
+    """
+    Extract a document sent as the raw request body (no multipart), with
+    its name in the `filename` query parameter. The body is streamed
+    straight to disk, so large uploads are never held in memory.
+    """
+    try:
+        temp_path = await _save_body(request, _check_extension(filename))
+        result = await asyncio.shield(_extract_temp(temp_path, filename))
+        return JSONResponse(content=result, status_code=status.HTTP_200_OK)
+    except HTTPException:
+        raise
+    except WorkerPoolFull as e:
+        logger.warning("Rejecting %s: %s", filename, e)
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(e), headers={"Retry-After": "5"})
+    except Exception as e:
+        logger.exception("Error extracting document: %s", e)
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
+
+
+@router.post("/extract-ref")
+async def extract_reference(payload: ExtractRequest) -> JSONResponse:
+    """
+    Extract a file the caller already wrote to the shared volume. `path` is
+    relative to SHARED_UPLOAD_DIR; the file is read in place and left for
+    the caller to delete.
+    """
+    if not payload.path:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Provide 'path'")
+    filename = payload.filename or Path(payload.path).name
+    _check_extension(filename)
+    try:
+        result = await service.extract(_shared_path(payload.path), filename)
+        return JSONResponse(content=result, status_code=status.HTTP_200_OK)
+    except HTTPException:
+        raise
+    except WorkerPoolFull as e:
+        logger.warning("Rejecting %s: %s", filename, e)
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(e), headers={"Retry-After": "5"})
+    except Exception as e:
+        logger.exception("Error extracting document: %s", e)
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
+
+
+@router.post("/extract-stream")
+async def extract_stream(request: Request, filename: str, path: Optional[str] = None) -> StreamingResponse:
+    """
+    Extract one document and stream NDJSON events while it is OCR'd, so the
+    caller can start on early pages while later ones are still running:
+
+        {"event": "page", "page": 1, "text": ..., "confidence": ..., ...}
+        ...
+        {"event": "result", ...ExtractResponse}   or   {"event": "error", "status": 503, "error": ...}
+
+    The document is the raw request body (as for /extract-raw), or `path`
+    relative to SHARED_UPLOAD_DIR (as for /extract-ref). Cached documents
+    produce no page events, only the result.
+    """
+    suffix = _check_extension(filename)
+    loop = asyncio.get_running_loop()
+    events: asyncio.Queue = asyncio.Queue()
+
+    def on_page(page):
+        loop.call_soon_threadsafe(events.put_nowait, {"event": "page", **page})
+
+    # Extraction starts here rather than in the generator, so an uploaded
+    # temp file is removed even if the response never starts streaming
+    if path:
+        task = asyncio.create_task(service.extract(_shared_path(path), filename, on_page=on_page))
+    else:
+        task = _extract_temp(await _save_body(request, suffix), filename, on_page=on_page)
+    # Page events are queued from the OCR thread before the task can finish
+    task.add_done_callback(lambda _: events.put_nowait(None))
+
+    async def stream_events():
+        # On client disconnect OCR carries on (its result is still cached)
+        # and a temp file is removed once it is done, see _extract_temp
+        while (event := await events.get()) is not None:
+            yield json.dumps(event, default=str) + "\n"
+        try:
+            yield json.dumps({"event": "result", **task.result()}, default=str) + "\n"
+        except WorkerPoolFull as e:
+            logger.warning("Rejecting %s: %s", filename, e)
+            yield json.dumps({"event": "error", "status": status.HTTP_503_SERVICE_UNAVAILABLE, "error": str(e)}) + "\n"
+        except Exception as e:
+            logger.exception("Error extracting document: %s", e)
+            yield json.dumps({"event": "error", "status": status.HTTP_500_INTERNAL_SERVER_ERROR, "error": str(e)}) + "\n"
+
+    return StreamingResponse(stream_events(), media_type="application/x-ndjson")
+
+
+@router.post("/extract-batch")
+async def extract_batch(files: list[UploadFile] = File(...)) -> StreamingResponse:
+    """
+    Extract several files concurrently (up to BATCH_CONCURRENCY at a time)
+    and stream one NDJSON line per file as soon as it finishes. Lines carry
+    the file's position in the upload as 'index' since they arrive out of order.
+    """
+    saved = []
+    for index, file in enumerate(files):
+        try:
+            saved.append((index, file.filename, await _save_upload(file), None))
+        except HTTPException as e:
+            saved.append((index, file.filename, None, e.detail))
+        except Exception as e:
+            logger.exception("Failed to store upload %s", file.filename)
+            saved.append((index, file.filename, None, str(e)))
+        finally:
+            await file.close()
+
+    semaphore = asyncio.Semaphore(service.batch_concurrency)
+
+    async def extract_one(index, filename, temp_path, error):
+        if temp_path is None:
+            return {"index": index, "filename": filename, "status": "error", "error": error}
+        task = None
+        try:
+            async with semaphore:
+                task = _extract_temp(temp_path, filename)
+                result = await asyncio.shield(task)
+            return {"index": index, **result}
+        except Exception as e:
+            logger.exception("Batch extraction failed for %s", filename)
+            return {"index": index, "filename": filename, "status": "error", "error": str(e)}
+        finally:
+            # Never started (e.g. cancelled while waiting for a slot): nothing reads the file
+            if task is None:
+                _remove_temp(temp_path)
+
+    # Started before the response so every temp file is cleaned up even if
+    # the response never starts streaming
+    tasks = [asyncio.create_task(extract_one(*item)) for item in saved]
+
+    async def stream_results():
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield json.dumps(await next_done, default=str) + "\n"
+        finally:
+            # Files still being OCR'd are removed by their extraction task
+            for task in tasks:
+                task.cancel()
+
+    return StreamingResponse(stream_results(), media_type="application/x-ndjson")
+
+
+@router.get("/stats")
+async def stats() -> JSONResponse:
+    return JSONResponse(content=service.stats(), status_code=status.HTTP_200_OK)
@@ -0,0 +1,173 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Bump when the shape of cached ExtractResponse payloads changes.
+CACHE_SCHEMA_VERSION = 2
+
+
+def file_digest(path: Path, chunk_size: int = 1024 * 1024) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def cache_key(content_digest: str, **settings: Any) -> str:
+    """
+    Build the cache key from the file's SHA-256 and every OCR setting that
+    can change the output (DPI, language, Tesseract version, ...).
+    """
+    parts = [f"v{CACHE_SCHEMA_VERSION}", content_digest]
+    parts.extend(f"{name}={settings[name]}" for name in sorted(settings))
+    return hashlib.sha256("|".join(parts).encode("utf-8")).hexdigest()
+
+
+class ExtractionCache:
+    """
+    Two-tier cache of extraction results.
+
+    - memory: LRU of up to `max_items` entries (0 disables it)
+    - disk: one JSON file per key under `directory`, evicted least recently
+      used first once the directory grows past `max_disk_bytes` (None
+      disables it). The directory is scanned once at startup; after that an
+      in-memory index of entry sizes in access order keeps the byte total,
+      so a store never lists the directory.
+
+    Methods block on disk I/O; call them from a worker thread.
+    """
+
+    def __init__(self, max_items: int = 256, directory: Optional[str] = None, max_disk_bytes: int = 512 * 1024 * 1024):
+        self.max_items = max(0, max_items)
+        self.max_disk_bytes = max_disk_bytes
+        self.directory = Path(directory) if directory else None
+
+        self._memory: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        # Disk entries (key -> size in bytes), least recently used first
+        self._disk: "OrderedDict[str, int]" = OrderedDict()
+        self._disk_bytes = 0
+        self._lock = threading.Lock()
+        self.counters = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+        if self.directory is not None:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            self._scan_disk()
+
+    def _scan_disk(self) -> None:
+        entries = []
+        for entry in os.scandir(self.directory):
+            if not entry.name.endswith(".json"):
+                continue
+            try:
+                st = entry.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((st.st_mtime, entry.name[:-len(".json")], st.st_size))
+        for _, key, size in sorted(entries):
+            self._disk[key] = size
+            self._disk_bytes += size
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self.counters[name] += 1
+
+    def _remember(self, key: str, value: Dict[str, Any]) -> None:
+        if not self.max_items:
+            return
+        with self._lock:
+            self._memory[key] = value
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_items:
+                self._memory.popitem(last=False)
+
+    def _disk_path(self, key: str) -> Path:
+        return self.directory / f"{key}.json"
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            value = self._memory.get(key)
+            if value is not None:
+                self._memory.move_to_end(key)
+                self.counters["memory_hits"] += 1
+                return value
+
+        if self.directory is not None:
+            path = self._disk_path(key)
+            try:
+                value = json.loads(path.read_text(encoding="utf-8"))
+                os.utime(path)
+            except FileNotFoundError:
+                value = None
+                self._forget_disk(key)
+            except Exception as e:
+                logger.warning("Dropping unreadable cache entry %s: %s", path, e)
+                path.unlink(missing_ok=True)
+                value = None
+                self._forget_disk(key)
+            if value is not None:
+                with self._lock:
+                    if key in self._disk:
+                        self._disk.move_to_end(key)
+                self._count("disk_hits")
+                self._remember(key, value)
+                return value
+
+        self._count("misses")
+        return None
+
+    def put(self, key: str, value: Dict[str, Any]) -> None:
+        self._remember(key, value)
+        self._count("stores")
+        if self.directory is None:
+            return
+        path = self._disk_path(key)
+        tmp = path.with_suffix(".tmp")
+        data = json.dumps(value, default=str).encode("utf-8")
+        try:
+            tmp.write_bytes(data)
+            tmp.replace(path)
+        except Exception as e:
+            logger.warning("Failed to write cache entry %s: %s", path, e)
+            tmp.unlink(missing_ok=True)
+            return
+        with self._lock:
+            self._disk_bytes += len(data) - self._disk.pop(key, 0)
+            self._disk[key] = len(data)
+        self._evict_disk()
+
+    def _forget_disk(self, key: str) -> None:
+        with self._lock:
+            self._disk_bytes -= self._disk.pop(key, 0)
+
+    def _evict_disk(self) -> None:
+        victims = []
+        with self._lock:
+            while self._disk_bytes > self.max_disk_bytes and len(self._disk) > 1:
+                key, size = self._disk.popitem(last=False)
+                self._disk_bytes -= size
+                victims.append(key)
+            self.counters["evictions"] += len(victims)
+        for key in victims:
+            self._disk_path(key).unlink(missing_ok=True)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counters = dict(self.counters)
+            memory_items = len(self._memory)
+        hits = counters["memory_hits"] + counters["disk_hits"]
+        lookups = hits + counters["misses"]
+        return {
+            **counters,
+            "hit_rate": round(hits / lookups, 3) if lookups else None,
+            "memory_items": memory_items,
+            "disk_enabled": self.directory is not None,
+            "disk_items": len(self._disk),
+            "disk_bytes": self._disk_bytes,
+        }
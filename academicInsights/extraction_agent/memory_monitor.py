@@ -0,0 +1,86 @@
+import os
+import resource
+import threading
+from pathlib import Path
+from typing import Iterator, Optional
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def _child_pids(pid: int) -> Iterator[int]:
+    for children in Path(f"/proc/{pid}/task").glob("*/children"):
+        try:
+            for child in children.read_text().split():
+                yield int(child)
+        except (OSError, ValueError):
+            continue
+
+
+def _rss_bytes(pid: int) -> int:
+    try:
+        with open(f"/proc/{pid}/statm") as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+def process_tree_rss() -> Optional[int]:
+    """
+    Resident memory of this process plus its descendants (OCR pool workers,
+    tesseract / pdftoppm subprocesses), or None where /proc is unavailable.
+    """
+    root = os.getpid()
+    if not Path(f"/proc/{root}/statm").exists():
+        return None
+    total = 0
+    stack = [root]
+    seen = set()
+    while stack:
+        pid = stack.pop()
+        if pid in seen:
+            continue
+        seen.add(pid)
+        total += _rss_bytes(pid)
+        stack.extend(_child_pids(pid))
+    return total
+
+
+class PeakMemoryMonitor:
+    """
+    Samples process-tree RSS in a background thread while a document is
+    processed. Documents processed concurrently share the same process tree,
+    so the peak is an upper bound for any single one of them.
+    """
+
+    def __init__(self, interval: float = 0.05):
+        self.interval = interval
+        self.peak_bytes = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _sample(self) -> None:
+        rss = process_tree_rss()
+        if rss is None:
+            # ru_maxrss is in KiB on Linux and covers the process lifetime
+            rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+        self.peak_bytes = max(self.peak_bytes, rss)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def __enter__(self) -> "PeakMemoryMonitor":
+        self._sample()
+        self._thread = threading.Thread(target=self._run, name="peak-memory", daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self._sample()
+
+    @property
+    def peak_mb(self) -> float:
+        return round(self.peak_bytes / (1024 * 1024), 1)
@@ -0,0 +1,170 @@
+import logging
+import os
+import threading
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, Optional
+
+import pytesseract
+from pytesseract import Output
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+OCR_BACKENDS = ("auto", "tesserocr", "pytesseract")
+
+# Column order of Tesseract's TSV output (pytesseract adds a header row,
+# tesserocr's GetTSVText does not)
+_TSV_COLUMNS = ("level", "page_num", "block_num", "par_num", "line_num", "word_num",
+                "left", "top", "width", "height", "conf", "text")
+
+# Where distro packages put traineddata files, newest first
+_TESSDATA_DIRS = (
+    "/usr/share/tesseract-ocr/5/tessdata",
+    "/usr/share/tesseract-ocr/4.00/tessdata",
+    "/usr/share/tessdata",
+    "/usr/local/share/tessdata",
+)
+
+
+class OcrBackend(ABC):
+    """
+    Tesseract entry points used by utils.ocr_image. image_to_data returns
+    the pytesseract Output.DICT shape (one list per TSV column).
+    """
+
+    name = "base"
+
+    @abstractmethod
+    def image_to_data(self, image: Image.Image, language: str) -> Dict[str, List[Any]]:
+        ...
+
+    @abstractmethod
+    def image_to_string(self, image: Image.Image, language: str) -> str:
+        ...
+
+    @abstractmethod
+    def version(self) -> str:
+        ...
+
+
+class PytesseractBackend(OcrBackend):
+    """Runs the tesseract CLI per call: writes a temp image, spawns a process, loads the model."""
+
+    name = "pytesseract"
+
+    def image_to_data(self, image: Image.Image, language: str) -> Dict[str, List[Any]]:
+        return pytesseract.image_to_data(image, lang=language, output_type=Output.DICT)
+
+    def image_to_string(self, image: Image.Image, language: str) -> str:
+        return pytesseract.image_to_string(image, lang=language)
+
+    def version(self) -> str:
+        return str(pytesseract.get_tesseract_version())
+
+
+def _tsv_to_dict(tsv: str) -> Dict[str, List[Any]]:
+    data: Dict[str, List[Any]] = {column: [] for column in _TSV_COLUMNS}
+    for row in tsv.splitlines():
+        cells = row.split("\t")
+        if len(cells) < len(_TSV_COLUMNS) - 1:
+            continue
+        if len(cells) < len(_TSV_COLUMNS):
+            cells.append("")
+        for column, cell in zip(_TSV_COLUMNS[:-1], cells):
+            try:
+                data[column].append(float(cell) if column == "conf" else int(cell))
+            except ValueError:
+                data[column].append(cell)
+        data["text"].append(cells[len(_TSV_COLUMNS) - 1])
+    return data
+
+
+def _default_tessdata() -> Optional[str]:
+    prefix = os.getenv("TESSDATA_PREFIX")
+    if prefix:
+        return prefix
+    return next((d for d in _TESSDATA_DIRS if os.path.isdir(d)), None)
+
+
+class TesserocrBackend(OcrBackend):
+    """
+    In-process Tesseract through the tesserocr binding. Each thread keeps one
+    initialized engine per language, so the model is loaded once per OCR
+    worker and images are handed over in memory instead of via temp files.
+    """
+
+    name = "tesserocr"
+
+    def __init__(self, tessdata: Optional[str] = None):
+        import tesserocr
+        self._tesserocr = tesserocr
+        self.tessdata = tessdata or _default_tessdata()
+        self._local = threading.local()
+        try:
+            _, languages = tesserocr.get_languages(self.tessdata) if self.tessdata else tesserocr.get_languages()
+        except RuntimeError:
+            languages = []
+        if not languages:
+            raise RuntimeError(f"no Tesseract language data found (tessdata={self.tessdata or 'default'})")
+        self.languages = languages
+
+    def _engine(self, language: str):
+        engines = getattr(self._local, "engines", None)
+        if engines is None:
+            engines = self._local.engines = {}
+        engine = engines.get(language)
+        if engine is None:
+            kwargs = {"lang": language}
+            if self.tessdata:
+                kwargs["path"] = self.tessdata
+            engine = engines[language] = self._tesserocr.PyTessBaseAPI(**kwargs)
+        return engine
+
+    def image_to_data(self, image: Image.Image, language: str) -> Dict[str, List[Any]]:
+        engine = self._engine(language)
+        engine.SetImage(image)
+        return _tsv_to_dict(engine.GetTSVText(0))
+
+    def image_to_string(self, image: Image.Image, language: str) -> str:
+        engine = self._engine(language)
+        engine.SetImage(image)
+        return engine.GetUTF8Text()
+
+    def version(self) -> str:
+        return self._tesserocr.tesseract_version().splitlines()[0]
+
+
+_backends: Dict[str, OcrBackend] = {}
+_lock = threading.Lock()
+
+
+def _build(name: str) -> OcrBackend:
+    if name in ("auto", "tesserocr"):
+        try:
+            return TesserocrBackend()
+        except ImportError as e:
+            log = logger.warning if name == "tesserocr" else logger.info
+            log("tesserocr is not installed (%s); using pytesseract", e)
+        except Exception as e:
+            # A broken binding or tessdata install must not take OCR down with it
+            logger.warning("tesserocr is unusable (%s: %s); using pytesseract", type(e).__name__, e)
+    elif name != "pytesseract":
+        logger.warning("Unknown OCR_BACKEND '%s'; using pytesseract", name)
+    return PytesseractBackend()
+
+
+def get_backend(name: Optional[str] = None) -> OcrBackend:
+    """
+    The process-wide OCR backend for `name` (default: the OCR_BACKEND env
+    var, "auto"). "auto" prefers tesserocr and falls back to pytesseract
+    when the binding is not installed or fails to start for any reason
+    (e.g. no language data), logging why. Backends
+    are cached, so each OCR worker process initializes its engines once.
+    """
+    name = (name or os.getenv("OCR_BACKEND") or "auto").lower()
+    with _lock:
+        backend = _backends.get(name)
+        if backend is None:
+            backend = _backends[name] = _build(name)
+            logger.info("Using %s OCR backend", backend.name)
+        return backend
@@ -0,0 +1,107 @@
+import logging
+import multiprocessing
+import os
+from abc import ABC, abstractmethod
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Any, Callable, Iterable, Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def _init_worker(tesseract_cmd: Optional[str]) -> None:
+    if tesseract_cmd:
+        import pytesseract
+        pytesseract.pytesseract.tesseract_cmd = tesseract_cmd
+    # Pick the OCR backend once per worker; tesserocr engines then stay loaded
+    from ocr_backend import get_backend
+    get_backend()
+
+
+class OcrExecutor(ABC):
+    """
+    Runs per-page OCR tasks. Implementations must yield results in the
+    same order as the submitted items so pages can be merged as-is, and
+    must pull items lazily so pages are rasterized only when a worker is
+    about to need them. `submit` runs one extra task (e.g. a page re-OCR'd
+    at a higher DPI) alongside a running `map`.
+    """
+
+    workers: int = 1
+
+    @abstractmethod
+    def map(self, fn: Callable[[Any], Any], items: Iterable[Any]) -> Iterator[Any]:
+        ...
+
+    @abstractmethod
+    def submit(self, fn: Callable[[Any], Any], item: Any) -> "Future[Any]":
+        ...
+
+    def shutdown(self) -> None:
+        pass
+
+
+class SerialOcrExecutor(OcrExecutor):
+    """OCR pages one after another in the calling thread."""
+
+    def map(self, fn: Callable[[Any], Any], items: Iterable[Any]) -> Iterator[Any]:
+        return (fn(item) for item in items)
+
+    def submit(self, fn: Callable[[Any], Any], item: Any) -> "Future[Any]":
+        future: "Future[Any]" = Future()
+        try:
+            future.set_result(fn(item))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+
+class ProcessPoolOcrExecutor(OcrExecutor):
+    """
+    Fan pages out to a bounded process pool so multi-page documents use
+    more than one core. Workers are started with 'spawn' because the pool is
+    used from request threads, where forking is unsafe.
+    """
+
+    def __init__(self, workers: int, tesseract_cmd: Optional[str] = None):
+        self.workers = workers
+        self._pool = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(tesseract_cmd,),
+        )
+
+    def map(self, fn: Callable[[Any], Any], items: Iterable[Any]) -> Iterator[Any]:
+        # Executor.map would drain `items` up front; keep at most one page
+        # per worker in flight instead.
+        pending = deque()
+        try:
+            for item in items:
+                pending.append(self._pool.submit(fn, item))
+                if len(pending) >= self.workers:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+        finally:
+            for future in pending:
+                future.cancel()
+
+    def submit(self, fn: Callable[[Any], Any], item: Any) -> "Future[Any]":
+        return self._pool.submit(fn, item)
+
+    def shutdown(self) -> None:
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+def build_ocr_executor(workers: Optional[int] = None, tesseract_cmd: Optional[str] = None) -> OcrExecutor:
+    """
+    Build the OCR executor for the given worker count (defaults to the CPU
+    count). A single worker runs pages serially without a process pool.
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers <= 1:
+        return SerialOcrExecutor()
+    logger.info("Starting OCR process pool with %s workers", workers)
+    return ProcessPoolOcrExecutor(workers, tesseract_cmd=tesseract_cmd)
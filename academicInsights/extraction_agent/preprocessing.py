@@ -0,0 +1,208 @@
+import logging
+import statistics
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+PREPROCESS_STEPS = ("grayscale", "crop", "deskew", "scale", "binarize")
+# deskew and scale are opt-in: the row-profile x-height estimate is
+# unreliable on ruled grade tables, and neither step has been measured to
+# help OCR accuracy on report cards (see benchmarks/preprocessing.py)
+DEFAULT_STEPS = ("grayscale", "crop")
+
+# Skew and margins are measured on a thumbnail this wide
+_ANALYSIS_WIDTH = 600
+# Rows/columns with less ink than this (0-255 mean) count as blank
+_BLANK_LEVEL = 2
+# A text line's ink band (ascender to descender) is roughly twice the x-height
+_X_HEIGHT_RATIO = 0.5
+
+
+@dataclass(frozen=True)
+class PreprocessOptions:
+    """
+    Which preprocessing steps run before OCR. Steps always run in the order
+    grayscale -> crop -> deskew -> scale -> binarize, so the (expensive)
+    full-resolution rotation only touches the cropped page.
+
+    - grayscale: drop color (phone photos are RGB)
+    - crop: trim blank margins, keeping crop_padding pixels around the ink
+    - deskew: rotate by the angle that maximizes the row-projection contrast,
+      searched within +/- max_skew_degrees
+    - scale: downscale so the estimated x-height is target_x_height pixels
+      (never upscales); table rules throw the estimate off, so measure
+      before enabling it for gridded documents
+    - binarize: Otsu threshold to pure black/white
+    """
+
+    steps: Tuple[str, ...] = DEFAULT_STEPS
+    target_x_height: int = 20
+    max_skew_degrees: float = 5.0
+    crop_padding: int = 16
+
+    @classmethod
+    def parse(cls, spec: Optional[str], target_x_height: int = 20) -> Optional["PreprocessOptions"]:
+        """
+        Build options from a comma-separated step list ("grayscale,crop"),
+        "default"/"" for DEFAULT_STEPS, "all", or "none" (returns None).
+        """
+        spec = (spec or "default").strip().lower()
+        if spec == "none":
+            return None
+        if spec == "default":
+            steps = DEFAULT_STEPS
+        elif spec == "all":
+            steps = PREPROCESS_STEPS
+        else:
+            requested = {s.strip() for s in spec.split(",") if s.strip()}
+            unknown = requested - set(PREPROCESS_STEPS)
+            if unknown:
+                logger.warning("Ignoring unknown preprocessing steps: %s", ", ".join(sorted(unknown)))
+            steps = tuple(s for s in PREPROCESS_STEPS if s in requested)
+        return cls(steps=steps, target_x_height=target_x_height) if steps else None
+
+    @property
+    def cache_token(self) -> str:
+        return f"{'+'.join(self.steps)}:{self.target_x_height}:{self.max_skew_degrees}:{self.crop_padding}"
+
+
+def otsu_threshold(gray: Image.Image) -> int:
+    """Otsu's threshold from the image histogram (8-bit grayscale)."""
+    histogram = gray.histogram()[:256]
+    total = sum(histogram)
+    if not total:
+        return 128
+    sum_all = sum(i * h for i, h in enumerate(histogram))
+    sum_bg = weight_bg = 0
+    best_t, best_var = 128, -1.0
+    for t, h in enumerate(histogram):
+        weight_bg += h
+        if weight_bg == 0:
+            continue
+        weight_fg = total - weight_bg
+        if weight_fg == 0:
+            break
+        sum_bg += t * h
+        mean_bg = sum_bg / weight_bg
+        mean_fg = (sum_all - sum_bg) / weight_fg
+        between = weight_bg * weight_fg * (mean_bg - mean_fg) ** 2
+        if between > best_var:
+            best_t, best_var = t, between
+    return best_t
+
+
+def _ink_mask(gray: Image.Image, threshold: int) -> Image.Image:
+    """White (255) where there is ink, black elsewhere."""
+    return gray.point([255 if v <= threshold else 0 for v in range(256)])
+
+
+def _thumbnail(image: Image.Image) -> Tuple[Image.Image, float]:
+    factor = min(1.0, _ANALYSIS_WIDTH / max(1, image.width))
+    if factor >= 1.0:
+        return image, 1.0
+    size = (max(1, round(image.width * factor)), max(1, round(image.height * factor)))
+    return image.resize(size, Image.BILINEAR), factor
+
+
+def _row_profile(mask: Image.Image) -> List[int]:
+    return list(mask.resize((1, mask.height), Image.BOX).getdata())
+
+
+def _projection_score(mask: Image.Image, angle: float) -> float:
+    rows = _row_profile(mask.rotate(angle, resample=Image.NEAREST, fillcolor=0))
+    return sum((a - b) ** 2 for a, b in zip(rows, rows[1:]))
+
+
+def estimate_skew(mask: Image.Image, max_degrees: float = 5.0) -> float:
+    """
+    Angle (degrees, counter-clockwise) that makes text lines horizontal:
+    the one whose row projection has the sharpest line/gap transitions.
+    Coarse 0.5 degree search, refined to 0.1 degree; returns 0.0 unless the
+    best angle scores clearly (5%) better than leaving the page as it is.
+    """
+    steps = int(max_degrees * 2)
+    scores = {i / 2: _projection_score(mask, i / 2) for i in range(-steps, steps + 1)}
+    coarse = max(scores, key=scores.get)
+    for angle in (round(coarse + i / 10, 1) for i in range(-4, 5)):
+        if angle not in scores:
+            scores[angle] = _projection_score(mask, angle)
+    best = max(scores, key=scores.get)
+    return best if scores[best] > scores[0.0] * 1.05 else 0.0
+
+
+def estimate_x_height(mask: Image.Image) -> Optional[float]:
+    """Median text-line height from the row projection, times _X_HEIGHT_RATIO."""
+    heights = []
+    run = 0
+    for level in _row_profile(mask) + [0]:
+        if level > _BLANK_LEVEL:
+            run += 1
+        elif run:
+            if run >= 3:
+                heights.append(run)
+            run = 0
+    if not heights:
+        return None
+    return statistics.median(heights) * _X_HEIGHT_RATIO
+
+
+def preprocess(image: Image.Image, options: PreprocessOptions) -> Tuple[Image.Image, Dict[str, Any]]:
+    """
+    Run the enabled steps and return (image for OCR, info) where info
+    records what was done: skew angle, crop box, scale factor and ms.
+    """
+    start = time.perf_counter()
+    steps = set(options.steps)
+    info: Dict[str, Any] = {"steps": list(options.steps), "input_size": list(image.size)}
+
+    if image.mode not in ("L", "RGB"):
+        image = image.convert("RGB")
+    gray = image.convert("L") if image.mode != "L" else image
+    if "grayscale" in steps:
+        image = gray
+
+    threshold = otsu_threshold(gray)
+    thumb, factor = _thumbnail(gray)
+    thumb_mask = _ink_mask(thumb, threshold)
+
+    if "crop" in steps:
+        bbox = thumb_mask.getbbox()
+        if bbox:
+            pad = options.crop_padding
+            left, top, right, bottom = (round(v / factor) for v in bbox)
+            box = (max(0, left - pad), max(0, top - pad), min(gray.width, right + pad), min(gray.height, bottom + pad))
+            image = image.crop(box)
+            gray = gray.crop(box)
+            info["crop"] = list(box)
+
+    if "deskew" in steps:
+        # Measured on the uncropped thumbnail; cropping does not change the angle
+        angle = estimate_skew(thumb_mask, options.max_skew_degrees)
+        info["deskew_degrees"] = angle
+        if abs(angle) >= 0.2:
+            fill = 255 if image.mode == "L" else (255, 255, 255)
+            image = image.rotate(angle, resample=Image.BILINEAR, expand=True, fillcolor=fill)
+            gray = image if image.mode == "L" else image.convert("L")
+
+    if "scale" in steps:
+        x_height = estimate_x_height(_ink_mask(gray, threshold))
+        if x_height:
+            info["x_height"] = round(x_height, 1)
+            factor = options.target_x_height / x_height
+            if factor < 1.0:
+                size = (max(1, round(image.width * factor)), max(1, round(image.height * factor)))
+                image = image.resize(size, Image.LANCZOS)
+                info["scale"] = round(factor, 3)
+
+    if "binarize" in steps:
+        gray = image if image.mode == "L" else image.convert("L")
+        cutoff = otsu_threshold(gray)
+        image = gray.point([255 if v > cutoff else 0 for v in range(256)])
+
+    info["output_size"] = list(image.size)
+    info["ms"] = round((time.perf_counter() - start) * 1000, 1)
+    return image, info
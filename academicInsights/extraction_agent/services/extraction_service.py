@@ -1,31 +1,146 @@
-import logging
-from pathlib import Path
-from typing import Any, Dict
-
-from utils import process_document
-from settings import get_env
-
-logger = logging.getLogger(__name__)
-
-
-class ExtractionService:
-    def __init__(self):
-        val = get_env("PDF_DPI")
-        try:
-            self.pdf_dpi = int(val) if val is not None else 300
-        except Exception:
-            logger.warning("Invalid PDF_DPI value '%s', falling back to 300", val)
-            self.pdf_dpi = 300
-
-        self.tesseract_cmd = get_env("TESSERACT_CMD")
-        if self.tesseract_cmd:
-            try:
-                import pytesseract
-                pytesseract.pytesseract.tesseract_cmd = self.tesseract_cmd
-            except Exception:
-                logger.exception("Failed to set tesseract cmd from env")
-
-    async def extract(self, file_path: Path, filename: str) -> Dict[str, Any]:
-        result = await process_document(file_path, filename)
-        return result.dict() if hasattr(result, 'dict') else result
-
+import asyncio
+import copy
+import logging
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from utils import PageCallback, process_document
+from settings import get_env, get_int_env
+from ocr_executor import build_ocr_executor
+from worker_pool import WorkerPool
+from preprocessing import PreprocessOptions
+from extraction_cache import ExtractionCache, cache_key, file_digest
+from ocr_backend import get_backend
+
+logger = logging.getLogger(__name__)
+
+
+class ExtractionService:
+    def __init__(self):
+        self.pdf_dpi = get_int_env("PDF_DPI", 300)
+        # First-pass DPI for PDFs; pages below the confidence threshold are
+        # re-rendered at PDF_DPI. 0 (or >= PDF_DPI) renders everything at PDF_DPI.
+        self.adaptive_dpi = get_int_env("PDF_ADAPTIVE_DPI", 150)
+        self.adaptive_min_confidence = float(get_int_env("PDF_ADAPTIVE_MIN_CONFIDENCE", 75))
+        # Born-digital PDFs: use the embedded text layer and OCR only pages without one
+        self.text_layer = get_env("PDF_TEXT_LAYER", "true").lower() in ("1", "true", "yes")
+        self.text_min_chars = get_int_env("PDF_TEXT_MIN_CHARS", 20)
+        # Pages with a text layer but mostly covered by images (scans with a
+        # digital overlay) are still OCR'd; 100 always trusts the text layer
+        self.max_image_coverage = get_int_env("PDF_TEXT_MAX_IMAGE_COVERAGE", 50) / 100
+        self.raster_window = get_int_env("PDF_RASTER_WINDOW", 1)
+        self.language = get_env("OCR_LANGUAGE", "eng")
+        self.preprocess = PreprocessOptions.parse(get_env("OCR_PREPROCESS"), target_x_height=get_int_env("OCR_TARGET_X_HEIGHT", 20))
+
+        self.tesseract_cmd = get_env("TESSERACT_CMD")
+        if self.tesseract_cmd:
+            try:
+                import pytesseract
+                pytesseract.pytesseract.tesseract_cmd = self.tesseract_cmd
+            except Exception:
+                logger.exception("Failed to set tesseract cmd from env")
+        # In-process tesserocr when available, else the tesseract CLI (OCR_BACKEND)
+        self.ocr_backend = get_backend()
+        self.tesseract_version = self._tesseract_version()
+
+        self.ocr_executor = build_ocr_executor(get_int_env("OCR_WORKERS"), tesseract_cmd=self.tesseract_cmd)
+        self.workers = WorkerPool(
+            max_concurrency=get_int_env("EXTRACTION_CONCURRENCY", 2),
+            max_queue=get_int_env("EXTRACTION_QUEUE_SIZE", 16),
+        )
+        self.batch_concurrency = max(1, get_int_env("BATCH_CONCURRENCY", self.workers.max_concurrency))
+
+        self.cache = ExtractionCache(
+            max_items=get_int_env("EXTRACTION_CACHE_SIZE", 256),
+            directory=get_env("EXTRACTION_CACHE_DIR"),
+            max_disk_bytes=get_int_env("EXTRACTION_CACHE_MAX_MB", 512) * 1024 * 1024,
+        )
+        self._in_flight: Dict[str, asyncio.Future] = {}
+
+        # Volume shared with the orchestrator; /extract-ref reads files here in place
+        shared_dir = get_env("SHARED_UPLOAD_DIR")
+        self.shared_upload_dir = Path(shared_dir).resolve() if shared_dir else None
+
+    def _tesseract_version(self) -> str:
+        try:
+            return self.ocr_backend.version()
+        except Exception:
+            logger.warning("Could not determine Tesseract version; cache keys will use 'unknown'")
+            return "unknown"
+
+    def _cache_key(self, file_path: Path) -> str:
+        return cache_key(
+            file_digest(file_path),
+            suffix=file_path.suffix.lower(),
+            dpi=self.pdf_dpi,
+            adaptive_dpi=self.adaptive_dpi,
+            adaptive_min_confidence=self.adaptive_min_confidence,
+            text_layer=self.text_layer,
+            text_min_chars=self.text_min_chars,
+            max_image_coverage=self.max_image_coverage,
+            language=self.language,
+            tesseract=self.tesseract_version,
+            ocr_backend=self.ocr_backend.name,
+            preprocess=self.preprocess.cache_token if self.preprocess else "none",
+        )
+
+    async def extract(self, file_path: Path, filename: str, on_page: Optional[PageCallback] = None) -> Dict[str, Any]:
+        """
+        Extract a document, serving repeats from the cache. `on_page` is
+        called from the OCR worker thread for each page as it finishes; it is
+        not called when the result comes from the cache.
+        """
+        start = time.perf_counter()
+        key = await asyncio.to_thread(self._cache_key, file_path)
+
+        cached = await asyncio.to_thread(self.cache.get, key)
+        cache_status = "hit"
+        if cached is None and key in self._in_flight:
+            # Same document is already being OCR'd for another request; a
+            # None result means that run failed and we extract it ourselves.
+            cached = await asyncio.shield(self._in_flight[key])
+            cache_status = "joined"
+        if cached is not None:
+            result = copy.deepcopy(cached)
+            result["filename"] = filename
+            result.setdefault("metadata", {})["cache"] = {
+                "status": cache_status,
+                "ms": round((time.perf_counter() - start) * 1000, 2),
+            }
+            return result
+
+        in_flight = asyncio.get_running_loop().create_future()
+        self._in_flight[key] = in_flight
+        result = None
+        try:
+            document = await self.workers.run(
+                process_document, file_path, filename,
+                executor=self.ocr_executor, raster_window=self.raster_window, language=self.language,
+                on_page=on_page, preprocess=self.preprocess,
+                dpi=self.pdf_dpi, adaptive_dpi=self.adaptive_dpi, min_confidence=self.adaptive_min_confidence,
+                text_layer=self.text_layer, text_min_chars=self.text_min_chars, max_image_coverage=self.max_image_coverage,
+            )
+            document = document.dict() if hasattr(document, 'dict') else document
+            if document.get("status") == "success":
+                await asyncio.to_thread(self.cache.put, key, copy.deepcopy(document))
+                result = document
+        finally:
+            if self._in_flight.get(key) is in_flight:
+                del self._in_flight[key]
+            in_flight.set_result(result)
+
+        document = copy.deepcopy(document)
+        document.setdefault("metadata", {})["cache"] = {"status": "miss"}
+        return document
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "workers": self.workers.stats(),
+            "cache": self.cache.stats(),
+            "ocr": {"backend": self.ocr_backend.name, "tesseract": self.tesseract_version},
+        }
+
+    def shutdown(self) -> None:
+        self.workers.shutdown()
+        self.ocr_executor.shutdown()
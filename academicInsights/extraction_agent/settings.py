@@ -1,10 +1,23 @@
-import os
-from typing import Optional
-
-
-def get_env(name: str, default: Optional[str] = None) -> Optional[str]:
-    v = os.getenv(name)
-    if v is not None:
-        return v
-    return default
-
+import logging
+import os
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+
+def get_env(name: str, default: Optional[str] = None) -> Optional[str]:
+    v = os.getenv(name)
+    if v is not None:
+        return v
+    return default
+
+
+def get_int_env(name: str, default: Optional[int] = None) -> Optional[int]:
+    v = os.getenv(name)
+    if v is None or not v.strip():
+        return default
+    try:
+        return int(v)
+    except ValueError:
+        logger.warning("Invalid %s value '%s', falling back to %s", name, v, default)
+        return default
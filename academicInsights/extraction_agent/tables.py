@@ -0,0 +1,160 @@
+import re
+import statistics
+from typing import Any, Dict, List, Optional, Tuple
+
+# (left, top, width, height, text) of one OCR'd word
+WordBox = Tuple[int, int, int, int, str]
+# (start, end, text) of one cell: pixel span for OCR lines, character span
+# for text-layer lines
+Cell = Tuple[float, float, str]
+
+# Horizontal gap, in word heights, that separates two cells on an OCR line
+# (gaps between words of one cell are about a third of the height)
+_CELL_GAP = 1.5
+# A text-layer (pdftotext -layout) line splits into cells at 2+ spaces
+_LAYOUT_CELL = re.compile(r"\S+(?: \S+)*")
+_NUMERIC = re.compile(r"^[<>~]?\d+(?:[.,]\d+)?%?$")
+
+MIN_COLUMNS = 3
+MIN_ROWS = 3
+
+
+def words_from_ocr_data(data: Dict[str, List[Any]]) -> List[WordBox]:
+    """Word boxes from an image_to_data result (Output.DICT), skipping empty words."""
+    words = []
+    for i, text in enumerate(data.get("text", [])):
+        text = (text or "").strip()
+        if text:
+            words.append((int(data["left"][i]), int(data["top"][i]), int(data["width"][i]), int(data["height"][i]), text))
+    return words
+
+
+def lines_from_words(words: List[WordBox]) -> List[List[Cell]]:
+    """
+    Group word boxes into visual lines (by vertical center) and split each
+    line into cells wherever the gap between words is wider than _CELL_GAP
+    word heights. Works on geometry only, so a grade grid keeps its columns
+    even when Tesseract numbered its cells as separate blocks.
+    """
+    if not words:
+        return []
+    height = statistics.median(w[3] for w in words) or 1
+    rows: List[List[WordBox]] = []
+    centers: List[float] = []
+    for word in sorted(words, key=lambda w: w[1] + w[3] / 2):
+        center = word[1] + word[3] / 2
+        if rows and abs(center - centers[-1]) <= height / 2:
+            rows[-1].append(word)
+            centers[-1] = sum(w[1] + w[3] / 2 for w in rows[-1]) / len(rows[-1])
+        else:
+            rows.append([word])
+            centers.append(center)
+
+    lines = []
+    for row in rows:
+        row.sort(key=lambda w: w[0])
+        cells: List[Cell] = []
+        start, end, texts = row[0][0], row[0][0] + row[0][2], [row[0][4]]
+        for left, _, width, _, text in row[1:]:
+            if left - end > _CELL_GAP * height:
+                cells.append((start, end, " ".join(texts)))
+                start, texts = left, []
+            texts.append(text)
+            end = max(end, left + width)
+        cells.append((start, end, " ".join(texts)))
+        lines.append(cells)
+    return lines
+
+
+def lines_from_layout_text(text: str) -> List[List[Cell]]:
+    """
+    Cells of `pdftotext -layout` lines: runs of text separated by 2+ spaces.
+    Blank lines are kept (as no cells) so they end a table.
+    """
+    return [
+        [(m.start(), m.end(), m.group()) for m in _LAYOUT_CELL.finditer(line.expandtabs())]
+        for line in text.splitlines()
+    ]
+
+
+def _column_bands(rows: List[List[Cell]]) -> List[Tuple[float, float]]:
+    """
+    Column x-ranges of a table: the union of overlapping cell spans, taken
+    from the rows with the most common cell count (a header cell spanning two
+    columns would otherwise merge them).
+    """
+    counts = [len(cells) for cells in rows]
+    modal = max(set(counts), key=lambda n: (counts.count(n), n))
+    spans = sorted((start, end) for cells in rows if len(cells) == modal for start, end, _ in cells)
+    bands: List[List[float]] = []
+    for start, end in spans:
+        if bands and start <= bands[-1][1]:
+            bands[-1][1] = max(bands[-1][1], end)
+        else:
+            bands.append([start, end])
+    return [(start, end) for start, end in bands]
+
+
+def _column_of(cell: Cell, bands: List[Tuple[float, float]]) -> int:
+    start, end, _ = cell
+    overlaps = [min(end, b_end) - max(start, b_start) for b_start, b_end in bands]
+    best = max(range(len(bands)), key=lambda i: overlaps[i])
+    if overlaps[best] > 0:
+        return best
+    center = (start + end) / 2
+    return min(range(len(bands)), key=lambda i: abs(center - (bands[i][0] + bands[i][1]) / 2))
+
+
+def _to_grid(rows: List[List[Cell]]) -> Optional[List[List[str]]]:
+    bands = _column_bands(rows)
+    if len(bands) < MIN_COLUMNS:
+        return None
+    grid = []
+    for cells in rows:
+        row = [""] * len(bands)
+        for cell in cells:
+            column = _column_of(cell, bands)
+            row[column] = f"{row[column]} {cell[2]}".strip()
+        grid.append(row)
+    if not any(_NUMERIC.match(value) for row in grid for value in row):
+        return None
+    return grid
+
+
+def _tsv(grid: List[List[str]]) -> str:
+    return "\n".join("\t".join(value.replace("\t", " ") for value in row) for row in grid)
+
+
+def detect_tables(lines: List[List[Cell]]) -> Tuple[str, List[Dict[str, Any]]]:
+    """
+    Find grade grids in a page's lines and build its compact text.
+
+    A table is a run of at least MIN_ROWS consecutive lines with two or more
+    cells that resolves to MIN_COLUMNS or more columns and holds at least one
+    number (a subject x term grid). Each table is rendered as TSV, one row
+    per line with empty strings for missing cells; every other line is kept
+    as single-spaced text.
+
+    Returns:
+        (compact page text with tables inlined as TSV, tables as
+         {"rows", "columns", "tsv"})
+    """
+    out: List[str] = []
+    tables: List[Dict[str, Any]] = []
+    i = 0
+    while i < len(lines):
+        j = i
+        while j < len(lines) and len(lines[j]) >= 2:
+            j += 1
+        grid = _to_grid(lines[i:j]) if j - i >= MIN_ROWS else None
+        if grid:
+            tsv = _tsv(grid)
+            tables.append({"rows": len(grid), "columns": len(grid[0]), "tsv": tsv})
+            out.append(tsv)
+            i = j
+            continue
+        for cells in lines[i:max(j, i + 1)]:
+            if cells:
+                out.append(" ".join(cell[2] for cell in cells))
+        i = max(j, i + 1)
+    return "\n".join(out), tables
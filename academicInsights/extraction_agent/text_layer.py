@@ -0,0 +1,127 @@
+import functools
+import logging
+import re
+import shutil
+import subprocess
+from pathlib import Path
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Text containing more than this share of U+FFFD / control characters is
+# treated as a broken font mapping rather than real text
+_MAX_GARBAGE_RATIO = 0.1
+# "Page    1 size: 595.276 x 841.89 pts (A4)" in `pdfinfo -f 1 -l N` output
+_PAGE_SIZE = re.compile(r"^Page\s+(\d+)\s+size:\s+([\d.]+)\s+x\s+([\d.]+)\s+pts", re.MULTILINE)
+
+
+@functools.lru_cache(maxsize=1)
+def _pdftotext_available() -> bool:
+    if shutil.which("pdftotext") is None:
+        logger.warning("pdftotext not found; PDF text layers will not be used")
+        return False
+    return True
+
+
+@functools.lru_cache(maxsize=1)
+def _pdfimages_available() -> bool:
+    if shutil.which("pdfimages") is None or shutil.which("pdfinfo") is None:
+        logger.warning("pdfimages/pdfinfo not found; pages with a text layer will not be checked for scanned images")
+        return False
+    return True
+
+
+def pdf_text_layer(pdf_path: Path, timeout: float = 30.0) -> Optional[List[str]]:
+    """
+    Text of every page of a born-digital PDF via poppler's `pdftotext
+    -layout`, in page order. One call covers the whole document; pages are
+    split on the form feed pdftotext writes after each page.
+
+    Returns None when pdftotext is unavailable or fails, so callers fall
+    back to OCR.
+    """
+    if not _pdftotext_available():
+        return None
+    try:
+        completed = subprocess.run(
+            ["pdftotext", "-layout", "-enc", "UTF-8", str(pdf_path), "-"],
+            capture_output=True, timeout=timeout, check=True,
+        )
+    except (subprocess.SubprocessError, OSError) as e:
+        logger.warning("pdftotext failed for %s: %s", pdf_path, e)
+        return None
+    pages = completed.stdout.decode("utf-8", "replace").split("\f")
+    # pdftotext terminates the last page with a form feed too
+    if pages and not pages[-1].strip():
+        pages.pop()
+    return [page.rstrip() for page in pages]
+
+
+def is_usable_text(text: Optional[str], min_chars: int = 20) -> bool:
+    """
+    Whether a page's embedded text is worth using instead of OCR: at least
+    `min_chars` letters/digits and no sign of a broken font encoding.
+    Scanned pages typically have no text layer at all.
+    """
+    if not text:
+        return False
+    alnum = sum(ch.isalnum() for ch in text)
+    if alnum < min_chars:
+        return False
+    garbage = sum(ch == "\ufffd" or (ord(ch) < 32 and ch not in "\n\r\t") for ch in text)
+    return garbage / len(text) <= _MAX_GARBAGE_RATIO
+
+
+def pdf_image_coverage(pdf_path: Path, page_count: int, timeout: float = 30.0) -> Optional[Dict[int, float]]:
+    """
+    Share of each page's area covered by raster images, by page number
+    (pages without images are left out). Image sizes come from `pdfimages
+    -list` (pixels and placement resolution), page sizes from `pdfinfo`.
+    A scan with a small digital overlay (a stamped name or date) has a text
+    layer but is mostly one page-sized image.
+
+    Returns None when poppler is unavailable or fails.
+    """
+    if page_count < 1 or not _pdfimages_available():
+        return None
+    try:
+        images = subprocess.run(["pdfimages", "-list", str(pdf_path)],
+                                capture_output=True, timeout=timeout, check=True).stdout.decode("utf-8", "replace")
+        info = subprocess.run(["pdfinfo", "-f", "1", "-l", str(page_count), str(pdf_path)],
+                              capture_output=True, timeout=timeout, check=True).stdout.decode("utf-8", "replace")
+    except (subprocess.SubprocessError, OSError) as e:
+        logger.warning("pdfimages failed for %s: %s", pdf_path, e)
+        return None
+
+    page_areas = {int(m.group(1)): float(m.group(2)) * float(m.group(3)) for m in _PAGE_SIZE.finditer(info)}
+    coverage: Dict[int, float] = {}
+    # page num type width height color comp bpc enc interp object ID x-ppi y-ppi size ratio
+    for line in images.splitlines()[2:]:
+        fields = line.split()
+        if len(fields) < 14 or fields[2] != "image":
+            continue
+        try:
+            page, width, height = int(fields[0]), int(fields[3]), int(fields[4])
+            x_ppi, y_ppi = float(fields[12]), float(fields[13])
+        except ValueError:
+            continue
+        area = page_areas.get(page)
+        if not area or x_ppi <= 0 or y_ppi <= 0:
+            continue
+        # Pixels at the placement resolution -> points (1/72 inch)
+        image_area = (width * 72 / x_ppi) * (height * 72 / y_ppi)
+        coverage[page] = min(1.0, coverage.get(page, 0.0) + image_area / area)
+    return coverage
+
+
+def merge_text_layer(ocr_text: str, layer_text: str) -> str:
+    """
+    OCR text of a scanned page plus the lines of its text layer that OCR did
+    not already produce (compared case- and whitespace-insensitively).
+    """
+    seen = " ".join(ocr_text.split()).lower()
+    extra = [line.strip() for line in layer_text.splitlines()
+             if line.strip() and " ".join(line.split()).lower() not in seen]
+    if not extra:
+        return ocr_text
+    return ocr_text.rstrip() + "\n\n" + "\n".join(extra)
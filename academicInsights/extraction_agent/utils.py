@@ -1,230 +1,557 @@
-import pytesseract
-from pytesseract import Output
-from pdf2image import convert_from_path
-from PIL import Image
-from pathlib import Path
-from typing import Dict, Any
-import re
-import logging
-from Models.Response import ExtractResponse
-
-logger = logging.getLogger(__name__)
-
-# Configure Tesseract path (Windows)
-# pytesseract.pytesseract.tesseract_cmd = r'C:\Program Files\Tesseract-OCR\tesseract.exe'
-
-def extract_text_from_image(image_path: Path, language: str = 'eng') -> tuple:
-    """
-    Extract text from image using Tesseract OCR
-    
-    Args:
-        image_path: Path to image file
-        language: Tesseract language code (default: 'eng')
-    
-    Returns:
-        Extracted text
-    """
-    try:
-        image = Image.open(image_path)
-        text = pytesseract.image_to_string(image, lang=language)
-
-        data = pytesseract.image_to_data(image, lang=language, output_type=Output.DICT)
-        confs = []
-        for c in data.get('conf', []):
-            try:
-                cv = float(c)
-            except Exception:
-                continue
-            if cv >= 0:
-                confs.append(cv)
-
-        avg_conf = float(sum(confs) / len(confs)) if confs else None
-        return text.strip(), avg_conf
-    except Exception as e:
-        logger.error(f"Error extracting text from image: {str(e)}")
-        raise
-
-def extract_text_from_pdf(pdf_path: Path, language: str = 'eng', dpi: int = 300) -> tuple:
-    """
-    Extract text from PDF using Tesseract OCR
-    
-    Args:
-        pdf_path: Path to PDF file
-        language: Tesseract language code (default: 'eng')
-        dpi: DPI for PDF to image conversion
-    
-    Returns:
-        Extracted text from all pages
-    """
-    try:
-
-        images = convert_from_path(pdf_path, dpi=dpi)
-        
-
-        all_text = []
-        all_confs = []
-
-        for i, image in enumerate(images):
-            logger.info(f"Processing page {i + 1}/{len(images)}")
-            text = pytesseract.image_to_string(image, lang=language)
-            all_text.append(text.strip())
-
-            data = pytesseract.image_to_data(image, lang=language, output_type=Output.DICT)
-            for c in data.get('conf', []):
-                try:
-                    cv = float(c)
-                except Exception:
-                    continue
-                if cv >= 0:
-                    all_confs.append(cv)
-
-        joined = "\n\n".join(all_text)
-        avg_conf = float(sum(all_confs) / len(all_confs)) if all_confs else None
-
-        return joined, avg_conf
-    
-    except Exception as e:
-        logger.error(f"Error extracting text from PDF: {str(e)}")
-        raise
-
-def extract_metadata(text: str) -> Dict[str, Any]:
-    """
-    Extract metadata from text (titles, dates, etc.)
-    
-    Args:
-        text: Extracted text
-    
-    Returns:
-        Dictionary with metadata
-    """
-    metadata = {
-        "title": None,
-        "dates": [],
-        "emails": [],
-        "urls": [],
-        "word_count": 0,
-        "line_count": 0
-    }
-    
-    lines = text.split('\n')
-    metadata["line_count"] = len(lines)
-    metadata["word_count"] = len(text.split())
-    
-
-    for line in lines:
-        if line.strip():
-            metadata["title"] = line.strip()
-            break
-    
-
-    date_pattern = r'\b\d{1,2}[-/]\d{1,2}[-/]\d{2,4}\b|\b\d{4}[-/]\d{1,2}[-/]\d{1,2}\b'
-    metadata["dates"] = re.findall(date_pattern, text)
-    
-
-    email_pattern = r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b'
-    metadata["emails"] = re.findall(email_pattern, text)
-    
-
-    url_pattern = r'http[s]?://(?:[a-zA-Z]|[0-9]|[$-_@.&+]|[!*\\(\\),]|(?:%[0-9a-fA-F][0-9a-fA-F]))+'
-    metadata["urls"] = re.findall(url_pattern, text)
-    
-    return metadata
-
-def structure_text(text: str) -> Dict[str, Any]:
-    """
-    Structure extracted text into sections
-    
-    Args:
-        text: Extracted text
-    
-    Returns:
-        Structured dictionary
-    """
-    lines = [line.strip() for line in text.split('\n') if line.strip()]
-    
-    structure = {
-        "paragraphs": [],
-        "sections": []
-    }
-    
-    current_paragraph = []
-    
-    for line in lines:
-        if line.isupper() or line.endswith(':'):
-            if current_paragraph:
-                structure["paragraphs"].append(" ".join(current_paragraph))
-                current_paragraph = []
-            structure["sections"].append(line)
-        else:
-            current_paragraph.append(line)
-    
-    if current_paragraph:
-        structure["paragraphs"].append(" ".join(current_paragraph))
-    
-    return structure
-
-def clean_ocr_text(raw: str) -> Dict[str, str]:
-    """
-    Normalize OCR text:
-      - convert escaped backslash sequences like '\\n' or '\\t' into actual whitespace
-      - create 'struct_text' where multiple consecutive newlines are collapsed to one (keeps paragraph boundaries)
-      - create 'raw_text' where all whitespace becomes single spaces (suitable for storage / display)
-    Returns dict with keys: 'raw_text', 'struct_text', 'orig'
-    """
-    if raw is None:
-        return {"raw_text": "", "struct_text": "", "orig": ""}
-
-    text = raw.replace('\\r\\n', '\n').replace('\\n', '\n').replace('\\r', '\n').replace('\\t', ' ')
-    
-    struct_text = re.sub(r'\n{2,}', '\n\n', text)  # keep paragraph breaks (double newline) but normalize runs
-    struct_text = re.sub(r'[ \t]+$', '', struct_text, flags=re.M)  # trim trailing spaces on lines
-
-    raw_text = re.sub(r'\s+', ' ', text).strip()
-
-    return {"raw_text": raw_text, "struct_text": struct_text, "orig": text}
-
-async def process_document(file_path: Path, filename: str) -> ExtractResponse:
-    """
-    Process document and return structured JSON
-    
-    Args:
-        file_path: Path to document
-        filename: Original filename
-    
-    Returns:
-        Dictionary with extracted data
-    """
-    file_extension = file_path.suffix.lower()
-    
-    if file_extension == '.pdf':
-        text, conf = extract_text_from_pdf(file_path)
-    else:
-        text, conf = extract_text_from_image(file_path)
-
-
-    cleaned = clean_ocr_text(text)
-    raw_text = cleaned["raw_text"]
-    struct_input = cleaned["struct_text"]
-
-    metadata = extract_metadata(struct_input)
-    structure = structure_text(struct_input)
-    
-    conf_value = None
-    if conf is not None:
-        try:
-            conf_value = f"{conf:.1f}"
-        except Exception:
-            conf_value = None
-
-    result = {
-        "status": "success",
-        "filename": filename,
-        "file_type": file_extension,
-        "text": struct_input,
-        "raw_text": raw_text,
-        "metadata": metadata,
-        "structure": structure,
-        "confidence": conf_value if conf_value is not None else ("high" if len(raw_text) > 100 else "low")
-    }
-
+from pdf2image import convert_from_path, pdfinfo_from_path
+from PIL import Image
+from pathlib import Path
+from typing import Callable, Deque, Dict, Any, Iterator, List, Optional, Tuple, Union
+from collections import deque
+from concurrent.futures import Future
+import re
+import tempfile
+import time
+import logging
+from Models.Response import ExtractResponse
+from ocr_executor import OcrExecutor, SerialOcrExecutor
+from memory_monitor import PeakMemoryMonitor
+from preprocessing import PreprocessOptions, preprocess as preprocess_image
+from text_layer import pdf_text_layer, is_usable_text, pdf_image_coverage, merge_text_layer
+from ocr_backend import get_backend
+from tables import WordBox, detect_tables, lines_from_layout_text, lines_from_words, words_from_ocr_data
+
+logger = logging.getLogger(__name__)
+
+PageCallback = Callable[[Dict[str, Any]], None]
+
+# Configure Tesseract path (Windows)
+# pytesseract.pytesseract.tesseract_cmd = r'C:\Program Files\Tesseract-OCR\tesseract.exe'
+
+def _to_conf(value: Any) -> Optional[float]:
+    try:
+        cv = float(value)
+    except Exception:
+        return None
+    return cv if cv >= 0 else None
+
+
+def text_from_ocr_data(data: Dict[str, List[Any]]) -> Tuple[str, List[float]]:
+    """
+    Rebuild page text and word confidences from a single image_to_data result
+
+    Words are grouped by Tesseract's (block, paragraph, line) numbering so the
+    output keeps the line and paragraph breaks image_to_string would produce.
+
+    Args:
+        data: pytesseract image_to_data output (Output.DICT)
+
+    Returns:
+        (text, word confidences)
+    """
+    paragraphs: Dict[tuple, Dict[int, List[str]]] = {}
+    confs: List[float] = []
+
+    for i, word in enumerate(data.get('text', [])):
+        word = (word or '').strip()
+        if not word:
+            continue
+        par_key = (data['page_num'][i], data['block_num'][i], data['par_num'][i])
+        paragraphs.setdefault(par_key, {}).setdefault(data['line_num'][i], []).append(word)
+
+        cv = _to_conf(data['conf'][i])
+        if cv is not None:
+            confs.append(cv)
+
+    text = "\n\n".join(
+        "\n".join(" ".join(words) for words in lines.values())
+        for lines in paragraphs.values()
+    )
+    return text, confs
+
+
+def ocr_image_words(image: Image.Image, language: str = 'eng',
+                    single_pass: bool = True) -> Tuple[str, List[float], List[WordBox]]:
+    """
+    OCR a single page image with the process's OCR backend (OCR_BACKEND)
+
+    Args:
+        image: PIL image of the page
+        language: Tesseract language code (default: 'eng')
+        single_pass: derive text and confidences from one image_to_data call
+            instead of running image_to_string and image_to_data separately
+
+    Returns:
+        (text, word confidences, word boxes)
+    """
+    backend = get_backend()
+    data = backend.image_to_data(image, language)
+    words = words_from_ocr_data(data)
+    if single_pass:
+        text, confs = text_from_ocr_data(data)
+        return text, confs, words
+
+    text = backend.image_to_string(image, language)
+    confs = [cv for cv in (_to_conf(c) for c in data.get('conf', [])) if cv is not None]
+    return text.strip(), confs, words
+
+
+def ocr_image(image: Image.Image, language: str = 'eng', single_pass: bool = True) -> Tuple[str, List[float]]:
+    """OCR a single page image and return (text, word confidences); see ocr_image_words."""
+    text, confs, _ = ocr_image_words(image, language=language, single_pass=single_pass)
+    return text, confs
+
+
+def _ocr_preprocessed(image: Image.Image, language: str, single_pass: bool,
+                      preprocess: Optional[PreprocessOptions]) -> Tuple[str, List[float], List[WordBox], Optional[Dict[str, Any]]]:
+    info = None
+    if preprocess is not None:
+        image, info = preprocess_image(image, preprocess)
+    text, confs, words = ocr_image_words(image, language=language, single_pass=single_pass)
+    return text, confs, words, info
+
+
+def ocr_page(task: Tuple[Union[Path, str, Image.Image], str, bool, Optional[PreprocessOptions]]) -> Dict[str, Any]:
+    """
+    OCR one page and time it. Kept at module level so it can be pickled
+    into an OCR process pool.
+
+    Args:
+        task: (page image or path to a rendered page, language, single_pass,
+            preprocessing options or None)
+
+    Returns:
+        Dictionary with the page text, word confidences, OCR seconds and the
+        page's compact text and tables (see tables.detect_tables)
+    """
+    page, language, single_pass, preprocess = task
+    start = time.perf_counter()
+    if isinstance(page, Image.Image):
+        text, confs, words, info = _ocr_preprocessed(page, language, single_pass, preprocess)
+    else:
+        with Image.open(page) as image:
+            text, confs, words, info = _ocr_preprocessed(image, language, single_pass, preprocess)
+    compact, tables = detect_tables(lines_from_words(words))
+    return {"text": text.strip(), "confs": confs, "seconds": time.perf_counter() - start, "preprocess": info,
+            "compact": compact, "tables": tables}
+
+
+def _page_summary(page_number: int, page: Dict[str, Any]) -> Dict[str, Any]:
+    confs = page["confs"]
+    summary = {
+        "page": page_number,
+        "seconds": round(page["seconds"], 3),
+        "confidence": round(sum(confs) / len(confs), 1) if confs else None,
+        "words": len(confs) if confs else len(page["text"].split()),
+        "source": page.get("source", "ocr"),
+    }
+    if "dpi" in page:
+        summary["dpi"] = page["dpi"]
+    if "low_dpi_confidence" in page:
+        summary["low_dpi_confidence"] = page["low_dpi_confidence"]
+    if page.get("preprocess"):
+        summary["preprocess"] = page["preprocess"]
+    if page.get("tables"):
+        summary["tables"] = len(page["tables"])
+    return summary
+
+
+def _mean_conf(confs: List[float]) -> Optional[float]:
+    return sum(confs) / len(confs) if confs else None
+
+
+def _page_event(page_number: int, page: Dict[str, Any]) -> Dict[str, Any]:
+    # Line-preserving text, so normalization can tell headers, rows and
+    # boilerplate lines apart (see normalization_agent/compaction.py)
+    event = {**_page_summary(page_number, page), "text": clean_ocr_text(page["text"])["struct_text"].strip()}
+    if page.get("tables"):
+        event["compact_text"] = page["compact"]
+    return event
+
+
+def _page_layout(page_number: int, page: Dict[str, Any]) -> Dict[str, Any]:
+    return {"page": page_number, "compact": page.get("compact", ""), "tables": page.get("tables", [])}
+
+
+def extract_text_from_image(image_path: Path, language: str = 'eng', single_pass: bool = True,
+                            on_page: Optional[PageCallback] = None,
+                            preprocess: Optional[PreprocessOptions] = None) -> tuple:
+    """
+    Extract text from image using Tesseract OCR
+    
+    Args:
+        image_path: Path to image file
+        language: Tesseract language code (default: 'eng')
+        single_pass: run Tesseract once per page (see ocr_image)
+        on_page: called with each page's summary and cleaned text once it is OCR'd
+        preprocess: image preprocessing applied before OCR (None: raw image)
+    
+    Returns:
+        (extracted text, average confidence, per-page timings, per-page compact text and tables)
+    """
+    try:
+        page = ocr_page((image_path, language, single_pass, preprocess))
+        if on_page:
+            on_page(_page_event(1, page))
+
+        confs = page["confs"]
+        avg_conf = float(sum(confs) / len(confs)) if confs else None
+        return page["text"], avg_conf, [_page_summary(1, page)], [_page_layout(1, page)]
+    except Exception as e:
+        logger.error(f"Error extracting text from image: {str(e)}")
+        raise
+
+def _page_runs(page_numbers: List[int], window: int) -> Iterator[Tuple[int, int]]:
+    """Group sorted page numbers into (first, last) runs of consecutive pages, at most `window` long."""
+    start = prev = None
+    for n in page_numbers:
+        if start is not None and n == prev + 1 and n - start < window:
+            prev = n
+            continue
+        if start is not None:
+            yield start, prev
+        start = prev = n
+    if start is not None:
+        yield start, prev
+
+
+def iter_pdf_pages(pdf_path: Path, output_folder: str, dpi: int = 300, window: int = 1,
+                   page_numbers: Optional[List[int]] = None) -> Iterator[Path]:
+    """
+    Rasterize a PDF lazily, `window` pages per pdftoppm call, into
+    output_folder and yield the rendered page files in order. Only the pages
+    currently being OCR'd exist at any time; callers delete each file once
+    its page is done.
+
+    Args:
+        pdf_path: Path to PDF file
+        output_folder: Directory the page images are written to
+        dpi: DPI for PDF to image conversion
+        window: Number of pages rendered per batch
+        page_numbers: 1-based pages to render, ascending (default: all)
+
+    Returns:
+        Iterator over rendered page image paths
+    """
+    if page_numbers is None:
+        page_numbers = list(range(1, int(pdfinfo_from_path(pdf_path).get("Pages", 0)) + 1))
+    for first, last in _page_runs(page_numbers, max(1, window)):
+        paths = convert_from_path(
+            pdf_path, dpi=dpi, first_page=first, last_page=last,
+            output_folder=output_folder, paths_only=True,
+        )
+        for path in paths:
+            yield Path(path)
+
+
+def render_pdf_page(pdf_path: Path, output_folder: str, page_number: int, dpi: int) -> Path:
+    """Rasterize a single PDF page into output_folder and return the file."""
+    paths = convert_from_path(
+        pdf_path, dpi=dpi, first_page=page_number, last_page=page_number,
+        output_folder=output_folder, paths_only=True,
+    )
+    return Path(paths[0])
+
+
+def extract_text_from_pdf(pdf_path: Path, language: str = 'eng', dpi: int = 300, single_pass: bool = True,
+                          executor: Optional[OcrExecutor] = None, window: int = 1,
+                          on_page: Optional[PageCallback] = None,
+                          preprocess: Optional[PreprocessOptions] = None,
+                          adaptive_dpi: Optional[int] = None, min_confidence: float = 75.0,
+                          text_layer: bool = True, text_min_chars: int = 20,
+                          max_image_coverage: float = 0.5) -> tuple:
+    """
+    Extract text from PDF using Tesseract OCR
+    
+    Args:
+        pdf_path: Path to PDF file
+        language: Tesseract language code (default: 'eng')
+        dpi: DPI for PDF to image conversion
+        adaptive_dpi: when lower than dpi, OCR every page at this DPI first and
+            re-render at `dpi` only pages whose mean word confidence is below
+            min_confidence (or that have no words); re-renders are submitted
+            to the executor while the first pass continues
+        min_confidence: confidence threshold for adaptive_dpi
+        text_layer: take the text of born-digital pages from the PDF's embedded
+            text layer (pdftotext) and OCR only pages without usable text
+        text_min_chars: letters/digits a page's text layer needs to be used
+        max_image_coverage: pages whose raster images cover more than this
+            share of the page are OCR'd even with a usable text layer (a scan
+            with a digital overlay); the layer's extra lines are appended
+        single_pass: run Tesseract once per page (see ocr_image)
+        executor: OCR executor the pages are fanned out to (default: serial)
+        window: Number of pages rasterized per batch (see iter_pdf_pages)
+        on_page: called with each page's summary and cleaned text, in page order, as soon as it is OCR'd
+        preprocess: image preprocessing applied to each rendered page before OCR
+    
+    Returns:
+        (text from all pages, average confidence, per-page timings, per-page compact text and tables)
+    """
+    try:
+        executor = executor or SerialOcrExecutor()
+
+        all_text = []
+        all_confs = []
+        pages = []
+        layouts = []
+
+        first_dpi = adaptive_dpi if adaptive_dpi and adaptive_dpi < dpi else dpi
+
+        page_count = int(pdfinfo_from_path(pdf_path).get("Pages", 0))
+        text_start = time.perf_counter()
+        layer = pdf_text_layer(pdf_path) if text_layer else None
+        if layer is not None and len(layer) != page_count:
+            logger.warning(f"pdftotext returned {len(layer)} pages for {page_count}; ignoring the text layer")
+            layer = None
+        digital = {n for n in range(1, page_count + 1) if layer and is_usable_text(layer[n - 1], text_min_chars)}
+        scanned = set()
+        if digital:
+            coverage = pdf_image_coverage(pdf_path, page_count) or {}
+            scanned = {n for n in digital if coverage.get(n, 0.0) > max_image_coverage}
+            if scanned:
+                logger.info(f"OCR'ing pages {sorted(scanned)} despite their text layer: mostly covered by images")
+            digital -= scanned
+        text_seconds = (time.perf_counter() - text_start) / len(digital) if digital else 0.0
+        ocr_numbers = [n for n in range(1, page_count + 1) if n not in digital]
+
+        def finish(page_number: int, page: Dict[str, Any]) -> None:
+            all_text.append(page["text"])
+            all_confs.extend(page["confs"])
+            pages.append(_page_summary(page_number, page))
+            layouts.append(_page_layout(page_number, page))
+            if on_page:
+                on_page(_page_event(page_number, page))
+
+        def resolve(page_number: int, page: Dict[str, Any], retry: Optional["Future[Dict[str, Any]]"]) -> Dict[str, Any]:
+            if retry is not None:
+                low_conf = _mean_conf(page["confs"])
+                logger.info(f"Re-rendered page {page_number} at {dpi} DPI (confidence {low_conf} at {first_dpi} DPI)")
+                high = retry.result()
+                high["dpi"] = dpi
+                high["seconds"] += page["seconds"]
+                high["low_dpi_confidence"] = round(low_conf, 1) if low_conf is not None else None
+                page = high
+            if page_number in scanned:
+                page["text"] = merge_text_layer(page["text"], layer[page_number - 1])
+                page["source"] = "ocr+text_layer"
+            return page
+
+        # Pages in page order; a low-confidence page waits here for its
+        # high-DPI retry while later first-pass results keep coming in
+        pending: Deque[Tuple[int, Dict[str, Any], Optional["Future[Dict[str, Any]]"]]] = deque()
+
+        def flush(wait: bool) -> None:
+            while pending and (wait or pending[0][2] is None or pending[0][2].done()):
+                finish(pending[0][0], resolve(*pending[0]))
+                pending.popleft()
+
+        with tempfile.TemporaryDirectory(prefix="pages-") as output_folder:
+            rendered = []
+
+            def tasks():
+                for path in iter_pdf_pages(pdf_path, output_folder, dpi=first_dpi, window=window, page_numbers=ocr_numbers):
+                    rendered.append(path)
+                    yield (path, language, single_pass, preprocess)
+
+            ocr_results = executor.map(ocr_page, tasks())
+            try:
+                for i in range(page_count):
+                    if i + 1 in digital:
+                        page = {"text": layer[i].strip(), "confs": [], "seconds": text_seconds, "source": "text_layer"}
+                        page["compact"], page["tables"] = detect_tables(lines_from_layout_text(layer[i]))
+                        pending.append((i + 1, page, None))
+                        flush(wait=False)
+                        continue
+
+                    page = next(ocr_results)
+                    logger.info(f"Processed page {i + 1} in {page['seconds']:.2f}s")
+                    rendered.pop(0).unlink(missing_ok=True)
+                    page["dpi"] = first_dpi
+                    low_conf = _mean_conf(page["confs"])
+                    retry = None
+                    if first_dpi < dpi and (low_conf is None or low_conf < min_confidence):
+                        path = render_pdf_page(pdf_path, output_folder, i + 1, dpi)
+                        retry = executor.submit(ocr_page, (path, language, single_pass, preprocess))
+                        retry.add_done_callback(lambda _, path=path: path.unlink(missing_ok=True))
+                    pending.append((i + 1, page, retry))
+                    flush(wait=False)
+                flush(wait=True)
+            finally:
+                for _, _, retry in pending:
+                    if retry is not None:
+                        retry.cancel()
+
+        joined = "\n\n".join(all_text)
+        avg_conf = float(sum(all_confs) / len(all_confs)) if all_confs else None
+
+        return joined, avg_conf, pages, layouts
+    
+    except Exception as e:
+        logger.error(f"Error extracting text from PDF: {str(e)}")
+        raise
+
+def extract_metadata(text: str) -> Dict[str, Any]:
+    """
+    Extract metadata from text (titles, dates, etc.)
+    
+    Args:
+        text: Extracted text
+    
+    Returns:
+        Dictionary with metadata
+    """
+    metadata = {
+        "title": None,
+        "dates": [],
+        "emails": [],
+        "urls": [],
+        "word_count": 0,
+        "line_count": 0
+    }
+    
+    lines = text.split('\n')
+    metadata["line_count"] = len(lines)
+    metadata["word_count"] = len(text.split())
+    
+
+    for line in lines:
+        if line.strip():
+            metadata["title"] = line.strip()
+            break
+    
+
+    date_pattern = r'\b\d{1,2}[-/]\d{1,2}[-/]\d{2,4}\b|\b\d{4}[-/]\d{1,2}[-/]\d{1,2}\b'
+    metadata["dates"] = re.findall(date_pattern, text)
+    
+
+    email_pattern = r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b'
+    metadata["emails"] = re.findall(email_pattern, text)
+    
+
+    url_pattern = r'http[s]?://(?:[a-zA-Z]|[0-9]|[$-_@.&+]|[!*\\(\\),]|(?:%[0-9a-fA-F][0-9a-fA-F]))+'
+    metadata["urls"] = re.findall(url_pattern, text)
+    
+    return metadata
+
+def structure_text(text: str) -> Dict[str, Any]:
+    """
+    Structure extracted text into sections
+    
+    Args:
+        text: Extracted text
+    
+    Returns:
+        Structured dictionary
+    """
+    lines = [line.strip() for line in text.split('\n') if line.strip()]
+    
+    structure = {
+        "paragraphs": [],
+        "sections": []
+    }
+    
+    current_paragraph = []
+    
+    for line in lines:
+        if line.isupper() or line.endswith(':'):
+            if current_paragraph:
+                structure["paragraphs"].append(" ".join(current_paragraph))
+                current_paragraph = []
+            structure["sections"].append(line)
+        else:
+            current_paragraph.append(line)
+    
+    if current_paragraph:
+        structure["paragraphs"].append(" ".join(current_paragraph))
+    
+    return structure
+
+def clean_ocr_text(raw: str) -> Dict[str, str]:
+    """
+    Normalize OCR text:
+      - convert escaped backslash sequences like '\\n' or '\\t' into actual whitespace
+      - create 'struct_text' where multiple consecutive newlines are collapsed to one (keeps paragraph boundaries)
+      - create 'raw_text' where all whitespace becomes single spaces (suitable for storage / display)
+    Returns dict with keys: 'raw_text', 'struct_text', 'orig'
+    """
+    if raw is None:
+        return {"raw_text": "", "struct_text": "", "orig": ""}
+
+    text = raw.replace('\\r\\n', '\n').replace('\\n', '\n').replace('\\r', '\n').replace('\\t', ' ')
+    
+    struct_text = re.sub(r'\n{2,}', '\n\n', text)  # keep paragraph breaks (double newline) but normalize runs
+    struct_text = re.sub(r'[ \t]+$', '', struct_text, flags=re.M)  # trim trailing spaces on lines
+
+    raw_text = re.sub(r'\s+', ' ', text).strip()
+
+    return {"raw_text": raw_text, "struct_text": struct_text, "orig": text}
+
+def process_document(file_path: Path, filename: str, executor: Optional[OcrExecutor] = None,
+                     raster_window: int = 1, language: str = 'eng',
+                     on_page: Optional[PageCallback] = None,
+                     preprocess: Optional[PreprocessOptions] = None,
+                     dpi: int = 300, adaptive_dpi: Optional[int] = None,
+                     min_confidence: float = 75.0, text_layer: bool = True,
+                     text_min_chars: int = 20, max_image_coverage: float = 0.5) -> ExtractResponse:
+    """
+    Process document and return structured JSON
+    
+    Args:
+        file_path: Path to document
+        filename: Original filename
+        executor: OCR executor used for multi-page PDFs
+        raster_window: Number of PDF pages rasterized at a time
+        language: Tesseract language code
+        on_page: per-page callback (see extract_text_from_pdf); runs on the calling thread
+        preprocess: image preprocessing applied before OCR (see preprocessing.py)
+        dpi: PDF rasterization DPI
+        adaptive_dpi, min_confidence: low-DPI first pass for PDFs (see extract_text_from_pdf)
+        text_layer, text_min_chars, max_image_coverage: use born-digital PDFs' embedded text instead of OCR
+    
+    Returns:
+        Dictionary with extracted data
+    """
+    file_extension = file_path.suffix.lower()
+    
+    with PeakMemoryMonitor() as memory:
+        if file_extension == '.pdf':
+            text, conf, pages, layouts = extract_text_from_pdf(
+                file_path, language=language, dpi=dpi, executor=executor, window=raster_window,
+                on_page=on_page, preprocess=preprocess, adaptive_dpi=adaptive_dpi, min_confidence=min_confidence,
+                text_layer=text_layer, text_min_chars=text_min_chars, max_image_coverage=max_image_coverage,
+            )
+        else:
+            text, conf, pages, layouts = extract_text_from_image(file_path, language=language, on_page=on_page, preprocess=preprocess)
+
+
+    cleaned = clean_ocr_text(text)
+    raw_text = cleaned["raw_text"]
+    struct_input = cleaned["struct_text"]
+
+    metadata = extract_metadata(struct_input)
+    metadata["pages"] = pages
+    metadata["ocr_seconds"] = round(sum(p["seconds"] for p in pages), 3)
+    metadata["text_layer_pages"] = sum(1 for p in pages if p["source"] == "text_layer")
+    metadata["peak_rss_mb"] = memory.peak_mb
+    structure = structure_text(struct_input)
+    tables = [{"page": layout["page"], **table} for layout in layouts for table in layout["tables"]]
+    if tables:
+        # Grade grids rebuilt from word positions; compact_text is the whole
+        # document with each grid as TSV, the preferred input for normalization
+        structure["tables"] = tables
+        structure["compact_text"] = "\n\n".join(layout["compact"] for layout in layouts if layout["compact"])
+    
+    conf_value = None
+    if conf is not None:
+        try:
+            conf_value = f"{conf:.1f}"
+        except Exception:
+            conf_value = None
+
+    result = {
+        "status": "success",
+        "filename": filename,
+        "file_type": file_extension,
+        "text": struct_input,
+        "raw_text": raw_text,
+        "metadata": metadata,
+        "structure": structure,
+        "confidence": conf_value if conf_value is not None else ("high" if len(raw_text) > 100 else "low")
+    }
+
     return ExtractResponse(**result)
\ No newline at end of file
@@ -1,8 +1,8 @@
-import os
-    
-def get_env(name: str, default: str = None) -> str:
-    v = os.getenv(name)
-    if v is not None:
-        return v
-    return default
-
+import os
+    
+def get_env(name: str, default: str = None) -> str:
+    v = os.getenv(name)
+    if v is not None:
+        return v
+    return default
+
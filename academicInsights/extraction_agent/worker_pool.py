@@ -0,0 +1,69 @@
+import asyncio
+import functools
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict
+
+logger = logging.getLogger(__name__)
+
+
+class WorkerPoolFull(Exception):
+    pass
+
+
+class WorkerPool:
+    """
+    Runs blocking extraction jobs on a dedicated thread pool so the event
+    loop keeps serving /health and uploads while OCR runs.
+
+    At most `max_concurrency` jobs run at once and up to `max_queue` more may
+    wait for a slot; anything beyond that is rejected with WorkerPoolFull so
+    callers can apply backpressure. Counters are only touched on the event
+    loop, so no locking is needed.
+    """
+
+    def __init__(self, max_concurrency: int = 2, max_queue: int = 16):
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_queue = max(0, max_queue)
+        self.running = 0
+        self.queued = 0
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._executor = ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix="extraction")
+
+    async def run(self, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        if self._semaphore.locked() and self.queued >= self.max_queue:
+            raise WorkerPoolFull(f"extraction queue is full ({self.running} running, {self.queued} queued)")
+
+        self.queued += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.queued -= 1
+
+        loop = asyncio.get_running_loop()
+        self.running += 1
+        try:
+            future = self._executor.submit(functools.partial(fn, *args, **kwargs))
+        except Exception:
+            self._release()
+            raise
+        # Release the slot when the thread finishes, not when the awaiting
+        # request goes away, so a disconnected client cannot oversubscribe.
+        future.add_done_callback(lambda _: loop.call_soon_threadsafe(self._release))
+        return await asyncio.wrap_future(future)
+
+    def _release(self) -> None:
+        self.running -= 1
+        self._semaphore.release()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "running": self.running,
+            "queued": self.queued,
+            "in_flight": self.running + self.queued,
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+        }
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
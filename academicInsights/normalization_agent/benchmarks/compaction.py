@@ -0,0 +1,45 @@
+"""
+Measure prompt compaction on saved OCR text.
+
+Runs compaction.compact_text over every .txt file in a directory (e.g. the
+`text` field of extraction responses) and reports tokens before and after,
+what each step removed and how long compaction took.
+
+Usage (from normalization_agent/):
+    python -m benchmarks.compaction path/to/ocr_texts [--budget 3000] [--model gpt-4o-mini]
+"""
+import argparse
+import time
+from pathlib import Path
+
+from compaction import PROMPT_TOKEN_BUDGET, compact_text
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("sample_dir", type=Path)
+    parser.add_argument("--budget", type=int, default=PROMPT_TOKEN_BUDGET)
+    parser.add_argument("--model", default="gpt-4o-mini")
+    args = parser.parse_args()
+
+    paths = sorted(args.sample_dir.glob("*.txt"))
+    if not paths:
+        raise SystemExit(f"No .txt files found in {args.sample_dir}")
+
+    total_before = total_after = 0
+    for path in paths:
+        start = time.perf_counter()
+        _, stats = compact_text(path.read_text(encoding="utf-8"), model=args.model, budget=args.budget)
+        ms = (time.perf_counter() - start) * 1000
+        total_before += stats["tokens_before"]
+        total_after += stats["tokens_after"]
+        print(f"{path.name:<32} {stats['tokens_before']:6d} -> {stats['tokens_after']:6d} tokens  "
+              f"dup {stats['duplicate_lines']:3d}  garbage {stats['garbage_tokens']:4d}  "
+              f"boilerplate {stats['boilerplate_lines']:3d}  truncated {stats['truncated_lines']:3d}  {ms:6.1f} ms")
+
+    print(f"total: {total_before} -> {total_after} tokens ({stats['tokenizer']})"
+          f"  saved {100 * (1 - total_after / max(1, total_before)):.1f}%")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Micro-benchmark for recovering JSON from malformed LLM replies.
+
+Compares json_recovery.recover_json with the previous prefix-retry
+approach (json.loads on every s[start:end], longest first) on replies
+shaped like real gpt-4o-mini failures: code fences, trailing prose
+(also with a fenced snippet), trailing commas and truncated output.
+
+Usage (from normalization_agent/):
+    python -m benchmarks.json_recovery [--repeat 20]
+"""
+import argparse
+import json
+import re
+import time
+from typing import Any, Callable, Dict, Optional
+
+from json_recovery import recover_json
+
+
+def prefix_retry(s: str) -> Optional[Any]:
+    """The pre-recover_json strategy, kept here as the baseline."""
+    match = re.search(r"(\{|\[)", s)
+    if not match:
+        return None
+    start = match.start(1)
+    for end in range(len(s), start, -1):
+        try:
+            return json.loads(s[start:end])
+        except Exception:
+            continue
+    return None
+
+
+def _report_card(subjects: int) -> Dict[str, Any]:
+    return {
+        "meta": {"source": "extraction_agent", "raw_format": "text", "extraction_confidence": "0.87"},
+        "student": {"student_id": "20231187", "first_name": "Lerato", "last_name": "Mokoena",
+                    "date_of_birth": "2011-04-02", "grade_level": "7", "class_name": "7B",
+                    "school_name": "Laerskool Rietvlei"},
+        "summary": "Consistent progress across the year with strong results in languages.",
+        "subjects": [
+            {"subject": f"Subject {i}", "term": "2024",
+             "quarter_grades": {"Q1": 61 + i % 30, "Q2": 64 + i % 25, "Q3": None, "Q4": 70 + i % 20},
+             "numeric_grade": 65.0 + i % 20, "letter_grade": "C",
+             "teacher_comments": "Works well in class; needs to complete homework on time. " * 2,
+             "competencies": {"reading": "proficient", "problem solving": "developing"}}
+            for i in range(subjects)
+        ],
+        "attendance": {"days_present": 182, "days_absent": 4},
+        "behavior": [{"date": None, "note": "Helpful to classmates.", "teacher": "Mr Dlamini"}],
+        "overall_gpa": 3.1,
+        "recommendations": ["Practice fractions weekly with past papers."],
+    }
+
+
+def samples(subjects: int) -> Dict[str, str]:
+    body = json.dumps(_report_card(subjects), indent=2)
+    return {
+        "code_fence": f"```json\n{body}\n```",
+        "trailing_prose": body + "\n\nNote: Q3 grades were not present in the input, so they were set to null. "
+                                 "Let me know if you need {anything} else!",
+        "trailing_fence": body + "\n\nExample of a subject entry:\n```json\n{\"subject\": \"...\"}\n```",
+        "trailing_commas": re.sub(r"(\]|\}|\"|\d|null)\n(\s*)(\]|\})", r"\1,\n\2\3", body),
+        "truncated_tail": body[: int(len(body) * 0.8)],
+        "truncated_in_string": body[: body.rfind("homework") + 4],
+    }
+
+
+def bench(fn: Callable[[str], Optional[Any]], text: str, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn(text)
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--subjects", type=int, default=40, help="subjects per report card (controls reply size)")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    expected = _report_card(args.subjects)
+    print(f"{'case':<22}{'chars':>8}{'prefix-retry ms':>18}{'recover_json ms':>18}  recovered")
+    for name, text in samples(args.subjects).items():
+        baseline_repeat = max(1, args.repeat // 10)
+        old_ms = bench(prefix_retry, text, baseline_repeat)
+        new_ms = bench(recover_json, text, args.repeat)
+        # Truncated replies can only come back partial
+        recovered = recover_json(text)
+        outcome = "exact" if recovered == expected else "partial" if recovered is not None else "failed"
+        print(f"{name:<22}{len(text):>8}{old_ms:>18.2f}{new_ms:>18.3f}  {outcome}")
+
+
+if __name__ == "__main__":
+    main()
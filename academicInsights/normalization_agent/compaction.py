@@ -0,0 +1,196 @@
+import functools
+import logging
+import math
+import re
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from utils.settings import get_env, get_int_env
+
+logger = logging.getLogger(__name__)
+
+# Prompt input budget in tokens; 0 disables truncation (the other steps still run)
+PROMPT_TOKEN_BUDGET = get_int_env("PROMPT_TOKEN_BUDGET", 3000)
+COMPACTION_ENABLED = get_env("PROMPT_COMPACTION", "true").lower() in ("1", "true", "yes")
+
+# Short lines matching one of these (case-insensitive) are collapsed into one
+# marker; in longer lines only the phrase itself is removed. Extend with
+# BOILERPLATE_PHRASES_FILE (one phrase per line).
+DEFAULT_BOILERPLATE_PHRASES = (
+    "this report is confidential",
+    "this document is the property of",
+    "not valid without",
+    "any alteration",
+    "official school stamp",
+    "signature of parent",
+    "parent/guardian signature",
+    "principal's signature",
+    "all rights reserved",
+    "printed on",
+    "page {n} of",
+)
+BOILERPLATE_MARKER = "[boilerplate omitted]"
+
+# Lines that look like part of the grade record are kept first when truncating
+_RELEVANT_WORDS = re.compile(
+    r"\b(subject|term|quarter|grade|mark|score|average|total|result|attendance|absent|present|"
+    r"learner|student|name|class|school|comment|remark|teacher|pass|fail|promoted|position|gpa)\w*",
+    re.IGNORECASE,
+)
+_DIGIT = re.compile(r"\d")
+_PUNCT_RUN = re.compile(r"([^\w\s])\1{2,}")
+_SENTENCE_END = re.compile(r"(?<=[.!?;])\s+")
+_WHITESPACE = re.compile(r"[ \u00a0]+")
+# Longer single lines (whitespace-collapsed OCR text) are split into sentences
+_MAX_LINE_CHARS = 200
+# Lines shorter than this are never treated as duplicates (grades, initials)
+_MIN_DEDUP_CHARS = 8
+# Boilerplate lines up to this long are replaced as a whole; a longer line
+# (e.g. a whole page collapsed into one line) only loses the phrase
+_MAX_BOILERPLATE_LINE_CHARS = 160
+
+
+@functools.lru_cache(maxsize=8)
+def _encoding(model: str):
+    try:
+        import tiktoken
+    except ImportError:
+        return None
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("o200k_base")
+
+
+def count_tokens(text: str, model: str = "gpt-4o-mini") -> Tuple[int, str]:
+    """
+    Tokens in `text` for `model` with tiktoken when it is installed;
+    otherwise estimated as one token per 4 characters.
+    Returns (count, "tiktoken" | "estimate").
+    """
+    encoding = _encoding(model)
+    if encoding is None:
+        return math.ceil(len(text) / 4), "estimate"
+    return len(encoding.encode(text, disallowed_special=())), "tiktoken"
+
+
+@functools.lru_cache(maxsize=1)
+def boilerplate_patterns() -> Tuple[re.Pattern, ...]:
+    phrases = list(DEFAULT_BOILERPLATE_PHRASES)
+    path = get_env("BOILERPLATE_PHRASES_FILE")
+    if path:
+        try:
+            phrases.extend(line.strip() for line in Path(path).read_text(encoding="utf-8").splitlines() if line.strip())
+        except OSError as e:
+            logger.warning("Could not read BOILERPLATE_PHRASES_FILE %s: %s", path, e)
+    # "{n}" stands for any number ("page {n} of")
+    return tuple(re.compile(re.escape(p.lower()).replace(r"\{n\}", r"\d+"), re.IGNORECASE) for p in phrases)
+
+
+def _is_garbage(token: str) -> bool:
+    """OCR noise: a token of 2+ characters that is mostly not letters or digits ("|\\/~", ";:'")."""
+    if len(token) < 2:
+        return not token.isalnum() and token not in "-&/%:"
+    alnum = sum(ch.isalnum() for ch in token)
+    return alnum / len(token) < 0.5
+
+
+def _clean_line(line: str) -> Tuple[str, int]:
+    """Drop garbage tokens and punctuation runs; tab-separated cells are cleaned one by one."""
+    dropped = 0
+    cells = []
+    for cell in line.split("\t"):
+        cell = _PUNCT_RUN.sub(" ", cell)
+        tokens = []
+        for token in _WHITESPACE.split(cell.strip()):
+            if not token:
+                continue
+            if _is_garbage(token):
+                dropped += 1
+            else:
+                tokens.append(token)
+        cells.append(" ".join(tokens))
+    cleaned = "\t".join(cells) if "\t" in line else cells[0]
+    return (cleaned if cleaned.strip() else ""), dropped
+
+
+def _segments(text: str) -> List[str]:
+    segments = []
+    for line in text.splitlines():
+        if len(line) > _MAX_LINE_CHARS and "\t" not in line:
+            segments.extend(_SENTENCE_END.split(line))
+        else:
+            segments.append(line)
+    return segments
+
+
+def _relevance(line: str) -> int:
+    score = len(_RELEVANT_WORDS.findall(line)) * 2 + min(len(_DIGIT.findall(line)), 4)
+    return score + 4 if "\t" in line else score
+
+
+def compact_text(text: str, model: str = "gpt-4o-mini", budget: Optional[int] = None) -> Tuple[str, Dict[str, Any]]:
+    """
+    Shrink OCR text before it goes into the normalization prompt:
+
+    1. drop garbage tokens (punctuation runs, mostly non-alphanumeric tokens)
+    2. drop lines already seen (case/whitespace-insensitive), e.g. headers
+       repeated on every page of a PDF; TSV rows are kept, since every table
+       needs its own header row
+    3. collapse short lines matching a boilerplate phrase into one marker
+       and remove just the phrase from longer lines
+    4. when still over `budget` tokens (default PROMPT_TOKEN_BUDGET; 0 or
+       None disables), keep the most grade-like lines (tables, numbers,
+       subject/term/attendance words) in their original order
+
+    Returns (compacted text, stats with token counts before and after).
+    """
+    budget = PROMPT_TOKEN_BUDGET if budget is None else budget
+    tokens_before, tokenizer = count_tokens(text, model)
+    stats: Dict[str, Any] = {"tokens_before": tokens_before, "tokenizer": tokenizer,
+                             "duplicate_lines": 0, "garbage_tokens": 0, "boilerplate_lines": 0, "truncated_lines": 0}
+
+    patterns = boilerplate_patterns()
+    seen = set()
+    lines: List[str] = []
+    for segment in _segments(text):
+        line, dropped = _clean_line(segment)
+        stats["garbage_tokens"] += dropped
+        if not line:
+            continue
+        key = _WHITESPACE.sub(" ", line.lower()).strip()
+        if "\t" not in line and len(key) >= _MIN_DEDUP_CHARS:
+            if key in seen:
+                stats["duplicate_lines"] += 1
+                continue
+            seen.add(key)
+        matched = [p for p in patterns if p.search(line)]
+        if matched:
+            stats["boilerplate_lines"] += 1
+            if len(line) > _MAX_BOILERPLATE_LINE_CHARS:
+                for pattern in matched:
+                    line = pattern.sub(" ", line)
+                line = _WHITESPACE.sub(" ", line).strip()
+                if not line:
+                    continue
+            elif lines and lines[-1] == BOILERPLATE_MARKER:
+                continue
+            else:
+                line = BOILERPLATE_MARKER
+        lines.append(line)
+
+    compacted = "\n".join(lines)
+    if budget and count_tokens(compacted, model)[0] > budget:
+        costs = [count_tokens(line, model)[0] + 1 for line in lines]
+        ranked = sorted(range(len(lines)), key=lambda i: (-_relevance(lines[i]), i))
+        keep, used = set(), 0
+        for i in ranked:
+            if used + costs[i] <= budget:
+                keep.add(i)
+                used += costs[i]
+        stats["truncated_lines"] = len(lines) - len(keep)
+        compacted = "\n".join(line for i, line in enumerate(lines) if i in keep)
+
+    stats["tokens_after"] = count_tokens(compacted, model)[0]
+    stats["budget"] = budget or None
+    return compacted, stats
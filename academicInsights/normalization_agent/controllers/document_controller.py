@@ -1,45 +1,64 @@
-from fastapi import APIRouter, HTTPException, status
-from fastapi.responses import JSONResponse
-import logging
-import asyncio
-
-from models.Request import NormalizeInput
-from models.Response import NormalizeResponse
-from services.normalization_service import normalize_document
-
-logger = logging.getLogger(__name__)
-
-router = APIRouter()
-
-
-@router.get("/health")
-async def health_check():
-    return {"status": "healthy", "service": "normalization_agent"}
-
-
-@router.post("/translate")
-async def translate_text(payload: NormalizeInput) -> JSONResponse:
-    try:
-        if not payload.text:
-            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Provide 'text' to translate")
-        from translation import translate_to_english
-
-        translated = await asyncio.to_thread(translate_to_english, payload.text)
-        return JSONResponse({"status": "success", "original": payload.text, "translated": translated}, status_code=status.HTTP_200_OK)
-    except HTTPException:
-        raise
-    except Exception as e:
-        logger.exception("Translation endpoint error: %s", e)
-        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Translation failed")
-
-
-@router.post("/normalize")
-async def normalize(payload: NormalizeInput) -> JSONResponse:
-    try:
-        result = await normalize_document(payload)
-        return JSONResponse(content=result, status_code=status.HTTP_200_OK)
-    except ValueError as ve:
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(ve))
-    except Exception as e:
-        logger.exception("Normalization endpoint error: %s", e)
-        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Normalization failed")
+from fastapi import APIRouter, HTTPException, status
+from fastapi.responses import JSONResponse
+import asyncio
+import logging
+
+from models.Request import NormalizeInput
+from models.Response import NormalizeResponse
+from services.normalization_service import normalize_document, translate_if_needed, translation_stats, language_gate
+from utils.llm_cache import cache as llm_cache
+from translation import llm_stats
+from mapping import prompt_registry
+from layouts import layout_registry
+from utils.http import connection_stats
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+
+@router.get("/health")
+async def health_check():
+    return {"status": "healthy", "service": "normalization_agent"}
+
+
+@router.get("/stats")
+async def stats():
+    # The disk cache counts its files, so keep that off the event loop
+    cache_stats = await asyncio.to_thread(llm_cache.stats)
+    return {"llm_cache": cache_stats, "llm": llm_stats(), "translation": translation_stats(),
+            "prompts": prompt_registry.versions(), "http": connection_stats(), "layouts": layout_registry.stats()}
+
+
+@router.post("/detect-language")
+async def detect_text_language(payload: NormalizeInput) -> JSONResponse:
+    if not payload.text:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Provide 'text' to detect")
+    return JSONResponse({"status": "success", "language": language_gate(payload.text, payload.source_language)},
+                        status_code=status.HTTP_200_OK)
+
+
+@router.post("/translate")
+async def translate_text(payload: NormalizeInput) -> JSONResponse:
+    try:
+        if not payload.text:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Provide 'text' to translate")
+        translated, language = await translate_if_needed(payload.text, payload.source_language, model=payload.model or "gpt-4o-mini")
+        return JSONResponse({"status": "success", "original": payload.text, "translated": translated, "language": language}, status_code=status.HTTP_200_OK)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.exception("Translation endpoint error: %s", e)
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Translation failed")
+
+
+@router.post("/normalize")
+async def normalize(payload: NormalizeInput) -> JSONResponse:
+    try:
+        result = await normalize_document(payload)
+        return JSONResponse(content=result, status_code=status.HTTP_200_OK)
+    except ValueError as ve:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(ve))
+    except Exception as e:
+        logger.exception("Normalization endpoint error: %s", e)
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Normalization failed")
@@ -0,0 +1,206 @@
+import functools
+import json
+import logging
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from utils.settings import get_env
+
+logger = logging.getLogger(__name__)
+
+QUARTERS = ("Q1", "Q2", "Q3", "Q4")
+
+
+@dataclass(frozen=True)
+class GradingRules:
+    """
+    How a school turns quarter grades into derived fields.
+
+    - letter_bands: (lowest numeric grade, letter), highest band first
+    - gpa_points: grade points per letter; overall_gpa is their mean
+    - pass_mark: a subject passes at numeric_grade >= pass_mark
+    - max_failed_subjects: the year passes with at most this many failed
+      subjects and an average of at least pass_mark
+    - quarter_weights: weight per quarter for the subject average (missing
+      quarters are left out and the remaining weights renormalized)
+    - trend_drop: a quarter-on-quarter drop of at least this many points is
+      called out in the recommendations
+    - scale_max: the top of the grade scale the bands and pass mark are on
+    - explicit: the rules came from GRADING_RULES_FILE rather than the
+      built-in percentage defaults
+    """
+
+    name: str = "default"
+    letter_bands: Tuple[Tuple[float, str], ...] = ((85.0, "A"), (70.0, "B"), (50.0, "C"), (0.0, "D"))
+    gpa_points: Dict[str, float] = field(default_factory=lambda: {"A": 4.0, "B": 3.0, "C": 2.0, "D": 1.0})
+    pass_mark: float = 50.0
+    max_failed_subjects: int = 0
+    quarter_weights: Dict[str, float] = field(default_factory=lambda: {q: 1.0 for q in QUARTERS})
+    trend_drop: float = 10.0
+    decimals: int = 1
+    scale_max: float = 100.0
+    explicit: bool = False
+
+    @classmethod
+    def from_dict(cls, name: str, raw: Dict[str, Any]) -> "GradingRules":
+        kwargs: Dict[str, Any] = {"name": name, "explicit": True}
+        if "letter_bands" in raw:
+            # {"A": 85, "B": 70, ...} or [[85, "A"], ...]
+            bands = raw["letter_bands"]
+            pairs = [(float(v), k) for k, v in bands.items()] if isinstance(bands, dict) else [(float(t), l) for t, l in bands]
+            kwargs["letter_bands"] = tuple(sorted(pairs, reverse=True))
+        for key in ("gpa_points", "quarter_weights"):
+            if key in raw:
+                kwargs[key] = {k: float(v) for k, v in raw[key].items()}
+        for key in ("pass_mark", "trend_drop", "scale_max"):
+            if key in raw:
+                kwargs[key] = float(raw[key])
+        for key in ("max_failed_subjects", "decimals"):
+            if key in raw:
+                kwargs[key] = int(raw[key])
+        return cls(**kwargs)
+
+    def letter_for(self, grade: float) -> Optional[str]:
+        for threshold, letter in self.letter_bands:
+            if grade >= threshold:
+                return letter
+        return None
+
+
+DEFAULT_RULES = GradingRules()
+
+
+@functools.lru_cache(maxsize=4)
+def _load_rules_file(path: str) -> Dict[str, Any]:
+    try:
+        return json.loads(Path(path).read_text(encoding="utf-8"))
+    except (OSError, ValueError) as e:
+        logger.warning("Could not load GRADING_RULES_FILE %s: %s; using default rules", path, e)
+        return {}
+
+
+def rules_for_school(school_name: Optional[str]) -> GradingRules:
+    """
+    Grading rules from GRADING_RULES_FILE:
+    `{"default": {...}, "schools": {"<school name>": {...}}}`, where a school
+    entry overrides the default keys it sets. Schools are matched by name,
+    case-insensitively; without a file or a match DEFAULT_RULES apply.
+    """
+    path = get_env("GRADING_RULES_FILE")
+    config = _load_rules_file(path) if path else {}
+    base = config.get("default") or {}
+    schools = {name.strip().lower(): rules for name, rules in (config.get("schools") or {}).items()}
+    school = schools.get((school_name or "").strip().lower())
+    if school is not None:
+        return GradingRules.from_dict(school_name.strip(), {**base, **school})
+    if base:
+        return GradingRules.from_dict("default", base)
+    return DEFAULT_RULES
+
+
+def _number(value: Any) -> Optional[float]:
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        return float(str(value).strip().rstrip("%").replace(",", "."))
+    except ValueError:
+        return None
+
+
+def _weighted_average(quarters: Dict[str, Optional[float]], rules: GradingRules) -> Optional[float]:
+    present = [(q, v) for q, v in quarters.items() if v is not None]
+    total_weight = sum(rules.quarter_weights.get(q, 1.0) for q, _ in present)
+    if not present or total_weight <= 0:
+        return None
+    return sum(rules.quarter_weights.get(q, 1.0) * v for q, v in present) / total_weight
+
+
+def _trend_note(subject: str, quarters: Dict[str, Optional[float]], rules: GradingRules) -> Optional[str]:
+    values = [(q, quarters[q]) for q in QUARTERS if quarters.get(q) is not None]
+    for (prev_q, prev), (q, value) in zip(values, values[1:]):
+        if prev - value >= rules.trend_drop:
+            return f"{subject}: dropped from {prev:g} in {prev_q} to {value:g} in {q}; review the {q} material."
+    return None
+
+
+def fits_scale(grades: List[float], rules: GradingRules) -> bool:
+    """
+    Whether `grades` look like they are on the rules' scale: all within
+    0..scale_max and not all in its bottom tenth, which is where 4.0 GPA or
+    1-7 grades land on a percentage scale.
+    """
+    return bool(grades) and all(0 <= g <= rules.scale_max for g in grades) and max(grades) > rules.scale_max / 10
+
+
+def apply_grading(card: Any, rules: GradingRules, overwrite: bool = True) -> Dict[str, Any]:
+    """
+    Fill the derived fields of a ReportCard in place from its raw values:
+    per-subject numeric_grade (average of quarter_grades), letter_grade and
+    passed; overall_gpa; pass_or_fail with pass_fail_reason; and, when the
+    card has none, short recommendations for failed or declining subjects.
+
+    Averages are always filled in. Letters, pass/fail, GPA and
+    recommendations depend on the scale, so they are derived only with
+    explicit (GRADING_RULES_FILE) rules or when the grades fit the default
+    rules' scale. Letter grades already on the card are never replaced;
+    with overwrite=False an existing numeric_grade and overall_gpa are kept
+    too. Returns a summary for the card's meta.
+    """
+    derived = set()
+    for subject in card.subjects:
+        quarters = {q: _number(v) for q, v in (subject.quarter_grades or {}).items() if q in QUARTERS}
+        average = _weighted_average(quarters, rules)
+        if average is not None and (overwrite or subject.numeric_grade is None):
+            subject.numeric_grade = round(average, rules.decimals)
+            derived.add("numeric_grade")
+
+    numeric = [s.numeric_grade for s in card.subjects if s.numeric_grade is not None]
+    if not rules.explicit and not fits_scale(numeric, rules):
+        return {"rules": rules.name, "derived": sorted(derived),
+                "skipped": f"grades do not fit the 0-{rules.scale_max:g} scale of the default rules"}
+
+    points: List[float] = []
+    grades: List[float] = []
+    failed: List[str] = []
+    notes: List[str] = []
+
+    for subject in card.subjects:
+        quarters = {q: _number(v) for q, v in (subject.quarter_grades or {}).items() if q in QUARTERS}
+        if subject.numeric_grade is not None:
+            if not subject.letter_grade:
+                subject.letter_grade = rules.letter_for(subject.numeric_grade)
+                derived.add("letter_grade")
+            subject.passed = subject.numeric_grade >= rules.pass_mark
+            grades.append(subject.numeric_grade)
+            if not subject.passed:
+                failed.append(subject.subject)
+                notes.append(f"{subject.subject}: {subject.numeric_grade:g} is below the pass mark of {rules.pass_mark:g}; "
+                             f"plan extra practice and check in with the teacher.")
+        if subject.letter_grade in rules.gpa_points:
+            points.append(rules.gpa_points[subject.letter_grade])
+        note = _trend_note(subject.subject, quarters, rules)
+        if note:
+            notes.append(note)
+
+    if points and (overwrite or card.overall_gpa is None):
+        card.overall_gpa = round(sum(points) / len(points), 2)
+        derived.add("overall_gpa")
+
+    if grades:
+        average = sum(grades) / len(grades)
+        passed = len(failed) <= rules.max_failed_subjects and average >= rules.pass_mark
+        card.pass_or_fail = "pass" if passed else "fail"
+        reason = f"average {average:.{rules.decimals}f} (pass mark {rules.pass_mark:g})"
+        if failed:
+            reason += f"; failed {len(failed)} subject(s): {', '.join(failed)} (allowed {rules.max_failed_subjects})"
+        card.pass_fail_reason = reason
+        derived.add("pass_or_fail")
+
+    if not card.recommendations and notes:
+        card.recommendations = notes
+        derived.add("recommendations")
+
+    return {"rules": rules.name, "derived": sorted(derived)}
@@ -0,0 +1,151 @@
+from typing import Any, List, Optional, Tuple
+import json
+import re
+
+_FENCE = re.compile(r"```[a-zA-Z0-9_-]*[ \t]*\r?\n?")
+_OPEN = re.compile(r"[\{\[]")
+_CLOSERS = {"{": "}", "[": "]"}
+_WHITESPACE = " \t\r\n"
+_STRING_BODY = re.compile(r'(?:[^"\\]|\\.)*', re.S)
+_PLAIN = re.compile(r'[^"{}\[\],]+')
+
+
+def _strip_code_fence(s: str) -> str:
+    """
+    Return the body of the first ``` fenced block when it opens before the
+    first bracket, or s unchanged. A fence after that is part of trailing
+    prose (e.g. an example snippet), not the wrapper of the JSON.
+    """
+    match = _FENCE.search(s)
+    if not match:
+        return s
+    bracket = _OPEN.search(s)
+    if bracket and bracket.start() < match.start():
+        return s
+    end = s.find("```", match.end())
+    return s[match.end():end] if end != -1 else s[match.end():]
+
+
+def _rstrip_out(out: List[str]) -> None:
+    while out and not out[-1].strip(_WHITESPACE):
+        out.pop()
+    if out:
+        out[-1] = out[-1].rstrip(_WHITESPACE)
+
+
+def _scan(s: str, start: int) -> Tuple[List[str], bool, List[str], Optional[Tuple[int, int]]]:
+    """
+    Single pass over s[start:] that copies the first JSON value while
+    dropping trailing commas, and stops at the matching close bracket so
+    any trailing prose is ignored. Strings and runs of plain characters are
+    copied as whole chunks with regexes, so the Python loop only runs per
+    structural character.
+
+    Returns (chunks, complete, open brackets, last safe point). The safe
+    point is (number of chunks, bracket depth) at the last place where the
+    value could be cut and closed cleanly, used to repair truncated output.
+    """
+    out: List[str] = []
+    stack: List[str] = []
+    safe: Optional[Tuple[int, int]] = None
+    i, n = start, len(s)
+
+    while i < n:
+        ch = s[i]
+        if ch == '"':
+            end = _STRING_BODY.match(s, i + 1).end()
+            if end < n and s[end] == '"':
+                out.append(s[i:end + 1])
+                i = end + 1
+                continue
+            # Unterminated string (a dangling backslash is simply dropped)
+            out.append(s[i:end] + '"')
+            break
+        if ch in _CLOSERS:
+            stack.append(ch)
+            out.append(ch)
+            safe = (len(out), len(stack))
+        elif ch in "}]":
+            if not stack or _CLOSERS[stack[-1]] != ch:
+                # Mismatched bracket: treat everything from here on as garbage
+                break
+            _rstrip_out(out)
+            if out and out[-1] == ",":
+                out.pop()
+            stack.pop()
+            out.append(ch)
+            if not stack:
+                return out, True, stack, safe
+            safe = (len(out), len(stack))
+        elif ch == ",":
+            _rstrip_out(out)
+            if out and out[-1] not in ("[", "{", ","):
+                safe = (len(out), len(stack))
+                out.append(ch)
+        else:
+            end = _PLAIN.match(s, i).end()
+            out.append(s[i:end])
+            i = end
+            continue
+        i += 1
+
+    return out, False, stack, safe
+
+
+def _close(text: str, stack: List[str]) -> str:
+    text = text.rstrip(_WHITESPACE)
+    if text.endswith(","):
+        text = text[:-1]
+    return text + "".join(_CLOSERS[b] for b in reversed(stack))
+
+
+def _loads(candidate: str) -> Optional[Any]:
+    try:
+        return json.loads(candidate, strict=False)
+    except ValueError:
+        return None
+
+
+def recover_json(s: str) -> Optional[Any]:
+    """
+    Recover a JSON object/array from a malformed LLM reply in linear time.
+
+    Handles Markdown code fences, leading/trailing prose, trailing commas and
+    truncated output (unterminated strings, missing closing brackets,
+    dangling keys). Each candidate body (the fenced block, then the whole
+    reply when the block holds no usable JSON) gets one scan and at most
+    three json.loads calls.
+
+    Returns the parsed value, or None when nothing usable is found.
+    """
+    if not s:
+        return None
+    body = _strip_code_fence(s)
+    parsed = _recover(body)
+    if parsed is None and body != s:
+        parsed = _recover(s)
+    return parsed
+
+
+def _recover(body: str) -> Optional[Any]:
+    match = _OPEN.search(body)
+    if not match:
+        return None
+
+    # Common case: the value is fine once the fence/leading prose is gone
+    parsed = _loads(body[match.start():])
+    if parsed is not None:
+        return parsed
+
+    chunks, complete, stack, safe = _scan(body, match.start())
+    text = "".join(chunks)
+    if complete:
+        return _loads(text)
+
+    parsed = _loads(_close(text, stack))
+    if parsed is not None or safe is None:
+        return parsed
+
+    # Cut back to the last complete element and close what was open there
+    length, depth = safe
+    return _loads(_close("".join(chunks[:length]), stack[:depth]))
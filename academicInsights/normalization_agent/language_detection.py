@@ -0,0 +1,36 @@
+from typing import Optional, Tuple
+import logging
+import re
+
+from langdetect import DetectorFactory, LangDetectException, detect_langs
+
+logger = logging.getLogger(__name__)
+
+# langdetect is randomized by default; seed it so the same text always
+# gets the same answer (and the same translation/caching decision).
+DetectorFactory.seed = 0
+
+_NOISE = re.compile(r"[\d\W_]+", re.UNICODE)
+
+
+def detection_sample(text: str, sample_chars: int = 2000) -> str:
+    """The first `sample_chars` characters of `text` with digits/punctuation removed."""
+    return _NOISE.sub(" ", (text or "")[:sample_chars]).strip()
+
+
+def detect_language(text: str, sample_chars: int = 2000) -> Tuple[Optional[str], float]:
+    """
+    Detect the dominant language of `text` locally.
+    Only the detection_sample is inspected, which is plenty for a report
+    card and keeps this fast.
+    Returns (ISO 639-1 code or None, probability).
+    """
+    sample = detection_sample(text, sample_chars)
+    if not sample:
+        return None, 0.0
+    try:
+        best = detect_langs(sample)[0]
+    except LangDetectException as e:
+        logger.debug("Language detection failed: %s", e)
+        return None, 0.0
+    return best.lang, float(best.prob)
@@ -0,0 +1,314 @@
+import json
+import logging
+import re
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, FrozenSet, List, Optional, Pattern, Tuple
+
+from pydantic import ValidationError
+
+from mapping import ReportCard
+from grading import apply_grading, rules_for_school
+from utils.settings import get_env, get_float_env
+
+logger = logging.getLogger(__name__)
+
+# Header tokens are words of 3+ letters from the first lines of the text
+_TOKEN = re.compile(r"[^\W\d_]{3,}", re.UNICODE)
+_QUARTER_GROUPS = ("Q1", "Q2", "Q3", "Q4")
+
+
+@dataclass(frozen=True)
+class Fingerprint:
+    """Layout features of an extracted text: header tokens and the column counts of its TSV tables."""
+
+    header_tokens: FrozenSet[str]
+    table_columns: Tuple[int, ...]
+
+
+def fingerprint(text: str, header_lines: int = 15) -> Fingerprint:
+    lines = [line for line in text.splitlines() if line.strip()]
+    tokens = frozenset(t.upper() for line in lines[:header_lines] for t in _TOKEN.findall(line))
+    shapes: List[int] = []
+    previous = 0
+    for line in lines:
+        columns = line.count("\t") + 1 if "\t" in line else 0
+        if columns and columns != previous:
+            shapes.append(columns)
+        previous = columns
+    return Fingerprint(tokens, tuple(shapes))
+
+
+def _tsv_tables(text: str) -> List[List[List[str]]]:
+    """Runs of consecutive tab-separated lines (structure.compact_text tables)."""
+    tables: List[List[List[str]]] = []
+    current: List[List[str]] = []
+    for line in text.splitlines():
+        if "\t" in line:
+            current.append([cell.strip() for cell in line.split("\t")])
+        elif current:
+            tables.append(current)
+            current = []
+    if current:
+        tables.append(current)
+    return tables
+
+
+def _set_path(target: Dict[str, Any], path: str, value: Any) -> None:
+    *parents, leaf = path.split(".")
+    for part in parents:
+        target = target.setdefault(part, {})
+    target[leaf] = value
+
+
+def _get_path(source: Dict[str, Any], path: str) -> Any:
+    for part in path.split("."):
+        if not isinstance(source, dict):
+            return None
+        source = source.get(part)
+    return source
+
+
+def _grade(value: Optional[str]) -> Any:
+    if value is None or not value.strip():
+        return None
+    value = value.strip()
+    try:
+        return float(value.rstrip("%").replace(",", "."))
+    except ValueError:
+        return value
+
+
+@dataclass(frozen=True)
+class Layout:
+    """
+    One school information system's report card layout, loaded from a JSON
+    file in the layouts directory:
+
+        {
+          "name": "acme_sis",
+          "match": {"header_tokens": ["ACME", "PROGRESS", "REPORT"], "table_columns": 6},
+          "fields": {"student.last_name": "Surname:\\s*(.+)", "attendance.days_absent": "Absent:\\s*(\\d+)"},
+          "subjects": {"table": 0, "header_rows": 1, "subject_column": 0,
+                       "quarter_columns": {"Q1": 1, "Q2": 2, "Q3": 3, "Q4": 4}},
+          "subject_names": {"Wiskunde": "Mathematics"},
+          "required": ["student.last_name"]
+        }
+
+    `fields` maps dotted ReportCard paths to regexes whose first group is
+    the value. Subjects come either from a TSV table (`table`, columns) or
+    from lines matching `subjects.row_pattern` with named groups `subject`,
+    Q1..Q4 and optionally `letter_grade` / `teacher_comments`.
+    """
+
+    name: str
+    header_tokens: FrozenSet[str]
+    table_columns: Optional[int]
+    fields: Tuple[Tuple[str, Pattern], ...]
+    subjects: Dict[str, Any]
+    row_pattern: Optional[Pattern]
+    stop_pattern: Optional[Pattern]
+    subject_names: Dict[str, str] = field(default_factory=dict)
+    required: Tuple[str, ...] = ()
+    source: str = ""
+
+    @classmethod
+    def from_dict(cls, raw: Dict[str, Any], source: str = "") -> "Layout":
+        """Build a layout from its JSON; raises ValueError (or KeyError / re.error) for an unusable file."""
+        match = raw.get("match") or {}
+        subjects = raw.get("subjects") or {}
+        fields = tuple((path, re.compile(pattern, re.IGNORECASE | re.MULTILINE)) for path, pattern in (raw.get("fields") or {}).items())
+        for path, pattern in fields:
+            if pattern.groups > 1:
+                raise ValueError(f"field {path}: pattern must have at most one group, has {pattern.groups}")
+        row_pattern = re.compile(subjects["row_pattern"], re.IGNORECASE | re.MULTILINE) if subjects.get("row_pattern") else None
+        if row_pattern is not None:
+            if "subject" not in row_pattern.groupindex:
+                raise ValueError("subjects.row_pattern has no 'subject' group")
+            if not any(q in row_pattern.groupindex for q in _QUARTER_GROUPS):
+                raise ValueError(f"subjects.row_pattern has none of the groups {', '.join(_QUARTER_GROUPS)}")
+        else:
+            columns = subjects.get("quarter_columns") or {}
+            if not columns or not all(isinstance(c, int) and c >= 0 for c in columns.values()):
+                raise ValueError("subjects needs a row_pattern or quarter_columns mapping quarters to column indexes")
+        return cls(
+            name=raw["name"],
+            header_tokens=frozenset(t.upper() for t in match.get("header_tokens", [])),
+            table_columns=match.get("table_columns"),
+            fields=fields,
+            subjects=subjects,
+            row_pattern=row_pattern,
+            stop_pattern=re.compile(subjects["stop_pattern"], re.IGNORECASE) if subjects.get("stop_pattern") else None,
+            subject_names={k.lower(): v for k, v in (raw.get("subject_names") or {}).items()},
+            required=tuple(raw.get("required") or ()),
+            source=source,
+        )
+
+    def matches(self, fp: Fingerprint) -> bool:
+        if not self.header_tokens or not self.header_tokens <= fp.header_tokens:
+            return False
+        return self.table_columns is None or self.table_columns in fp.table_columns
+
+    def _subject(self, name: str, quarters: Dict[str, Any], **extra: Any) -> Dict[str, Any]:
+        name = name.strip()
+        subject = {"subject": self.subject_names.get(name.lower(), name), "quarter_grades": quarters}
+        subject.update({k: v.strip() for k, v in extra.items() if v and v.strip()})
+        return subject
+
+    def _table_subjects(self, text: str) -> List[Dict[str, Any]]:
+        tables = _tsv_tables(text)
+        if self.table_columns is not None:
+            tables = [t for t in tables if len(t[0]) == self.table_columns]
+        index = self.subjects.get("table", 0)
+        if index >= len(tables):
+            return []
+        name_column = self.subjects.get("subject_column", 0)
+        quarter_columns = self.subjects.get("quarter_columns") or {}
+        subjects = []
+        for row in tables[index][self.subjects.get("header_rows", 1):]:
+            if name_column >= len(row) or not row[name_column]:
+                continue
+            if self.stop_pattern and self.stop_pattern.search(row[name_column]):
+                break
+            quarters = {q: _grade(row[c]) if c < len(row) else None for q, c in quarter_columns.items()}
+            subjects.append(self._subject(row[name_column], quarters))
+        return subjects
+
+    def _pattern_subjects(self, text: str) -> List[Dict[str, Any]]:
+        subjects = []
+        for m in self.row_pattern.finditer(text):
+            groups = m.groupdict()
+            if not groups.get("subject"):
+                continue
+            if self.stop_pattern and self.stop_pattern.search(groups.get("subject") or ""):
+                break
+            quarters = {q: _grade(groups.get(q)) for q in _QUARTER_GROUPS if q in groups}
+            subjects.append(self._subject(groups["subject"], quarters,
+                                          letter_grade=groups.get("letter_grade"), teacher_comments=groups.get("teacher_comments")))
+        return subjects
+
+    def extract(self, text: str) -> Optional[Dict[str, Any]]:
+        """ReportCard fields from `text`, or None when a required field or all subjects are missing."""
+        data: Dict[str, Any] = {"student": {}}
+        for path, pattern in self.fields:
+            m = pattern.search(text)
+            if m:
+                value = m.group(1) if m.groups() else m.group(0)
+                if value is None:
+                    # The group is optional and did not take part in the match
+                    continue
+                value = value.strip()
+                if path.startswith("attendance."):
+                    value = int(value) if value.isdigit() else None
+                _set_path(data, path, value)
+        data["subjects"] = self._pattern_subjects(text) if self.row_pattern else self._table_subjects(text)
+        if not data["subjects"] or any(not _get_path(data, path) for path in self.required):
+            return None
+        return data
+
+
+class LayoutRegistry:
+    """
+    Layouts loaded from *.json in `directory`, re-scanned at most every
+    `reload_interval` seconds (files are re-read only when the set of
+    files or their mtimes change). Keeps fast-path hit/miss counters.
+    """
+
+    def __init__(self, directory: Optional[Path], reload_interval: float = 30.0):
+        self.directory = directory
+        self.reload_interval = reload_interval
+        self._lock = threading.Lock()
+        self._layouts: Tuple[Layout, ...] = ()
+        self._signature: Tuple[Tuple[str, float], ...] = ()
+        self._checked_at = 0.0
+        self.counters: Dict[str, Any] = {"hits": 0, "misses": 0, "fallbacks": 0, "by_layout": {}}
+        self._refresh()
+
+    def _refresh(self) -> None:
+        self._checked_at = time.monotonic()
+        if self.directory is None or not self.directory.is_dir():
+            return
+        files = sorted(self.directory.glob("*.json"))
+        signature = tuple((str(p), p.stat().st_mtime) for p in files)
+        if signature == self._signature:
+            return
+        layouts = []
+        for path in files:
+            try:
+                layouts.append(Layout.from_dict(json.loads(path.read_text(encoding="utf-8")), source=str(path)))
+            except (OSError, ValueError, KeyError, re.error) as e:
+                logger.warning("Skipping layout %s: %s", path, e)
+        self._layouts = tuple(layouts)
+        self._signature = signature
+        logger.info("Loaded %s report card layouts from %s", len(layouts), self.directory)
+
+    def layouts(self) -> Tuple[Layout, ...]:
+        if time.monotonic() - self._checked_at >= self.reload_interval:
+            with self._lock:
+                if time.monotonic() - self._checked_at >= self.reload_interval:
+                    self._refresh()
+        return self._layouts
+
+    def _count(self, outcome: str, layout: Optional[str] = None) -> None:
+        with self._lock:
+            self.counters[outcome] += 1
+            if layout:
+                self.counters["by_layout"][layout] = self.counters["by_layout"].get(layout, 0) + 1
+
+    def normalize(self, text: str) -> Optional[ReportCard]:
+        """
+        Fill a ReportCard from the first layout whose fingerprint matches
+        `text`, with derived fields from the school's grading rules. Returns
+        None on a miss (or when the matched layout cannot read the text), so
+        the caller falls back to the LLM.
+        """
+        layouts = self.layouts()
+        if not layouts:
+            return None
+        start = time.perf_counter()
+        fp = fingerprint(text)
+        for layout in layouts:
+            if not layout.matches(fp):
+                continue
+            try:
+                data = layout.extract(text)
+            except Exception as e:
+                logger.warning("Layout %s failed on the document (%s: %s); using the LLM", layout.name, type(e).__name__, e)
+                self._count("fallbacks")
+                return None
+            if data is None:
+                logger.info("Layout %s matched but could not read the document; using the LLM", layout.name)
+                self._count("fallbacks")
+                return None
+            try:
+                card = ReportCard.parse_obj(data)
+            except ValidationError as e:
+                logger.warning("Layout %s produced an invalid report card: %s", layout.name, e)
+                self._count("fallbacks")
+                return None
+            grading = apply_grading(card, rules_for_school(card.student.school_name), overwrite=False)
+            card.meta.update({"layout": layout.name, "grading": grading,
+                              "layout_ms": round((time.perf_counter() - start) * 1000, 3)})
+            self._count("hits", layout.name)
+            return card
+        self._count("misses")
+        return None
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counters = {**self.counters, "by_layout": dict(self.counters["by_layout"])}
+        lookups = counters["hits"] + counters["misses"] + counters["fallbacks"]
+        return {
+            **counters,
+            "hit_rate": round(counters["hits"] / lookups, 3) if lookups else None,
+            "layouts": [layout.name for layout in self._layouts],
+        }
+
+
+_layouts_dir = get_env("LAYOUTS_DIR", str(Path(__file__).parent / "layouts"))
+layout_registry = LayoutRegistry(
+    Path(_layouts_dir) if get_env("LAYOUT_FAST_PATH", "true").lower() in ("1", "true", "yes") else None,
+    reload_interval=get_float_env("LAYOUT_RELOAD_INTERVAL", 30.0),
+)
@@ -1,22 +1,34 @@
-from fastapi import FastAPI
-import uvicorn
-import logging
-
-from controllers.document_controller import router as document_router
-
-logging.basicConfig(level=logging.INFO)
-logger = logging.getLogger(__name__)
-
-app = FastAPI(title="Normalization Agent", version="1.0.0")
-
-app.include_router(document_router)
-
-
-@app.get("/health")
-async def health_root():
-    return {"status": "healthy", "service": "normalization_agent"}
-
-
-if __name__ == "__main__":
-    logger.info("Starting Normalization Agent on port 8002...")
+from contextlib import asynccontextmanager
+from fastapi import FastAPI
+import uvicorn
+import logging
+
+from controllers.document_controller import router as document_router
+from translation import close_client
+from utils.http import start_client as start_http_client, close_client as close_http_client
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await start_http_client()
+    yield
+    await close_http_client()
+    await close_client()
+
+
+app = FastAPI(title="Normalization Agent", version="1.0.0", lifespan=lifespan)
+
+app.include_router(document_router)
+
+
+@app.get("/health")
+async def health_root():
+    return {"status": "healthy", "service": "normalization_agent"}
+
+
+if __name__ == "__main__":
+    logger.info("Starting Normalization Agent on port 8002...")
     uvicorn.run(app, host="0.0.0.0", port=8002, log_level="info")
\ No newline at end of file
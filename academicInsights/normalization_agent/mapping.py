@@ -1,222 +1,312 @@
-from typing import List, Optional, Union, Dict, Any
-from pydantic import BaseModel, Field, ValidationError
-from pathlib import Path
-import json
-import logging
-import re
-
-from translation import client as llm_client
-
-logger = logging.getLogger(__name__)
-logger.addHandler(logging.NullHandler())
-
-#TODO: Refactor and move the models (prompt as well)
-# -- Schema models --
-class StudentInfo(BaseModel):
-    student_id: Optional[str] = None
-    first_name: Optional[str] = None
-    last_name: Optional[str] = None
-    date_of_birth: Optional[str] = None
-    grade_level: Optional[str] = None
-    class_name: Optional[str] = None
-    school_name: Optional[str] = None
-
-
-class SubjectGrade(BaseModel):
-    subject: str
-    term: Optional[str] = None
-    numeric_grade: Optional[float] = None
-    letter_grade: Optional[str] = None
-    teacher_comments: Optional[str] = None
-    competencies: Optional[Dict[str, Any]] = None
-
-
-class Attendance(BaseModel):
-    days_present: Optional[int] = None
-    days_absent: Optional[int] = None
-    tardies: Optional[int] = None
-
-
-class BehaviorNote(BaseModel):
-    date: Optional[str] = None
-    note: str
-    teacher: Optional[str] = None
-
-
-class ReportCard(BaseModel):
-    meta: Dict[str, Any] = Field(default_factory=dict)
-    student: StudentInfo
-    summary: Optional[str] = None
-    subjects: List[SubjectGrade] = Field(default_factory=list)
-    attendance: Optional[Attendance] = None
-    behavior: Optional[List[BehaviorNote]] = None
-    overall_gpa: Optional[float] = None
-    recommendations: Optional[List[str]] = None
-
-
-_PROMPT_PATHS = [
-    Path(__file__).parent / "prompts" / "report_prompt.json",
-    Path(__file__).parent.parent / "prompts" / "report_prompt.json",
-]
-
-_DEFAULT_PROMPT = """
-You are a data normalizer. Given the input text or extracted fields from a report card, produce a JSON object that exactly matches the following schema (no extra fields):
-
-Schema:
-{{
-  "meta": {{ "source": "<string>", "raw_format": "<string>", "extraction_confidence": "<0-1>" }},
-  "student": {{
-    "student_id": "<string|null>",
-    "first_name": "<string|null>",
-    "last_name": "<string|null>",
-    "date_of_birth": "<ISO date|null>",
-    "grade_level": "<string|null>",
-    "class_name": "<string|null>",
-    "school_name": "<string|null>"
-  }},
-  "summary": "<short human-readable summary|null>",
-  "subjects": [
-    {{
-      "subject": "<string>",
-      "term": "<string|null>",
-      "quarter_grades": {{
-          "Q1": <number|null>,
-          "Q2": <number|null>,
-          "Q3": <number|null>,
-          "Q4": <number|null>
-      }},
-      "numeric_grade": <number|null>,
-      "letter_grade": "<string|null>",
-      "teacher_comments": "<string|null>",
-      "competencies": {{ "<competency_name>": "<level>" }}
-    }}
-  ],
-  "attendance": {{
-    "days_present": <int|null>,
-    "days_absent": <int|null>,
-  }},
-  "behavior": [
-    {{ "date": "<date|null>", "note": "<string>", "teacher": "<string|null>" }}
-  ],
-  "overall_gpa": <number|null>,
-  "recommendations": ["<string>"],
-}}
-
-Rules:
-1. Output must be valid JSON only (no explanations).
-2. When a value is missing use null.
-3. Use the numeric values in the raw text **exactly as they appear** for each subject and map them to Q1, Q2, Q3, Q4 based on order.
-4. If a subject has only one grade, place it in Q4 and set other quarters to null.
-5. Compute 'numeric_grade' as the average of all quarters that are present.
-6. Compute 'letter_grade' based on numeric_grade (A: 85-100, B: 70-84, C: 50-69, D: <50).
-7. Include any free-text comments under 'teacher_comments'.
-8. For recommendations, provide detailed, actionable, analytics-based advice.
-9. Fill 'pass_or_fail' based on school passing rules and explain in 'pass_fail_reason'.
-
-Input:
-{input_text}
-
-Return only the JSON.
-"""
-
-
-
-def _load_external_prompt() -> Optional[str]:
-    for p in _PROMPT_PATHS:
-        if p.exists():
-            try:
-                raw = json.loads(p.read_text(encoding="utf-8"))
-                if isinstance(raw, dict):
-                    return raw.get("prompt") or raw.get("template") or None
-                if isinstance(raw, str):
-                    return raw
-            except Exception as e:
-                logger.warning("failed loading prompt %s: %s", p, e)
-    return None
-
-
-def build_llm_prompt(input_text: str, source: str = "unknown", raw_format: str = "text") -> str:
-    template = _load_external_prompt() or _DEFAULT_PROMPT
-    if input_text is None:
-        input_text = ""
-    prompt = template.replace("{input_text}", input_text)
-    prompt += f"\n\nMeta: source={source}, raw_format={raw_format}\n"
-    return prompt
-
-
-def _extract_json_candidate(s: str) -> Optional[str]:
-    match = re.search(r"(\{|\[)", s)
-    if not match:
-        return None
-    start = match.start(1)
-    for end in range(len(s), start, -1):
-        candidate = s[start:end]
-        try:
-            json.loads(candidate)
-            return candidate
-        except Exception:
-            continue
-    return None
-
-
-def call_llm(prompt: str, model: str = "gpt-4o-mini", temperature: float = 0.0, max_tokens: int = 4000) -> str:
-    """
-    Call the LLM and return raw text content.
-    Uses the OpenAI client exported from translation.py.
-    """
-    try:
-        resp = llm_client.chat.completions.create(
-            model=model,
-            messages=[{"role": "user", "content": prompt}],
-            temperature=temperature,
-            max_tokens=max_tokens,
-        )
-        content = resp.choices[0].message.content.strip()
-        return content
-    except Exception as e:
-        logger.exception("LLM call failed: %s", e)
-        raise
-
-
-def parse_llm_json(output: Union[str, Dict[str, Any]]) -> ReportCard:
-    if isinstance(output, dict):
-        parsed = output
-    else:
-        try:
-            parsed = json.loads(output)
-        except Exception:
-            candidate = _extract_json_candidate(output)
-            if not candidate:
-                logger.error("LLM output is not valid JSON and no candidate was found")
-                raise ValueError("LLM output is not valid JSON")
-            parsed = json.loads(candidate)
-
-    try:
-        return ReportCard.parse_obj(parsed)
-    except ValidationError as ve:
-        logger.error("LLM output failed schema validation: %s", ve)
-        raise
-
-
-def normalize_with_llm(raw: Union[str, Dict[str, Any]],
-                       source: str = "unknown",
-                       raw_format: str = "text",
-                       model: str = "gpt-4o-mini",
-                       temperature: float = 0.0) -> ReportCard:
-    """
-    Always use the LLM:
-     - build the prompt from raw (string or dict)
-     - call the LLM
-     - parse and validate the JSON into a ReportCard and return it
-    """
-    if isinstance(raw, dict):
-        try:
-            input_text = json.dumps(raw, ensure_ascii=False, indent=2)
-        except Exception:
-            input_text = str(raw)
-    else:
-        input_text = str(raw or "")
-
-    prompt = build_llm_prompt(input_text, source=source, raw_format=raw_format)
-    raw_output = call_llm(prompt, model=model, temperature=temperature)
-    return parse_llm_json(raw_output)
\ No newline at end of file
+from typing import Callable, List, Optional, Union, Dict, Any
+from pydantic import BaseModel, Field, ValidationError
+from pathlib import Path
+import json
+import logging
+
+from translation import client as llm_client, llm_slot, record_usage
+from utils.llm_cache import cache as llm_cache
+from json_recovery import recover_json
+from prompt_registry import PromptRegistry, PromptTemplate
+from compaction import COMPACTION_ENABLED, compact_text
+from grading import apply_grading, rules_for_school
+from utils.settings import get_env, get_float_env
+
+logger = logging.getLogger(__name__)
+logger.addHandler(logging.NullHandler())
+
+#TODO: Refactor and move the models (prompt as well)
+# -- Schema models --
+class StudentInfo(BaseModel):
+    student_id: Optional[str] = None
+    first_name: Optional[str] = None
+    last_name: Optional[str] = None
+    date_of_birth: Optional[str] = None
+    grade_level: Optional[str] = None
+    class_name: Optional[str] = None
+    school_name: Optional[str] = None
+
+
+class SubjectGrade(BaseModel):
+    subject: str
+    term: Optional[str] = None
+    # Raw grades as printed (numbers, or letters on letter-only reports)
+    quarter_grades: Optional[Dict[str, Any]] = None
+    numeric_grade: Optional[float] = None
+    letter_grade: Optional[str] = None
+    teacher_comments: Optional[str] = None
+    competencies: Optional[Dict[str, Any]] = None
+    passed: Optional[bool] = None
+
+
+class Attendance(BaseModel):
+    days_present: Optional[int] = None
+    days_absent: Optional[int] = None
+    tardies: Optional[int] = None
+
+
+class BehaviorNote(BaseModel):
+    date: Optional[str] = None
+    note: str
+    teacher: Optional[str] = None
+
+
+class ReportCard(BaseModel):
+    meta: Dict[str, Any] = Field(default_factory=dict)
+    student: StudentInfo
+    summary: Optional[str] = None
+    subjects: List[SubjectGrade] = Field(default_factory=list)
+    attendance: Optional[Attendance] = None
+    behavior: Optional[List[BehaviorNote]] = None
+    overall_gpa: Optional[float] = None
+    pass_or_fail: Optional[str] = None
+    pass_fail_reason: Optional[str] = None
+    recommendations: Optional[List[str]] = None
+
+
+_DEFAULT_PROMPT = """
+You are a data normalizer. Given the input text or extracted fields from a report card, produce a JSON object that exactly matches the following schema (no extra fields):
+
+Schema:
+{{
+  "meta": {{ "source": "<string>", "raw_format": "<string>", "extraction_confidence": "<0-1>" }},
+  "student": {{
+    "student_id": "<string|null>",
+    "first_name": "<string|null>",
+    "last_name": "<string|null>",
+    "date_of_birth": "<ISO date|null>",
+    "grade_level": "<string|null>",
+    "class_name": "<string|null>",
+    "school_name": "<string|null>"
+  }},
+  "summary": "<short human-readable summary|null>",
+  "subjects": [
+    {{
+      "subject": "<string>",
+      "term": "<string|null>",
+      "quarter_grades": {{
+          "Q1": <number|null>,
+          "Q2": <number|null>,
+          "Q3": <number|null>,
+          "Q4": <number|null>
+      }},
+      "numeric_grade": <number|null>,
+      "letter_grade": "<string|null>",
+      "teacher_comments": "<string|null>",
+      "competencies": {{ "<competency_name>": "<level>" }}
+    }}
+  ],
+  "attendance": {{
+    "days_present": <int|null>,
+    "days_absent": <int|null>,
+  }},
+  "behavior": [
+    {{ "date": "<date|null>", "note": "<string>", "teacher": "<string|null>" }}
+  ],
+  "overall_gpa": <number|null>,
+  "recommendations": ["<string>"],
+}}
+
+Rules:
+1. Output must be valid JSON only (no explanations).
+2. When a value is missing use null.
+3. Use the numeric values in the raw text **exactly as they appear** for each subject and map them to Q1, Q2, Q3, Q4 based on order.
+4. If a subject has only one grade, place it in Q4 and set other quarters to null.
+5. Compute 'numeric_grade' as the average of all quarters that are present.
+6. Compute 'letter_grade' based on numeric_grade (A: 85-100, B: 70-84, C: 50-69, D: <50).
+7. Include any free-text comments under 'teacher_comments'.
+8. For recommendations, provide detailed, actionable, analytics-based advice.
+9. Fill 'pass_or_fail' based on school passing rules and explain in 'pass_fail_reason'.
+
+Input:
+{input_text}
+
+Return only the JSON.
+"""
+
+
+# Extraction-only template: the model returns raw values and grading.py
+# derives averages, letters, GPA, pass/fail and recommendations locally,
+# which keeps the completion (the slow part) short.
+_EXTRACT_PROMPT = """
+Extract the report card in the input into a JSON object with exactly this shape (no extra fields):
+
+{
+  "student": {"student_id": null, "first_name": null, "last_name": null, "date_of_birth": null,
+              "grade_level": null, "class_name": null, "school_name": null},
+  "summary": "<one sentence|null>",
+  "subjects": [
+    {"subject": "<string>", "term": "<string|null>",
+     "quarter_grades": {"Q1": <number|null>, "Q2": <number|null>, "Q3": <number|null>, "Q4": <number|null>},
+     "letter_grade": "<only if printed, else null>", "teacher_comments": "<string|null>"}
+  ],
+  "attendance": {"days_present": <int|null>, "days_absent": <int|null>, "tardies": <int|null>},
+  "behavior": [{"date": "<date|null>", "note": "<string>", "teacher": "<string|null>"}]
+}
+
+Rules:
+1. Output valid JSON only. Use null for anything not in the input and omit empty lists.
+2. Copy grades exactly as printed, in term order into Q1..Q4; a subject with a single grade goes in Q4.
+3. Do not compute averages, letter grades, GPA, pass/fail or recommendations.
+4. Dates as ISO 8601 when unambiguous.
+
+Input:
+{input_text}
+
+Return only the JSON.
+"""
+
+# Template used by normalize_with_llm: "report_extract" (raw values, derived
+# fields computed locally) or "report" (the model fills in everything)
+NORMALIZATION_TEMPLATE = get_env("NORMALIZATION_TEMPLATE", "report_extract")
+if NORMALIZATION_TEMPLATE not in ("report", "report_extract"):
+    logger.warning("Unknown NORMALIZATION_TEMPLATE '%s', using report_extract", NORMALIZATION_TEMPLATE)
+    NORMALIZATION_TEMPLATE = "report_extract"
+
+
+# Prepended to the template in single-call mode so the model translates
+# and structures the document in one completion.
+_TRANSLATE_INSTRUCTION = """
+The input may be written in any language and may contain OCR noise. Read it in its original language and
+write every free-text value (summary, comments, notes, subject names) in English. Keep names, identifiers,
+dates and numbers exactly as they appear.
+"""
+
+
+# Added when the extraction agent rebuilt the grade grid (raw_format "text+tsv")
+_TABLE_INSTRUCTION = """
+Tables in the input are tab-separated: the first row of each table is its header (e.g. Subject, Term 1 ... Term 4)
+and every following row is one subject. Use the header to place each grade in the right quarter.
+"""
+
+
+prompt_registry = PromptRegistry(
+    {
+        "report": ("report_prompt.json", _DEFAULT_PROMPT),
+        "report_extract": ("report_extract_prompt.json", _EXTRACT_PROMPT),
+    },
+    search_dirs=[Path(__file__).parent / "prompts", Path(__file__).parent.parent / "prompts"],
+    reload_interval=get_float_env("PROMPT_RELOAD_INTERVAL", 5.0),
+)
+
+
+def build_llm_prompt(input_text: str, source: str = "unknown", raw_format: str = "text", translate: bool = False,
+                     template: Optional[PromptTemplate] = None) -> str:
+    template = template or prompt_registry.get(NORMALIZATION_TEMPLATE)
+    if input_text is None:
+        input_text = ""
+    prompt = template.render(input_text)
+    if raw_format == "text+tsv":
+        prompt = _TABLE_INSTRUCTION + prompt
+    if translate:
+        prompt = _TRANSLATE_INSTRUCTION + prompt
+    prompt += f"\n\nMeta: source={source}, raw_format={raw_format}\n"
+    return prompt
+
+
+async def call_llm(prompt: str, model: str = "gpt-4o-mini", temperature: float = 0.0, max_tokens: int = 4000,
+                   template_version: Optional[str] = None, usage: Optional[Dict[str, int]] = None,
+                   parse: Optional[Callable[[str], Any]] = None) -> Any:
+    """
+    Call the LLM and return raw text content, or `parse(content)` when
+    `parse` is given.
+    Uses the async OpenAI client exported from translation.py and holds an
+    LLM concurrency slot while the request is in flight.
+    Responses are served from the LLM cache when the same prompt was already
+    sent with the same model, temperature and template version. Only
+    complete (finish_reason "stop") replies at temperature 0 are cached,
+    and only after `parse` accepted them, so a malformed or truncated reply
+    is never replayed.
+    Token usage is added to `usage` when given.
+    """
+    cacheable = temperature <= 0
+    cache_key = llm_cache.make_key(prompt, model, temperature, template_version, max_tokens=max_tokens)
+    cached = await llm_cache.aget(cache_key) if cacheable else None
+    if cached is not None:
+        record_usage(usage, cached=True)
+        return parse(cached) if parse else cached
+
+    try:
+        async with llm_slot():
+            resp = await llm_client.chat.completions.create(
+                model=model,
+                messages=[{"role": "user", "content": prompt}],
+                temperature=temperature,
+                max_tokens=max_tokens,
+            )
+        record_usage(usage, resp)
+        choice = resp.choices[0]
+        content = choice.message.content.strip()
+    except Exception as e:
+        logger.exception("LLM call failed: %s", e)
+        raise
+
+    result = parse(content) if parse else content
+    if cacheable and choice.finish_reason == "stop":
+        await llm_cache.aset(cache_key, content)
+    elif choice.finish_reason != "stop":
+        logger.warning("LLM reply not cached: finish_reason=%s", choice.finish_reason)
+    return result
+
+
+def parse_llm_json(output: Union[str, Dict[str, Any]]) -> ReportCard:
+    if isinstance(output, dict):
+        parsed = output
+    else:
+        try:
+            parsed = json.loads(output)
+        except Exception:
+            parsed = recover_json(output)
+            if parsed is None:
+                logger.error("LLM output is not valid JSON and no candidate was found")
+                raise ValueError("LLM output is not valid JSON")
+
+    try:
+        return ReportCard.parse_obj(parsed)
+    except ValidationError as ve:
+        logger.error("LLM output failed schema validation: %s", ve)
+        raise
+
+
+async def normalize_with_llm(raw: Union[str, Dict[str, Any]],
+                             source: str = "unknown",
+                             raw_format: str = "text",
+                             model: str = "gpt-4o-mini",
+                             temperature: float = 0.0,
+                             translate: bool = False,
+                             usage: Optional[Dict[str, int]] = None) -> ReportCard:
+    """
+    Always use the LLM:
+     - compact text input to the PROMPT_TOKEN_BUDGET (see compaction.py)
+     - build the prompt from raw (string or dict); with translate=True the
+       prompt also asks for English output so no separate translation call is needed
+     - call the LLM
+     - parse and validate the JSON into a ReportCard
+     - compute averages, letter grades, GPA and pass/fail with the school's
+       grading rules (see grading.py) and return it
+    """
+    if isinstance(raw, dict):
+        try:
+            input_text = json.dumps(raw, ensure_ascii=False, indent=2)
+        except Exception:
+            input_text = str(raw)
+    else:
+        input_text = str(raw or "")
+
+    compaction = None
+    if COMPACTION_ENABLED and not isinstance(raw, dict):
+        input_text, compaction = compact_text(input_text, model=model)
+
+    template = prompt_registry.get(NORMALIZATION_TEMPLATE)
+    prompt = build_llm_prompt(input_text, source=source, raw_format=raw_format, translate=translate, template=template)
+    report_card = await call_llm(prompt, model=model, temperature=temperature, template_version=template.version,
+                                 usage=usage, parse=parse_llm_json)
+    # The full template's averages are recomputed; letter grades the model
+    # returned are kept either way (see apply_grading)
+    rules = rules_for_school(report_card.student.school_name)
+    report_card.meta["grading"] = apply_grading(report_card, rules, overwrite=template.name == "report")
+    report_card.meta["prompt_template"] = template.name
+    report_card.meta["prompt_version"] = template.version
+    if compaction is not None:
+        report_card.meta["compaction"] = compaction
+    return report_card
\ No newline at end of file
@@ -1,10 +1,15 @@
-from typing import Optional, Dict, Any
-from pydantic import BaseModel
-
-class NormalizeInput(BaseModel):
-    text: Optional[str] = None
-    structured: Optional[Dict[str, Any]] = None
-    source: Optional[str] = "unknown"
-    raw_format: Optional[str] = "text"
-    model: Optional[str] = "gpt-4o-mini"
-    temperature: Optional[float] = 0.0
+from typing import Optional, Dict, Any
+from pydantic import BaseModel
+
+class NormalizeInput(BaseModel):
+    text: Optional[str] = None
+    structured: Optional[Dict[str, Any]] = None
+    source: Optional[str] = "unknown"
+    raw_format: Optional[str] = "text"
+    model: Optional[str] = "gpt-4o-mini"
+    temperature: Optional[float] = 0.0
+    # "two_pass": translate, then normalize (two LLM calls)
+    # "single": translate and normalize in one LLM call
+    mode: Optional[str] = "two_pass"
+    # ISO 639-1 hint; "en" skips translation, anything else is passed to the translator
+    source_language: Optional[str] = None
@@ -1,6 +1,7 @@
-from typing import Any, Dict
-from pydantic import BaseModel
-
-class NormalizeResponse(BaseModel):
-    status: str
-    report_card: Dict[str, Any]
+from typing import Any, Dict, Optional
+from pydantic import BaseModel
+
+class NormalizeResponse(BaseModel):
+    status: str
+    report_card: Dict[str, Any]
+    meta: Optional[Dict[str, Any]] = None
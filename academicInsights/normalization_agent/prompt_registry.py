@@ -0,0 +1,102 @@
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+import hashlib
+import json
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+INPUT_PLACEHOLDER = "{input_text}"
+
+
+@dataclass(frozen=True)
+class PromptTemplate:
+    name: str
+    text: str
+    version: str
+    source: str
+    parts: Tuple[str, ...]
+
+    @classmethod
+    def compile(cls, name: str, text: str, source: str) -> "PromptTemplate":
+        version = hashlib.sha256(text.encode("utf-8")).hexdigest()[:12]
+        return cls(name=name, text=text, version=version, source=source, parts=tuple(text.split(INPUT_PLACEHOLDER)))
+
+    def render(self, input_text: str) -> str:
+        return input_text.join(self.parts)
+
+
+def _read_prompt_file(path: Path) -> Optional[str]:
+    raw = json.loads(path.read_text(encoding="utf-8"))
+    if isinstance(raw, dict):
+        return raw.get("prompt") or raw.get("template") or None
+    if isinstance(raw, str):
+        return raw
+    return None
+
+
+class PromptRegistry:
+    """
+    Named prompt templates, loaded once and cached in memory.
+
+    Each template has a built-in default and may be overridden by a JSON file
+    (`{"prompt": "..."}` or a bare string) in one of `search_dirs`; the first
+    existing file wins. Files are re-checked at most every `reload_interval`
+    seconds and re-read only when their mtime changes, so `get` does no disk
+    I/O on the hot path. Every template carries a content hash as its version.
+    """
+
+    def __init__(self, defaults: Dict[str, Tuple[str, str]], search_dirs: List[Path], reload_interval: float = 5.0):
+        self._defaults = defaults
+        self._search_dirs = search_dirs
+        self.reload_interval = reload_interval
+        self._lock = threading.Lock()
+        self._templates: Dict[str, PromptTemplate] = {}
+        self._signature: Dict[str, Optional[Tuple[str, float]]] = {}
+        self._checked_at = 0.0
+        self._refresh(force=True)
+
+    def _locate(self, filename: str) -> Optional[Tuple[Path, float]]:
+        for directory in self._search_dirs:
+            path = directory / filename
+            try:
+                return path, path.stat().st_mtime
+            except OSError:
+                continue
+        return None
+
+    def _refresh(self, force: bool = False) -> None:
+        for name, (filename, default_text) in self._defaults.items():
+            found = self._locate(filename)
+            signature = (str(found[0]), found[1]) if found else None
+            if not force and self._signature.get(name) == signature:
+                continue
+
+            template = PromptTemplate.compile(name, default_text, "builtin")
+            if found:
+                try:
+                    text = _read_prompt_file(found[0])
+                    if text:
+                        template = PromptTemplate.compile(name, text, str(found[0]))
+                except Exception as e:
+                    logger.warning("failed loading prompt %s: %s", found[0], e)
+
+            previous = self._templates.get(name)
+            if previous is None or previous.version != template.version:
+                logger.info("Loaded prompt '%s' version %s from %s", name, template.version, template.source)
+            self._templates[name] = template
+            self._signature[name] = signature
+        self._checked_at = time.monotonic()
+
+    def get(self, name: str) -> PromptTemplate:
+        if time.monotonic() - self._checked_at >= self.reload_interval:
+            with self._lock:
+                if time.monotonic() - self._checked_at >= self.reload_interval:
+                    self._refresh()
+        return self._templates[name]
+
+    def versions(self) -> Dict[str, Dict[str, str]]:
+        return {name: {"version": t.version, "source": t.source} for name, t in self._templates.items()}
@@ -1,40 +1,147 @@
-import asyncio
-import logging
-from typing import Dict, Any
-
-from models.Request import NormalizeInput
-from mapping import normalize_with_llm
-from translation import translate_to_english
-
-logger = logging.getLogger(__name__)
-
-
-async def normalize_document(input_data: NormalizeInput) -> Dict[str, Any]:
-    """
-    Async service-layer wrapper that runs blocking translation and LLM calls
-    in a threadpool to avoid blocking the event loop.
-    Returns a dict suitable for JSONResponse (status + report_card).
-    """
-    try:
-        if input_data.text:
-            translated = await asyncio.to_thread(translate_to_english, input_data.text)
-            raw_for_mapping = translated
-        elif input_data.structured is not None:
-            raw_for_mapping = input_data.structured
-        else:
-            raise ValueError("Provide 'text' or 'structured'")
-
-        report_card = await asyncio.to_thread(
-            normalize_with_llm,
-            raw_for_mapping,
-            input_data.source or "unknown",
-            input_data.raw_format or "text",
-            input_data.model or "gpt-4o-mini",
-            input_data.temperature if input_data.temperature is not None else 0.0,
-        )
-
-        return {"status": "success", "report_card": report_card.dict()}
-
-    except Exception as e:
-        logger.exception("Normalization service error: %s", e)
-        raise
+import logging
+import time
+from typing import Dict, Any, Optional, Tuple
+
+from models.Request import NormalizeInput
+from mapping import normalize_with_llm
+from translation import translate_to_english, new_usage
+from language_detection import detect_language, detection_sample
+from layouts import layout_registry
+from utils.settings import get_float_env, get_int_env
+
+logger = logging.getLogger(__name__)
+
+NORMALIZATION_MODES = ("two_pass", "single")
+
+# Minimum langdetect probability for treating a document as English
+ENGLISH_CONFIDENCE_THRESHOLD = get_float_env("LANGDETECT_ENGLISH_THRESHOLD", 0.9)
+# Samples shorter than this (letters and spaces, see detection_sample) are
+# too short to detect reliably; such text is left untranslated
+MIN_DETECTION_CHARS = get_int_env("LANGDETECT_MIN_CHARS", 100)
+
+_translation_stats = {"translated": 0, "skipped": 0, "avg_translation_ms": None, "time_saved_ms": 0.0}
+
+
+def _elapsed_ms(start: float) -> float:
+    return round((time.perf_counter() - start) * 1000, 1)
+
+
+def translation_stats() -> Dict[str, Any]:
+    stats = dict(_translation_stats)
+    stats["time_saved_ms"] = round(stats["time_saved_ms"], 1)
+    return stats
+
+
+def language_gate(text: str, source_language: Optional[str]) -> Dict[str, Any]:
+    """
+    Decide whether `text` needs translating. An explicit source_language wins;
+    otherwise the language is detected locally and English above
+    ENGLISH_CONFIDENCE_THRESHOLD is left as-is. Text with a detection sample
+    under MIN_DETECTION_CHARS is not translated. `hint` is the language to
+    pass to the translator: only a detection above the threshold is trusted.
+    """
+    if source_language:
+        language, confidence = source_language.lower(), 1.0
+    elif len(detection_sample(text)) < MIN_DETECTION_CHARS:
+        return {"language": None, "confidence": 0.0, "translate": False, "hint": None, "reason": "sample too short"}
+    else:
+        language, confidence = detect_language(text)
+    confident = bool(language) and confidence >= ENGLISH_CONFIDENCE_THRESHOLD
+    is_english = confident and language.startswith("en")
+    return {"language": language, "confidence": round(confidence, 3), "translate": not is_english,
+            "hint": language if confident else None}
+
+
+def _record_translation(elapsed_ms: Optional[float]) -> None:
+    if elapsed_ms is None:
+        _translation_stats["skipped"] += 1
+        _translation_stats["time_saved_ms"] += _translation_stats["avg_translation_ms"] or 0.0
+        return
+    _translation_stats["translated"] += 1
+    avg = _translation_stats["avg_translation_ms"]
+    _translation_stats["avg_translation_ms"] = elapsed_ms if avg is None else round(0.9 * avg + 0.1 * elapsed_ms, 1)
+
+
+async def translate_if_needed(text: str, source_language: Optional[str] = None, model: str = "gpt-4o-mini",
+                              usage: Optional[Dict[str, int]] = None) -> Tuple[str, Dict[str, Any]]:
+    """
+    Translate `text` to English unless the language gate says it already is.
+    Returns (text, gate info with the detected language and what was done).
+    """
+    gate = language_gate(text, source_language)
+    if not gate["translate"]:
+        _record_translation(None)
+        return text, {**gate, "translation": "skipped"}
+
+    start = time.perf_counter()
+    translated = await translate_to_english(text, source_language=gate["hint"], model=model, usage=usage)
+    elapsed_ms = _elapsed_ms(start)
+    _record_translation(elapsed_ms)
+    return translated, {**gate, "translation": "translated", "translation_ms": elapsed_ms}
+
+
+async def normalize_document(input_data: NormalizeInput) -> Dict[str, Any]:
+    """
+    Async service-layer wrapper around translation and LLM normalization.
+    Both use the shared AsyncOpenAI client, so no threads are involved.
+
+    mode="two_pass" translates first and normalizes the translation;
+    mode="single" sends the original text once with a translate+structure prompt.
+    Text from a known school layout (see layouts.py) skips both and is read
+    with the layout's rules (meta.mode="layout").
+    Returns a dict suitable for JSONResponse (status + report_card + meta with
+    per-stage latency and token usage).
+    """
+    try:
+        mode = (input_data.mode or "two_pass").lower()
+        if mode not in NORMALIZATION_MODES:
+            raise ValueError(f"Unknown mode '{input_data.mode}', expected one of {', '.join(NORMALIZATION_MODES)}")
+
+        start = time.perf_counter()
+        usage = new_usage()
+        latency_ms: Dict[str, float] = {}
+        model = input_data.model or "gpt-4o-mini"
+        language: Optional[Dict[str, Any]] = None
+        translate_in_prompt = False
+
+        if input_data.text:
+            # Known school layouts are read with regex rules, no LLM call
+            report_card = layout_registry.normalize(input_data.text)
+            if report_card is not None:
+                latency_ms["total"] = _elapsed_ms(start)
+                meta = {"mode": "layout", "model": None, "latency_ms": latency_ms, "usage": usage, "language": None}
+                return {"status": "success", "report_card": report_card.dict(), "meta": meta}
+
+            if mode == "single":
+                raw_for_mapping = input_data.text
+                language = language_gate(raw_for_mapping, input_data.source_language)
+                translate_in_prompt = language["translate"]
+            else:
+                raw_for_mapping, language = await translate_if_needed(
+                    input_data.text, input_data.source_language, model=model, usage=usage,
+                )
+                latency_ms["translation"] = language.get("translation_ms", 0.0)
+        elif input_data.structured is not None:
+            raw_for_mapping = input_data.structured
+        else:
+            raise ValueError("Provide 'text' or 'structured'")
+
+        stage = time.perf_counter()
+        report_card = await normalize_with_llm(
+            raw_for_mapping,
+            input_data.source or "unknown",
+            input_data.raw_format or "text",
+            model,
+            input_data.temperature if input_data.temperature is not None else 0.0,
+            translate=translate_in_prompt,
+            usage=usage,
+        )
+        latency_ms["normalization"] = _elapsed_ms(stage)
+        latency_ms["total"] = _elapsed_ms(start)
+
+        meta = {"mode": mode, "model": model, "latency_ms": latency_ms, "usage": usage, "language": language}
+        return {"status": "success", "report_card": report_card.dict(), "meta": meta}
+
+    except Exception as e:
+        logger.exception("Normalization service error: %s", e)
+        raise
@@ -0,0 +1,10 @@
+import os
+import sys
+from pathlib import Path
+
+# translation.py builds the OpenAI client at import time; tests never call it
+os.environ.setdefault("OPENAI_API_KEY", "test")
+
+# The agent's modules are imported top-level (as in main.py), so put the
+# agent directory on the path when pytest runs from elsewhere.
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
@@ -0,0 +1,32 @@
+from compaction import BOILERPLATE_MARKER, compact_text
+
+
+def test_collapsed_page_keeps_grades_around_boilerplate():
+    # One page as the extraction agent's raw_text: all on a single line
+    text = ("Learner: Jane Doe Grade 7 Subject Term 1 Term 2 Mathematics 85 90 English 70 72 "
+            "Life Sciences 64 68 Report printed on 2024-06-01 by the school information system "
+            "Comments: Jane worked consistently this term Average 74")
+    compacted, stats = compact_text(text, budget=0)
+    assert BOILERPLATE_MARKER not in compacted
+    assert "printed on" not in compacted
+    for kept in ("Jane Doe", "Mathematics 85 90", "Life Sciences 64 68", "Average 74"):
+        assert kept in compacted
+    assert stats["boilerplate_lines"] == 1
+
+
+def test_short_boilerplate_line_is_replaced():
+    compacted, _ = compact_text("Mathematics\t85\t90\nPage 1 of 2\nThis report is confidential.", budget=0)
+    assert compacted.splitlines() == ["Mathematics\t85\t90", BOILERPLATE_MARKER]
+
+
+def test_repeated_table_headers_are_kept():
+    text = ("Subject\tTerm 1\tTerm 2\nMathematics\t85\t90\n"
+            "St Mary's High School report\n"
+            "Subject\tTerm 1\tTerm 2\nEnglish\t70\t72\n"
+            "St Mary's High School report")
+    compacted, stats = compact_text(text, budget=0)
+    assert compacted.splitlines() == [
+        "Subject\tTerm 1\tTerm 2", "Mathematics\t85\t90", "St Mary's High School report",
+        "Subject\tTerm 1\tTerm 2", "English\t70\t72",
+    ]
+    assert stats["duplicate_lines"] == 1
@@ -0,0 +1,56 @@
+from types import SimpleNamespace
+
+from grading import DEFAULT_RULES, GradingRules, apply_grading
+
+
+def _card(*subjects, school_name=None):
+    return SimpleNamespace(
+        student=SimpleNamespace(school_name=school_name),
+        subjects=[
+            SimpleNamespace(subject=name, quarter_grades=quarters, numeric_grade=None, letter_grade=letter, passed=None)
+            for name, quarters, letter in subjects
+        ],
+        overall_gpa=None, pass_or_fail=None, pass_fail_reason=None, recommendations=None,
+    )
+
+
+def test_gpa_scale_is_not_graded_with_percentage_defaults():
+    card = _card(("Mathematics", {"Q1": 3.7, "Q2": 3.9}, None), ("English", {"Q1": 3.3}, None))
+    meta = apply_grading(card, DEFAULT_RULES)
+    assert card.subjects[0].numeric_grade == 3.8
+    assert card.subjects[0].letter_grade is None
+    assert card.subjects[0].passed is None
+    assert card.overall_gpa is None
+    assert card.pass_or_fail is None
+    assert card.recommendations is None
+    assert "skipped" in meta
+
+
+def test_seven_point_scale_is_not_graded_with_percentage_defaults():
+    card = _card(("Biology", {"Q4": 6}, None))
+    apply_grading(card, DEFAULT_RULES)
+    assert card.subjects[0].numeric_grade == 6.0
+    assert card.subjects[0].letter_grade is None
+    assert card.pass_or_fail is None
+
+
+def test_explicit_seven_point_rules_are_applied():
+    rules = GradingRules.from_dict("ib", {
+        "letter_bands": {"Excellent": 6, "Good": 5, "Satisfactory": 4, "Weak": 1},
+        "gpa_points": {"Excellent": 4, "Good": 3, "Satisfactory": 2, "Weak": 1},
+        "pass_mark": 4, "scale_max": 7, "trend_drop": 2,
+    })
+    card = _card(("Biology", {"Q1": 6, "Q2": 7}, None), ("History", {"Q1": 3, "Q2": 3}, None))
+    apply_grading(card, rules)
+    assert [s.letter_grade for s in card.subjects] == ["Excellent", "Weak"]
+    assert card.subjects[1].passed is False
+    assert card.overall_gpa == 2.5
+    assert card.pass_or_fail == "fail"
+
+
+def test_printed_letter_grades_are_never_overwritten():
+    card = _card(("Mathematics", {"Q1": 72, "Q2": 74}, "A-"))
+    apply_grading(card, DEFAULT_RULES, overwrite=True)
+    assert card.subjects[0].numeric_grade == 73.0
+    assert card.subjects[0].letter_grade == "A-"
+    assert card.pass_or_fail == "pass"
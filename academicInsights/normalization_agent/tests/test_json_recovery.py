@@ -0,0 +1,39 @@
+import json
+
+from json_recovery import recover_json
+
+CARD = {"student": {"first_name": "Lerato", "last_name": "Mokoena"},
+        "subjects": [{"subject": "Mathematics", "quarter_grades": {"Q1": 61, "Q2": None}}]}
+BODY = json.dumps(CARD, indent=2)
+
+
+def test_code_fence():
+    assert recover_json(f"Here you go:\n```json\n{BODY}\n```") == CARD
+
+
+def test_trailing_prose():
+    assert recover_json(BODY + "\n\nLet me know if you need {anything} else!") == CARD
+
+
+def test_fenced_snippet_in_trailing_prose():
+    assert recover_json('{"a":1}\n\nExample:\n```\nx\n```') == {"a": 1}
+    assert recover_json(BODY + '\n\nExample:\n```json\n{"subject": "..."}\n```') == CARD
+
+
+def test_fence_without_json_falls_back_to_the_whole_reply():
+    assert recover_json('```\nno json here\n```\n{"b": 2}') == {"b": 2}
+
+
+def test_trailing_commas():
+    assert recover_json('{"a": [1, 2,], "b": {"c": 3,},}') == {"a": [1, 2], "b": {"c": 3}}
+
+
+def test_truncated_output():
+    assert recover_json('{"a": 1, "b": [1, 2') == {"a": 1, "b": [1, 2]}
+    assert recover_json('{"a": 1, "b": "unterminated') == {"a": 1, "b": "unterminated"}
+    assert recover_json('{"a": 1, "b":') == {"a": 1}
+
+
+def test_nothing_to_recover():
+    assert recover_json("") is None
+    assert recover_json("no json at all") is None
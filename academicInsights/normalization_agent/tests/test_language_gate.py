@@ -0,0 +1,20 @@
+from services.normalization_service import language_gate
+
+
+def test_short_sample_is_not_translated():
+    gate = language_gate("Learner: Jane Doe Grade 7 / Attendance: present 180 absent 4", None)
+    assert gate["translate"] is False
+    assert gate["hint"] is None
+
+
+def test_confident_detection_is_passed_as_hint():
+    text = ("Die leerder het hierdie kwartaal baie goed gevaar in wiskunde en tale. "
+            "Bywoning was uitstekend en die leerder moet so aanhou werk. Ouers word bedank vir hul ondersteuning.")
+    gate = language_gate(text, None)
+    assert gate["translate"] is True
+    assert gate["hint"] == "af"
+
+
+def test_explicit_source_language_wins():
+    gate = language_gate("Short", "FR")
+    assert gate == {"language": "fr", "confidence": 1.0, "translate": True, "hint": "fr"}
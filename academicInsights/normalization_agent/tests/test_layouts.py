@@ -0,0 +1,82 @@
+import json
+
+from layouts import Layout, LayoutRegistry, fingerprint
+
+TEXT = "\n".join([
+    "ACME Progress Report",
+    "Surname: Doe",
+    "Subject\tQ1\tQ2\tQ3\tQ4",
+    "Mathematics\t78\t81\t\t",
+    "English\t65\t70\t\t",
+    "Absent: 4",
+])
+
+ACME = {
+    "name": "acme",
+    "match": {"header_tokens": ["ACME", "PROGRESS"], "table_columns": 5},
+    "fields": {"student.last_name": r"Surname:[ \t]*(.+)", "attendance.days_absent": r"Absent:\s*(\d+)"},
+    "subjects": {"table": 0, "header_rows": 1, "subject_column": 0,
+                 "quarter_columns": {"Q1": 1, "Q2": 2, "Q3": 3, "Q4": 4}},
+    "required": ["student.last_name"],
+}
+
+
+def _registry(tmp_path, *layouts):
+    for layout in layouts:
+        (tmp_path / f"{layout['name']}.json").write_text(json.dumps(layout), encoding="utf-8")
+    return LayoutRegistry(tmp_path)
+
+
+def test_fingerprint_has_header_tokens_and_table_shape():
+    fp = fingerprint(TEXT)
+    assert {"ACME", "PROGRESS", "REPORT", "SURNAME"} <= fp.header_tokens
+    assert fp.table_columns == (5,)
+
+
+def test_matching_layout_reads_the_card(tmp_path):
+    registry = _registry(tmp_path, ACME)
+    card = registry.normalize(TEXT)
+    assert card is not None
+    assert card.student.last_name == "Doe"
+    assert card.attendance.days_absent == 4
+    assert [s.subject for s in card.subjects] == ["Mathematics", "English"]
+    assert card.subjects[0].numeric_grade == 79.5
+    assert card.meta["layout"] == "acme"
+    assert registry.counters["hits"] == 1
+
+
+def test_unknown_layout_is_a_miss(tmp_path):
+    registry = _registry(tmp_path, ACME)
+    assert registry.normalize("Some Other School\nName: X") is None
+    assert registry.counters["misses"] == 1
+
+
+def test_missing_required_field_falls_back(tmp_path):
+    registry = _registry(tmp_path, ACME)
+    assert registry.normalize(TEXT.replace("Surname: Doe", "Surname:")) is None
+    assert registry.counters["fallbacks"] == 1
+
+
+def test_optional_field_group_that_does_not_match_is_skipped(tmp_path):
+    layout = {**ACME, "fields": {**ACME["fields"], "student.first_name": r"Surname:[ \t]*\w+(?:,\s*(\w+))?"}}
+    card = _registry(tmp_path, layout).normalize(TEXT)
+    assert card is not None
+    assert card.student.first_name is None
+
+
+def test_layout_without_subject_group_is_skipped(tmp_path):
+    broken = {**ACME, "name": "broken", "subjects": {"row_pattern": r"^(\w+)\t(?P<Q1>\d+)"}}
+    registry = _registry(tmp_path, broken)
+    assert registry.layouts() == ()
+    assert registry.normalize(TEXT) is None
+
+
+def test_layout_error_during_extraction_falls_back(tmp_path, monkeypatch):
+    registry = _registry(tmp_path, ACME)
+
+    def fail(self, text):
+        raise RuntimeError("boom")
+
+    monkeypatch.setattr(Layout, "extract", fail)
+    assert registry.normalize(TEXT) is None
+    assert registry.counters["fallbacks"] == 1
@@ -1,70 +1,150 @@
-from typing import List, Optional
-import logging
-import os
-import time
-from openai import OpenAI
-
-# Setup logging
-logger = logging.getLogger(__name__)
-logging.basicConfig(level=logging.INFO)
-
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-if not OPENAI_API_KEY:
-    raise EnvironmentError(" No OpenAI API key found. ")
-
-client = OpenAI(api_key=OPENAI_API_KEY)
-
-
-def translate_to_english(text: str, source_language: Optional[str] = None, model: str = "gpt-4o-mini") -> str:
-    """
-    Translate text to English using OpenAI LLM.
-    Returns original text on error or if input is empty.
-    """
-    if not text or not str(text).strip():
-        return text
-
-    try:
-        system_prompt = (
-            "You are a concise translator. Translate the user's text into natural, fluent English. "
-            "Return only the translated text with no extra commentary."
-        )
-        user_prompt = f"Translate the following text to English. Source language hint: {source_language or 'unknown'}.\n\n{text}"
-
-        resp = client.chat.completions.create(
-            model=model,
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt},
-            ],
-            max_tokens=2000,
-            temperature=0.0,
-        )
-
-        return resp.choices[0].message.content.strip()
-
-    except Exception as e:
-        logger.exception(f"OpenAI translation failed: {e}")
-        return text
-
-
-def batch_translate(texts: List[str], source_language: Optional[str] = None, delay: float = 0.0) -> List[str]:
-    """
-    Translate a list of texts to English using translate_to_english.
-    Returns translated strings in the same order. Original text is kept if translation fails.
-    """
-    if not texts:
-        return []
-
-    results: List[str] = []
-    for t in texts:
-        try:
-            translated = translate_to_english(t, source_language=source_language)
-            results.append(translated)
-        except Exception as e:
-            logger.exception(f"Per-item translation failed: {e}")
-            results.append(t)
-
-        if delay > 0:
-            time.sleep(delay)
-
-    return results
+from contextlib import asynccontextmanager
+from typing import Any, Dict, List, Optional
+import asyncio
+import logging
+import os
+import httpx
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+
+from utils.llm_cache import cache as llm_cache
+from utils.settings import get_int_env, get_float_env
+
+# Setup logging
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.INFO)
+
+OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+if not OPENAI_API_KEY:
+    raise EnvironmentError(" No OpenAI API key found. ")
+
+LLM_MAX_CONCURRENCY = get_int_env("LLM_MAX_CONCURRENCY", 100)
+
+# One shared client (and connection pool) for every translation/mapping call.
+client = AsyncOpenAI(
+    api_key=OPENAI_API_KEY,
+    timeout=get_float_env("LLM_TIMEOUT_SECONDS", 120.0),
+    http_client=DefaultAsyncHttpxClient(
+        limits=httpx.Limits(
+            max_connections=get_int_env("LLM_MAX_CONNECTIONS", LLM_MAX_CONCURRENCY),
+            max_keepalive_connections=get_int_env("LLM_KEEPALIVE_CONNECTIONS", 20),
+            keepalive_expiry=get_float_env("LLM_KEEPALIVE_SECONDS", 30.0),
+        ),
+    ),
+)
+
+_llm_semaphore = asyncio.Semaphore(LLM_MAX_CONCURRENCY)
+_llm_in_flight = 0
+
+# Bump when the translation prompt below changes so cached responses are not reused.
+TRANSLATION_PROMPT_VERSION = "2"
+
+
+@asynccontextmanager
+async def llm_slot():
+    """Hold one of the LLM_MAX_CONCURRENCY slots for the duration of a call."""
+    global _llm_in_flight
+    async with _llm_semaphore:
+        _llm_in_flight += 1
+        try:
+            yield
+        finally:
+            _llm_in_flight -= 1
+
+
+def llm_stats() -> dict:
+    return {"in_flight": _llm_in_flight, "max_in_flight": LLM_MAX_CONCURRENCY}
+
+
+async def close_client() -> None:
+    await client.close()
+
+
+def new_usage() -> Dict[str, int]:
+    return {"calls": 0, "cached_calls": 0, "prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
+
+
+def record_usage(usage: Optional[Dict[str, int]], resp: Any = None, cached: bool = False) -> None:
+    """Add one LLM call (or cache hit) to a per-request usage accumulator."""
+    if usage is None:
+        return
+    usage["calls"] += 1
+    if cached:
+        usage["cached_calls"] += 1
+        return
+    resp_usage = getattr(resp, "usage", None)
+    for field in ("prompt_tokens", "completion_tokens", "total_tokens"):
+        usage[field] += getattr(resp_usage, field, 0) or 0
+
+
+async def translate_to_english(text: str, source_language: Optional[str] = None, model: str = "gpt-4o-mini",
+                               usage: Optional[Dict[str, int]] = None) -> str:
+    """
+    Translate text to English using OpenAI LLM.
+    Returns original text on error or if input is empty.
+    Token usage is added to `usage` when given (see new_usage).
+    """
+    if not text or not str(text).strip():
+        return text
+
+    try:
+        system_prompt = (
+            "You are a concise translator. Translate the user's text into natural, fluent English. "
+            "Keep line breaks and tab-separated table rows as they are. "
+            "Return only the translated text with no extra commentary."
+        )
+        user_prompt = f"Translate the following text to English. Source language hint: {source_language or 'unknown'}.\n\n{text}"
+
+        cache_key = llm_cache.make_key(system_prompt + "\n" + user_prompt, model, 0.0, TRANSLATION_PROMPT_VERSION, kind="translation")
+        cached = await llm_cache.aget(cache_key)
+        if cached is not None:
+            record_usage(usage, cached=True)
+            return cached
+
+        async with llm_slot():
+            resp = await client.chat.completions.create(
+                model=model,
+                messages=[
+                    {"role": "system", "content": system_prompt},
+                    {"role": "user", "content": user_prompt},
+                ],
+                max_tokens=2000,
+                temperature=0.0,
+            )
+
+        record_usage(usage, resp)
+        choice = resp.choices[0]
+        translated = choice.message.content.strip()
+        # A truncated translation is returned but not replayed from the cache
+        if choice.finish_reason == "stop":
+            await llm_cache.aset(cache_key, translated)
+        return translated
+
+    except Exception as e:
+        logger.exception(f"OpenAI translation failed: {e}")
+        return text
+
+
+async def batch_translate(texts: List[str], source_language: Optional[str] = None, delay: float = 0.0) -> List[str]:
+    """
+    Translate a list of texts to English using translate_to_english.
+    Returns translated strings in the same order. Original text is kept if translation fails.
+    Without a delay the texts are translated concurrently (bounded by LLM_MAX_CONCURRENCY).
+    """
+    if not texts:
+        return []
+
+    if delay <= 0:
+        return list(await asyncio.gather(*(translate_to_english(t, source_language=source_language) for t in texts)))
+
+    results: List[str] = []
+    for t in texts:
+        try:
+            translated = await translate_to_english(t, source_language=source_language)
+            results.append(translated)
+        except Exception as e:
+            logger.exception(f"Per-item translation failed: {e}")
+            results.append(t)
+
+        await asyncio.sleep(delay)
+
+    return results
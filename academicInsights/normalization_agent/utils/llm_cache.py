@@ -0,0 +1,222 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+from utils.settings import get_env, get_int_env
+
+logger = logging.getLogger(__name__)
+
+
+class CacheBackend:
+    """
+    Storage for cached LLM responses. Expiry is handled by the backend.
+    Backends doing file or network I/O set `blocking` so LLMCache runs them
+    off the event loop.
+    """
+
+    name = "none"
+    blocking = False
+
+    def get(self, key: str) -> Optional[str]:
+        return None
+
+    def set(self, key: str, value: str, ttl_seconds: float) -> None:
+        pass
+
+    def size(self) -> int:
+        return 0
+
+
+class MemoryBackend(CacheBackend):
+    name = "memory"
+
+    def __init__(self, max_items: int = 1000):
+        self.max_items = max(1, max_items)
+        self._items: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return None
+            expires_at, value = item
+            if expires_at < time.time():
+                del self._items[key]
+                return None
+            self._items.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: str, ttl_seconds: float) -> None:
+        with self._lock:
+            self._items[key] = (time.time() + ttl_seconds, value)
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_items:
+                self._items.popitem(last=False)
+
+    def size(self) -> int:
+        return len(self._items)
+
+
+class DiskBackend(CacheBackend):
+    """
+    One JSON file per entry; oldest files are evicted past max_items.
+    Eviction scans the directory, so it runs every `evict_every` writes
+    rather than on each one (the cache may briefly exceed max_items).
+    """
+
+    name = "disk"
+    blocking = True
+
+    def __init__(self, directory: str, max_items: int = 10000, evict_every: int = 100):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_items = max(1, max_items)
+        self.evict_every = max(1, evict_every)
+        self._writes = 0
+        self._lock = threading.Lock()
+
+    def _path(self, key: str) -> Path:
+        return self.directory / f"{key}.json"
+
+    def get(self, key: str) -> Optional[str]:
+        path = self._path(key)
+        try:
+            entry = json.loads(path.read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning("Dropping unreadable LLM cache entry %s: %s", path, e)
+            path.unlink(missing_ok=True)
+            return None
+        if entry.get("expires_at", 0) < time.time():
+            path.unlink(missing_ok=True)
+            return None
+        os.utime(path)
+        return entry.get("value")
+
+    def set(self, key: str, value: str, ttl_seconds: float) -> None:
+        path = self._path(key)
+        tmp = path.with_suffix(".tmp")
+        try:
+            tmp.write_text(json.dumps({"expires_at": time.time() + ttl_seconds, "value": value}), encoding="utf-8")
+            tmp.replace(path)
+        except Exception as e:
+            logger.warning("Failed to write LLM cache entry %s: %s", path, e)
+            tmp.unlink(missing_ok=True)
+            return
+        with self._lock:
+            self._writes += 1
+            due = self._writes % self.evict_every == 0
+        if due:
+            self._evict()
+
+    def _evict(self) -> None:
+        entries = sorted(
+            (entry.stat().st_mtime, entry.path)
+            for entry in os.scandir(self.directory)
+            if entry.name.endswith(".json")
+        )
+        for _, path in entries[:max(0, len(entries) - self.max_items)]:
+            Path(path).unlink(missing_ok=True)
+
+    def size(self) -> int:
+        return sum(1 for entry in os.scandir(self.directory) if entry.name.endswith(".json"))
+
+
+class LLMCache:
+    """
+    Deterministic response cache in front of the LLM. Keys hash the fully
+    built prompt together with model, temperature and prompt-template
+    version, so any change to what is sent produces a different key.
+    """
+
+    def __init__(self, backend: CacheBackend, ttl_seconds: float = 86400):
+        self.backend = backend
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.backend.name != "none"
+
+    @staticmethod
+    def make_key(prompt: str, model: str, temperature: float, template_version: str, **extra: Any) -> str:
+        payload = json.dumps(
+            {"prompt": prompt, "model": model, "temperature": temperature,
+             "template_version": template_version, **extra},
+            sort_keys=True, ensure_ascii=False,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        if not self.enabled:
+            return None
+        try:
+            value = self.backend.get(key)
+        except Exception as e:
+            logger.warning("LLM cache lookup failed: %s", e)
+            value = None
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def set(self, key: str, value: str) -> None:
+        if not self.enabled:
+            return
+        try:
+            self.backend.set(key, value, self.ttl_seconds)
+        except Exception as e:
+            logger.warning("LLM cache store failed: %s", e)
+
+    async def aget(self, key: str) -> Optional[str]:
+        """get() for async callers; blocking backends run in a worker thread."""
+        if self.backend.blocking:
+            return await asyncio.to_thread(self.get, key)
+        return self.get(key)
+
+    async def aset(self, key: str, value: str) -> None:
+        """set() for async callers; blocking backends run in a worker thread."""
+        if self.backend.blocking:
+            await asyncio.to_thread(self.set, key, value)
+        else:
+            self.set(key, value)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "backend": self.backend.name,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+            "items": self.backend.size(),
+        }
+
+
+def build_llm_cache() -> LLMCache:
+    backend_name = (get_env("LLM_CACHE_BACKEND", "memory") or "memory").lower()
+    max_items = get_int_env("LLM_CACHE_MAX_ITEMS", 1000)
+    ttl = get_int_env("LLM_CACHE_TTL_SECONDS", 86400)
+
+    if backend_name == "disk":
+        backend: CacheBackend = DiskBackend(get_env("LLM_CACHE_DIR", "/tmp/llm_cache"), max_items=max_items,
+                                            evict_every=get_int_env("LLM_CACHE_EVICT_EVERY", 100))
+    elif backend_name == "memory":
+        backend = MemoryBackend(max_items=max_items)
+    else:
+        backend = CacheBackend()
+    logger.info("LLM response cache backend: %s", backend.name)
+    return LLMCache(backend, ttl_seconds=ttl)
+
+
+cache = build_llm_cache()
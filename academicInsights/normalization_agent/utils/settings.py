@@ -0,0 +1,34 @@
+import logging
+import os
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+
+def get_env(name: str, default: Optional[str] = None) -> Optional[str]:
+    v = os.getenv(name)
+    if v:
+        return v
+    return default
+
+
+def get_int_env(name: str, default: Optional[int] = None) -> Optional[int]:
+    v = os.getenv(name)
+    if not v:
+        return default
+    try:
+        return int(v)
+    except ValueError:
+        logger.warning("Invalid %s value '%s', falling back to %s", name, v, default)
+        return default
+
+
+def get_float_env(name: str, default: Optional[float] = None) -> Optional[float]:
+    v = os.getenv(name)
+    if not v:
+        return default
+    try:
+        return float(v)
+    except ValueError:
+        logger.warning("Invalid %s value '%s', falling back to %s", name, v, default)
+        return default
@@ -0,0 +1,64 @@
+"""
+Benchmark a fresh httpx.AsyncClient per call (the previous behaviour)
+against the shared pooled client from utils.http.
+
+Usage (from orchestrator_agent/):
+    python -m benchmarks.http_client [--url http://localhost:8001/health] [--requests 200] [--concurrency 10]
+
+Point --url at a running agent's /health endpoint; the per-call numbers
+include a TCP (and TLS, for https) handshake on every request.
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from typing import Awaitable, Callable, List
+
+import httpx
+
+from utils.http import close_client, connection_stats, request
+
+
+async def per_call(url: str) -> None:
+    async with httpx.AsyncClient(timeout=10.0) as client:
+        (await client.get(url)).raise_for_status()
+
+
+async def pooled(url: str) -> None:
+    (await request("GET", url, timeout_seconds=10.0)).raise_for_status()
+
+
+async def run(call: Callable[[str], Awaitable[None]], url: str, total: int, concurrency: int) -> List[float]:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+
+    async def one() -> None:
+        async with semaphore:
+            start = time.perf_counter()
+            await call(url)
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    await asyncio.gather(*(one() for _ in range(total)))
+    return latencies
+
+
+def report(name: str, latencies: List[float]) -> None:
+    print(f"{name:<10} mean {statistics.mean(latencies):7.2f} ms   p50 {statistics.median(latencies):7.2f} ms   "
+          f"max {max(latencies):7.2f} ms")
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:8001/health")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=10)
+    args = parser.parse_args()
+
+    report("per-call", await run(per_call, args.url, args.requests, args.concurrency))
+    report("pooled", await run(pooled, args.url, args.requests, args.concurrency))
+    print(f"pooled connections: {connection_stats()}")
+    await close_client()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,42 @@
+import logging
+from typing import Optional
+
+from fastapi import APIRouter, UploadFile, File, HTTPException, status
+from fastapi.responses import JSONResponse
+
+from controllers.document_controller import service as document_service
+from services.job_service import JobService, JobQueueFull
+
+router = APIRouter()
+logger = logging.getLogger(__name__)
+
+job_service = JobService(document_service)
+
+
+@router.post("/jobs")
+async def submit_job(file: UploadFile = File(...), source_language: str = None, callback_url: Optional[str] = None) -> JSONResponse:
+    if callback_url:
+        try:
+            job_service.check_callback_url(callback_url)
+        except ValueError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    try:
+        job_id = await job_service.submit(file.file, file.filename or "upload", file.content_type or "application/octet-stream", source_language, callback_url)
+    except JobQueueFull as e:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(e), headers={"Retry-After": "30"})
+    except Exception as e:
+        logger.exception("Failed to submit job: %s", e)
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
+    return JSONResponse(
+        content={"job_id": job_id, "status": "queued", "status_url": f"/jobs/{job_id}"},
+        status_code=status.HTTP_202_ACCEPTED,
+        headers={"Location": f"/jobs/{job_id}"},
+    )
+
+
+@router.get("/jobs/{job_id}")
+async def get_job(job_id: str) -> JSONResponse:
+    job = await job_service.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Unknown job {job_id}")
+    return JSONResponse(content=job, status_code=status.HTTP_200_OK)
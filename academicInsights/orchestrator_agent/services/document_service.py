@@ -1,42 +1,298 @@
-import logging
-from typing import Dict, Any, Optional
-from pathlib import Path
-
-from utils.http import post_json, RemoteServiceError
-from utils.settings import get_env
-
-logger = logging.getLogger(__name__)
-
-
-class DocumentService:
-    def __init__(self):
-        self.extraction_url = get_env("EXTRACTION_SERVICE")
-        self.normalization_url = get_env("NORMALIZATION_SERVICE")
-        if not self.extraction_url or not self.normalization_url:
-            logger.warning("EXTRACTION_SERVICE or NORMALIZATION_SERVICE not set in environment")
-
-    async def process_document(self, file_bytes: bytes, filename: str, content_type: str, source_language: Optional[str] = None) -> Dict[str, Any]:
-        files = {"file": (filename, file_bytes, content_type)}
-        try:
-            extraction_response = await post_json(self.extraction_url + "/extract", files=files, timeout_seconds=60.0)
-        except RemoteServiceError as e:
-            logger.exception("Extraction call failed: %s", e)
-            raise
-
-        raw_text = extraction_response.get("raw_text", "")
-        raw_format = extraction_response.get("metadata", {}).get("format", "unknown")
-
-        normalize_payload = {
-            "text": raw_text,
-            "source": "extraction_agent",
-            "raw_format": raw_format,
-        }
-
-        try:
-            normalization_response = await post_json(self.normalization_url + "/normalize", json_payload=normalize_payload, timeout_seconds=180.0)
-        except RemoteServiceError as e:
-            logger.exception("Normalization call failed: %s", e)
-            raise
-
-        return normalization_response
-
+import asyncio
+import logging
+import os
+import shutil
+import time
+import uuid
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, BinaryIO, Dict, Any, List, Optional
+from pathlib import Path
+
+from utils.http import post_json, iter_file, stream_json_lines, RemoteServiceError
+from utils.resilience import CircuitBreaker, RetryPolicy, call_with_resilience
+from utils.settings import get_env, get_int_env, get_float_env
+
+logger = logging.getLogger(__name__)
+
+
+def save_upload(upload: BinaryIO, path: Path) -> None:
+    """Copy a file object to `path` in 1 MiB chunks."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    upload.seek(0)
+    with open(path, "wb") as out:
+        shutil.copyfileobj(upload, out, length=1024 * 1024)
+
+
+def _is_english(language: Optional[str]) -> bool:
+    return bool(language) and language.lower().split("-")[0] in ("en", "eng", "english")
+
+
+class DocumentService:
+    def __init__(self):
+        self.extraction_url = get_env("EXTRACTION_SERVICE")
+        self.normalization_url = get_env("NORMALIZATION_SERVICE")
+        if not self.extraction_url or not self.normalization_url:
+            logger.warning("EXTRACTION_SERVICE or NORMALIZATION_SERVICE not set in environment")
+        # "two_pass" or "single"; unset leaves the normalization agent's default
+        self.normalization_mode = get_env("NORMALIZATION_MODE")
+        # Overlap per-page translation with OCR via /extract-stream
+        self.page_pipelining = get_env("PAGE_PIPELINING", "true").lower() in ("1", "true", "yes")
+        # Leading text the document's language is detected from before any
+        # page is translated (the normalization agent samples 2000 characters)
+        self.pipeline_detect_chars = get_int_env("PIPELINE_DETECT_CHARS", 2000)
+
+        base_delay = get_float_env("RETRY_BASE_DELAY_SECONDS", 0.5)
+        max_delay = get_float_env("RETRY_MAX_DELAY_SECONDS", 10.0)
+        # Extraction is idempotent (and cached), so timeouts are worth retrying.
+        # A normalization timeout may still be spending LLM tokens, so only
+        # retry when the request never got there or the agent said it was busy.
+        self.extraction_retry = RetryPolicy(
+            max_attempts=get_int_env("EXTRACTION_MAX_ATTEMPTS", 3),
+            base_delay=base_delay, max_delay=max_delay, retry_on_timeout=True,
+        )
+        self.normalization_retry = RetryPolicy(
+            max_attempts=get_int_env("NORMALIZATION_MAX_ATTEMPTS", 2),
+            base_delay=base_delay, max_delay=max_delay, retry_on_timeout=False,
+        )
+        failure_threshold = get_int_env("CIRCUIT_FAILURE_THRESHOLD", 5)
+        reset_timeout = get_float_env("CIRCUIT_RESET_SECONDS", 30.0)
+        # When set (and mounted by the extraction agent under its own
+        # SHARED_UPLOAD_DIR), files are handed over by path instead of bytes
+        shared_dir = get_env("SHARED_UPLOAD_DIR")
+        self.shared_upload_dir = Path(shared_dir).resolve() if shared_dir else None
+
+        self.extraction_breaker = CircuitBreaker("extraction", failure_threshold, reset_timeout)
+        self.normalization_breaker = CircuitBreaker("normalization", failure_threshold, reset_timeout)
+
+    async def _extract_stream(self, upload: BinaryIO, filename: str, content_type: str) -> Dict[str, Any]:
+        """Stream the upload to /extract-raw in chunks; nothing is buffered whole."""
+        size = await asyncio.to_thread(upload.seek, 0, os.SEEK_END)
+
+        async def attempt() -> Dict[str, Any]:
+            await asyncio.to_thread(upload.seek, 0)
+            return await post_json(
+                self.extraction_url + "/extract-raw",
+                content=iter_file(upload),
+                params={"filename": filename},
+                headers={"Content-Type": content_type, "Content-Length": str(size)},
+                timeout_seconds=60.0,
+            )
+
+        return await call_with_resilience(attempt, self.extraction_retry, self.extraction_breaker)
+
+    @asynccontextmanager
+    async def _shared_file(self, upload: BinaryIO, filename: str, file_path: Optional[str]) -> AsyncIterator[str]:
+        """
+        Yield the upload's path relative to SHARED_UPLOAD_DIR, copying it there
+        first (and removing the copy afterwards) unless it already lives there.
+        """
+        path = Path(file_path).resolve() if file_path else None
+        copied = path is None or not path.is_relative_to(self.shared_upload_dir)
+        if copied:
+            path = self.shared_upload_dir / "uploads" / f"{uuid.uuid4().hex}{Path(filename).suffix.lower()}"
+            await asyncio.to_thread(save_upload, upload, path)
+        try:
+            yield str(path.relative_to(self.shared_upload_dir))
+        finally:
+            if copied:
+                await asyncio.to_thread(path.unlink, True)
+
+    async def _extract_shared(self, upload: BinaryIO, filename: str, file_path: Optional[str]) -> Dict[str, Any]:
+        """Hand the file to /extract-ref by its path on the shared volume."""
+        async with self._shared_file(upload, filename, file_path) as relative_path:
+            payload = {"path": relative_path, "filename": filename}
+            return await call_with_resilience(
+                lambda: post_json(self.extraction_url + "/extract-ref", json_payload=payload, timeout_seconds=60.0),
+                self.extraction_retry, self.extraction_breaker,
+            )
+
+    async def _detect_language(self, text: str) -> Dict[str, Any]:
+        """The normalization agent's language gate for `text` (no LLM call)."""
+        response = await call_with_resilience(
+            lambda: post_json(self.normalization_url + "/detect-language", json_payload={"text": text}, timeout_seconds=30.0),
+            self.normalization_retry, self.normalization_breaker,
+        )
+        return response.get("language") or {}
+
+    async def _translate_page(self, text: str, gate: "asyncio.Future[Dict[str, Any]]") -> Optional[str]:
+        """
+        Translate one page once the document's language is known. Returns None
+        when the document is not to be translated page by page: English, too
+        short to tell, or detected below the confidence threshold (no hint).
+        """
+        language = await gate
+        if not language.get("translate") or not language.get("hint"):
+            return None
+        if not text.strip():
+            return text
+        # The document's language is passed explicitly, so header- or
+        # table-only pages are not re-detected on their own
+        payload = {"text": text, "source_language": language["hint"]}
+        response = await call_with_resilience(
+            lambda: post_json(self.normalization_url + "/translate", json_payload=payload, timeout_seconds=180.0),
+            self.normalization_retry, self.normalization_breaker,
+        )
+        return response.get("translated", text)
+
+    async def _extract_pipelined(self, upload: BinaryIO, filename: str, content_type: str, file_path: Optional[str],
+                                 source_language: Optional[str], translations: Dict[int, "asyncio.Task[Optional[str]]"],
+                                 tasks: List[asyncio.Task]) -> Dict[str, Any]:
+        """
+        Extract via /extract-stream and start translating each page as soon as
+        its OCR event arrives, so translation overlaps OCR of later pages.
+        Whether to translate is decided once per document: from
+        `source_language`, or by detecting the language of the first
+        PIPELINE_DETECT_CHARS characters (all of them for shorter documents);
+        page translations wait for that decision.
+        Translation tasks are added to `translations` by page number; a retried
+        stream only re-translates pages whose text changed. The detection task
+        is added to `tasks` so the caller can cancel it.
+        """
+        page_texts: Dict[int, str] = {}
+        gate: "asyncio.Future[Dict[str, Any]]" = asyncio.get_running_loop().create_future()
+        if source_language:
+            gate.set_result({"language": source_language, "translate": True, "hint": source_language})
+
+        def detect() -> None:
+            text = "\n\n".join(page_texts[page] for page in sorted(page_texts))
+
+            async def run() -> None:
+                try:
+                    gate.set_result(await self._detect_language(text))
+                except Exception as e:
+                    gate.set_exception(e)
+
+            tasks.append(asyncio.create_task(run()))
+
+        def on_page(event: Dict[str, Any]) -> None:
+            page, text = event.get("page"), event.get("compact_text") or event.get("text") or ""
+            if page is None or page_texts.get(page) == text:
+                return
+            if page in translations:
+                translations[page].cancel()
+            page_texts[page] = text
+            translations[page] = asyncio.create_task(self._translate_page(text, gate))
+            if not tasks and not gate.done() and sum(len(t) for t in page_texts.values()) >= self.pipeline_detect_chars:
+                detect()
+
+        async def consume(request_kwargs: Dict[str, Any]) -> Dict[str, Any]:
+            async for event in stream_json_lines(self.extraction_url + "/extract-stream", timeout_seconds=60.0, **request_kwargs):
+                kind = event.pop("event", None)
+                if kind == "page":
+                    on_page(event)
+                elif kind == "result":
+                    if not tasks and not gate.done() and page_texts:
+                        detect()
+                    return event
+                elif kind == "error":
+                    code = event.get("status", 500)
+                    raise RemoteServiceError(f"status={code} body={event}", kind="status", status_code=code)
+            raise RemoteServiceError("extraction stream ended without a result")
+
+        if self.shared_upload_dir is not None:
+            async with self._shared_file(upload, filename, file_path) as relative_path:
+                params = {"filename": filename, "path": relative_path}
+                return await call_with_resilience(lambda: consume({"params": params}), self.extraction_retry, self.extraction_breaker)
+
+        size = await asyncio.to_thread(upload.seek, 0, os.SEEK_END)
+
+        async def attempt() -> Dict[str, Any]:
+            await asyncio.to_thread(upload.seek, 0)
+            return await consume({
+                "content": iter_file(upload),
+                "params": {"filename": filename},
+                "headers": {"Content-Type": content_type, "Content-Length": str(size)},
+            })
+
+        return await call_with_resilience(attempt, self.extraction_retry, self.extraction_breaker)
+
+    async def process_document(self, upload: BinaryIO, filename: str, content_type: str, source_language: Optional[str] = None,
+                               file_path: Optional[str] = None) -> Dict[str, Any]:
+        """
+        `upload` is a binary file object (an UploadFile's spooled file or a job's
+        spool file). `file_path`, when known, lets the shared-volume mode skip
+        copying a file that already lives under SHARED_UPLOAD_DIR.
+
+        With PAGE_PIPELINING on (and two-pass normalization), pages are
+        translated while later pages are still being OCR'd and /normalize
+        receives the already-English text.
+        """
+        translations: Dict[int, "asyncio.Task[Optional[str]]"] = {}
+        tasks: List[asyncio.Task] = []
+        pipelined = self.page_pipelining and self.normalization_mode != "single" and not _is_english(source_language)
+        try:
+            try:
+                if pipelined:
+                    extraction_response = await self._extract_pipelined(upload, filename, content_type, file_path, source_language,
+                                                                        translations, tasks)
+                elif self.shared_upload_dir is not None:
+                    extraction_response = await self._extract_shared(upload, filename, file_path)
+                else:
+                    extraction_response = await self._extract_stream(upload, filename, content_type)
+            except RemoteServiceError as e:
+                logger.exception("Extraction call failed: %s", e)
+                raise
+
+            # Line breaks are kept so normalization can drop repeated page
+            # headers line by line (see normalization_agent/compaction.py)
+            raw_text = extraction_response.get("text") or extraction_response.get("raw_text", "")
+            raw_format = extraction_response.get("metadata", {}).get("format", "unknown")
+            # Grade grids rebuilt as TSV keep the subject x term layout that
+            # the whitespace-collapsed raw_text loses, in far fewer tokens
+            compact_text = (extraction_response.get("structure") or {}).get("compact_text")
+            if compact_text:
+                raw_text, raw_format = compact_text, "text+tsv"
+
+            normalize_payload = {
+                "text": raw_text,
+                "source": "extraction_agent",
+                "raw_format": raw_format,
+            }
+            if self.normalization_mode:
+                normalize_payload["mode"] = self.normalization_mode
+            if source_language:
+                normalize_payload["source_language"] = source_language
+
+            pipeline_meta = None
+            if translations:
+                # No page events (e.g. an extraction cache hit) falls back to
+                # letting /normalize translate the whole text
+                wait_start = time.perf_counter()
+                try:
+                    pages = await asyncio.gather(*(translations[page] for page in sorted(translations)))
+                except RemoteServiceError as e:
+                    # /normalize can still translate the whole text itself
+                    logger.warning("Page translation failed, normalizing untranslated text: %s", e)
+                else:
+                    # All None: the document was not to be translated page by
+                    # page, so /normalize gets the original text
+                    if any(page is not None for page in pages):
+                        normalize_payload["text"] = "\n\n".join(page or "" for page in pages)
+                        normalize_payload["source_language"] = "en"
+                    pipeline_meta = {
+                        "pages": len(pages),
+                        "translated": any(page is not None for page in pages),
+                        "translation_wait_ms": round((time.perf_counter() - wait_start) * 1000, 2),
+                    }
+        finally:
+            for task in [*translations.values(), *tasks]:
+                task.cancel()
+
+        try:
+            normalization_response = await call_with_resilience(
+                lambda: post_json(self.normalization_url + "/normalize", json_payload=normalize_payload, timeout_seconds=180.0),
+                self.normalization_retry, self.normalization_breaker,
+            )
+        except RemoteServiceError as e:
+            logger.exception("Normalization call failed: %s", e)
+            raise
+
+        if pipeline_meta is not None and isinstance(normalization_response.get("meta"), dict):
+            normalization_response["meta"]["pipeline"] = pipeline_meta
+        return normalization_response
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "extraction": self.extraction_breaker.stats(),
+            "normalization": self.normalization_breaker.stats(),
+        }
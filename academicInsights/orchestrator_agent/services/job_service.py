@@ -0,0 +1,226 @@
+import asyncio
+import fnmatch
+import ipaddress
+import logging
+import shutil
+import socket
+import tempfile
+import uuid
+from pathlib import Path
+from typing import Any, BinaryIO, Dict, List, Optional
+from urllib.parse import urlparse
+
+from services.document_service import DocumentService, save_upload
+from utils.http import post_json
+from utils.job_store import JobStore
+from utils.resilience import CircuitBreaker, RetryPolicy, call_with_resilience
+from utils.settings import get_env, get_int_env, get_float_env
+
+logger = logging.getLogger(__name__)
+
+
+class JobQueueFull(Exception):
+    pass
+
+
+def _is_internal_address(host: str) -> bool:
+    try:
+        address = ipaddress.ip_address(host)
+    except ValueError:
+        return False
+    return not address.is_global
+
+
+def callback_url_error(url: str, allowed_hosts: List[str]) -> Optional[str]:
+    """
+    Why `url` may not be used as a job callback, or None when it may.
+    With JOB_CALLBACK_ALLOWED_HOSTS set the host must match one of its
+    patterns ("hooks.example.com", "*.example.com"); otherwise localhost,
+    private or loopback IP addresses and single-label names such as compose
+    service names are refused.
+    """
+    parsed = urlparse(url)
+    if parsed.scheme not in ("http", "https"):
+        return "callback_url must be an http(s) URL"
+    host = (parsed.hostname or "").lower().rstrip(".")
+    if not host:
+        return "callback_url has no host"
+    if allowed_hosts:
+        if not any(fnmatch.fnmatch(host, pattern) for pattern in allowed_hosts):
+            return f"callback host {host} is not in JOB_CALLBACK_ALLOWED_HOSTS"
+        return None
+    if host == "localhost" or host.endswith(".localhost") or _is_internal_address(host):
+        return f"callback host {host} is an internal address"
+    if "." not in host and ":" not in host:
+        return f"callback host {host} is not a fully qualified name"
+    return None
+
+
+def _resolves_internal(host: str) -> bool:
+    """Whether any address `host` resolves to is private, loopback or otherwise not global."""
+    try:
+        infos = socket.getaddrinfo(host, None)
+    except OSError:
+        return False
+    return any(_is_internal_address(info[4][0].split("%")[0]) for info in infos)
+
+
+class JobService:
+    """
+    Runs /process-document asynchronously.
+
+    Uploads are spooled to JOBS_DIR and recorded in an SQLite JobStore, then
+    picked up by `JOB_WORKERS` background tasks from an in-process queue.
+    Jobs still queued or running at shutdown are re-queued on the next start,
+    and finished jobs are purged every JOB_PURGE_INTERVAL_SECONDS once they
+    are older than JOB_RETENTION_HOURS.
+    When a job has a callback URL, the finished job (including the report
+    card) is POSTed to it; see callback_url_error for which hosts are allowed.
+    """
+
+    def __init__(self, document_service: DocumentService):
+        self.document_service = document_service
+        self.jobs_dir = Path(get_env("JOBS_DIR", str(Path(tempfile.gettempdir()) / "orchestrator_jobs")))
+        self.db_path = get_env("JOBS_DB_PATH", str(self.jobs_dir / "jobs.db"))
+        self.workers = max(1, get_int_env("JOB_WORKERS", 2))
+        self.max_queued = max(1, get_int_env("JOB_MAX_QUEUED", 100))
+        self.retention_seconds = get_float_env("JOB_RETENTION_HOURS", 168.0) * 3600
+        self.purge_interval = max(1.0, get_float_env("JOB_PURGE_INTERVAL_SECONDS", 3600.0))
+        self.callback_allowed_hosts = [h.strip().lower() for h in (get_env("JOB_CALLBACK_ALLOWED_HOSTS") or "").split(",") if h.strip()]
+        self.callback_retry = RetryPolicy(max_attempts=get_int_env("JOB_CALLBACK_MAX_ATTEMPTS", 5), base_delay=1.0, max_delay=30.0)
+
+        self.store: Optional[JobStore] = None
+        self._queue: "asyncio.Queue[str]" = asyncio.Queue()
+        self._tasks: List[asyncio.Task] = []
+        self.running = 0
+
+    async def start(self) -> None:
+        self.jobs_dir.mkdir(parents=True, exist_ok=True)
+        self.store = await asyncio.to_thread(JobStore, self.db_path)
+        await self._purge()
+        for job_id in await asyncio.to_thread(self.store.unfinished):
+            logger.info("Re-queueing job %s after restart", job_id)
+            await asyncio.to_thread(self.store.update, job_id, status="queued")
+            self._queue.put_nowait(job_id)
+        self._tasks = [asyncio.create_task(self._worker(n)) for n in range(self.workers)]
+        self._tasks.append(asyncio.create_task(self._purge_loop()))
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self.store is not None:
+            await asyncio.to_thread(self.store.close)
+            self.store = None
+
+    async def _purge(self) -> None:
+        purged = await asyncio.to_thread(self.store.purge_finished, self.retention_seconds)
+        if purged:
+            logger.info("Purged %s finished jobs older than the retention period", purged)
+
+    async def _purge_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.purge_interval)
+            try:
+                await self._purge()
+            except Exception as e:
+                logger.exception("Purging finished jobs failed: %s", e)
+
+    def check_callback_url(self, callback_url: str) -> None:
+        """Raise ValueError when `callback_url` is not an allowed callback target."""
+        error = callback_url_error(callback_url, self.callback_allowed_hosts)
+        if error:
+            raise ValueError(error)
+
+    async def submit(self, upload: BinaryIO, filename: str, content_type: str,
+                     source_language: Optional[str] = None, callback_url: Optional[str] = None) -> str:
+        if self._queue.qsize() >= self.max_queued:
+            raise JobQueueFull(f"job queue is full ({self._queue.qsize()} queued)")
+
+        job_id = uuid.uuid4().hex
+        file_path = self.jobs_dir / job_id / (Path(filename).name or "upload")
+        await asyncio.to_thread(save_upload, upload, file_path)
+        await asyncio.to_thread(self.store.create, job_id, filename, content_type, str(file_path), source_language, callback_url)
+        self._queue.put_nowait(job_id)
+        return job_id
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        job = await asyncio.to_thread(self.store.get, job_id)
+        return self._public(job) if job else None
+
+    @staticmethod
+    def _public(job: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "job_id": job["id"],
+            "status": job["status"],
+            "filename": job["filename"],
+            "result": job["result"],
+            "error": job["error"],
+            "callback_status": job["callback_status"],
+            "created_at": job["created_at"],
+            "updated_at": job["updated_at"],
+        }
+
+    async def _worker(self, n: int) -> None:
+        while True:
+            job_id = await self._queue.get()
+            self.running += 1
+            try:
+                await self._run(job_id)
+            except Exception as e:
+                logger.exception("Job worker %s crashed on job %s: %s", n, job_id, e)
+            finally:
+                self.running -= 1
+                self._queue.task_done()
+
+    async def _run(self, job_id: str) -> None:
+        job = await asyncio.to_thread(self.store.get, job_id)
+        if job is None:
+            return
+        await asyncio.to_thread(self.store.update, job_id, status="running")
+        file_path = Path(job["file_path"])
+        try:
+            upload = await asyncio.to_thread(open, file_path, "rb")
+            try:
+                result = await self.document_service.process_document(
+                    upload, job["filename"], job["content_type"], job["source_language"], file_path=str(file_path),
+                )
+            finally:
+                upload.close()
+            await asyncio.to_thread(self.store.update, job_id, status="succeeded", result=result, error=None)
+        except Exception as e:
+            logger.exception("Job %s failed: %s", job_id, e)
+            await asyncio.to_thread(self.store.update, job_id, status="failed", error=str(e))
+        await asyncio.to_thread(shutil.rmtree, file_path.parent, True)
+
+        if job["callback_url"]:
+            await self._deliver_callback(job_id, job["callback_url"])
+
+    async def _deliver_callback(self, job_id: str, callback_url: str) -> None:
+        payload = self._public(await asyncio.to_thread(self.store.get, job_id))
+        # Fresh breaker per delivery: callbacks go to arbitrary client URLs
+        breaker = CircuitBreaker(f"callback {job_id}", failure_threshold=self.callback_retry.max_attempts)
+        try:
+            # Checked again here: the settings may have changed since the job
+            # was queued, and a public name may resolve to an internal address
+            self.check_callback_url(callback_url)
+            host = urlparse(callback_url).hostname
+            if not self.callback_allowed_hosts and await asyncio.to_thread(_resolves_internal, host):
+                raise ValueError(f"callback host {host} resolves to an internal address")
+            await call_with_resilience(lambda: post_json(callback_url, json_payload=payload, timeout_seconds=30.0), self.callback_retry, breaker)
+            callback_status = "delivered"
+        except Exception as e:
+            logger.warning("Callback for job %s to %s failed: %s", job_id, callback_url, e)
+            callback_status = "failed"
+        await asyncio.to_thread(self.store.update, job_id, callback_status=callback_status)
+
+    async def stats(self) -> Dict[str, Any]:
+        counts = await asyncio.to_thread(self.store.counts) if self.store else {}
+        return {
+            "workers": self.workers,
+            "running": self.running,
+            "queued": self._queue.qsize(),
+            "max_queued": self.max_queued,
+            "by_status": counts,
+        }
@@ -1,37 +1,169 @@
-import logging
-from typing import Any, Dict, Optional
-import httpx
-
-logger = logging.getLogger(__name__)
-
-
-class RemoteServiceError(Exception):
-    pass
-
-
-async def post_json(url: str, json_payload: Optional[Dict[str, Any]] = None, files: Optional[Dict] = None, timeout_seconds: float = 60.0) -> Dict[str, Any]:
-    timeout = httpx.Timeout(timeout_seconds, read=timeout_seconds)
-    async with httpx.AsyncClient(timeout=timeout) as client:
-        try:
-            if files:
-                resp = await client.post(url, files=files)
-            else:
-                resp = await client.post(url, json=json_payload)
-        except httpx.ReadTimeout as e:
-            logger.exception("ReadTimeout while calling %s", url)
-            raise RemoteServiceError(f"readtimeout: {e}") from e
-        except httpx.RequestError as e:
-            logger.exception("RequestError while calling %s", url)
-            raise RemoteServiceError(f"requesterror: {e}") from e
-
-        try:
-            body = resp.json()
-        except Exception:
-            body = {"text": resp.text}
-
-        if resp.status_code >= 400:
-            logger.error("Remote service %s returned status %s body=%s", url, resp.status_code, body)
-            raise RemoteServiceError(f"status={resp.status_code} body={body}")
-
-        return body
-
+import asyncio
+import json
+import logging
+from typing import Any, AsyncIterator, BinaryIO, Dict, Optional
+import httpx
+
+from utils.settings import get_env, get_int_env, get_float_env
+
+logger = logging.getLogger(__name__)
+
+
+class RemoteServiceError(Exception):
+    """
+    A downstream call failed. `kind` is "connect" (the request never reached
+    the service), "timeout" (it may still be running there), "request" (any
+    other transport error) or "status" (the service answered >= 400).
+    """
+
+    def __init__(self, message: str, kind: str = "request", status_code: Optional[int] = None, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.kind = kind
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+def _retry_after(resp: httpx.Response) -> Optional[float]:
+    try:
+        return float(resp.headers["Retry-After"])
+    except (KeyError, ValueError):
+        return None
+
+
+# One application-scoped client per process, created in the FastAPI lifespan,
+# so every downstream call reuses pooled keep-alive connections.
+_client: Optional[httpx.AsyncClient] = None
+_stats = {"requests": 0, "connections_opened": 0, "http2": False}
+
+
+def _http2_enabled() -> bool:
+    if (get_env("HTTP2_ENABLED", "false") or "").lower() not in ("1", "true", "yes"):
+        return False
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        logger.warning("HTTP2_ENABLED is set but the 'h2' package is not installed; using HTTP/1.1")
+        return False
+    return True
+
+
+def _build_client() -> httpx.AsyncClient:
+    limits = httpx.Limits(
+        max_connections=get_int_env("HTTP_MAX_CONNECTIONS", 100),
+        max_keepalive_connections=get_int_env("HTTP_MAX_KEEPALIVE_CONNECTIONS", 20),
+        keepalive_expiry=get_float_env("HTTP_KEEPALIVE_EXPIRY_SECONDS", 60.0),
+    )
+    _stats["http2"] = _http2_enabled()
+    return httpx.AsyncClient(limits=limits, http2=_stats["http2"], timeout=httpx.Timeout(60.0))
+
+
+async def start_client() -> httpx.AsyncClient:
+    global _client
+    if _client is None:
+        _client = _build_client()
+    return _client
+
+
+async def close_client() -> None:
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+def get_client() -> httpx.AsyncClient:
+    """The shared client; created on first use when no lifespan started it (scripts, tests)."""
+    global _client
+    if _client is None:
+        _client = _build_client()
+    return _client
+
+
+async def _trace(event_name: str, info: Dict[str, Any]) -> None:
+    if event_name == "connection.connect_tcp.complete":
+        _stats["connections_opened"] += 1
+
+
+def connection_stats() -> Dict[str, Any]:
+    requests = _stats["requests"]
+    opened = _stats["connections_opened"]
+    return {
+        "requests": requests,
+        "connections_opened": opened,
+        "connection_reuse_ratio": round(1 - opened / requests, 3) if requests else None,
+        "http2": _stats["http2"],
+    }
+
+
+async def iter_file(fileobj: BinaryIO, chunk_size: int = 64 * 1024) -> AsyncIterator[bytes]:
+    """Read a (possibly disk-backed) file in chunks off the event loop, for streaming request bodies."""
+    while True:
+        chunk = await asyncio.to_thread(fileobj.read, chunk_size)
+        if not chunk:
+            break
+        yield chunk
+
+
+async def request(method: str, url: str, timeout_seconds: float = 60.0, **kwargs: Any) -> httpx.Response:
+    """Send a request on the shared client, counting new connections for connection_stats."""
+    _stats["requests"] += 1
+    timeout = httpx.Timeout(timeout_seconds, read=timeout_seconds)
+    return await get_client().request(method, url, timeout=timeout, extensions={"trace": _trace}, **kwargs)
+
+
+async def post_json(url: str, json_payload: Optional[Dict[str, Any]] = None, files: Optional[Dict] = None, timeout_seconds: float = 60.0, **kwargs: Any) -> Dict[str, Any]:
+    """POST json_payload (or multipart files, or a raw `content` body via kwargs) and return the JSON reply."""
+    try:
+        if files:
+            resp = await request("POST", url, timeout_seconds=timeout_seconds, files=files, **kwargs)
+        elif json_payload is not None:
+            resp = await request("POST", url, timeout_seconds=timeout_seconds, json=json_payload, **kwargs)
+        else:
+            resp = await request("POST", url, timeout_seconds=timeout_seconds, **kwargs)
+    except (httpx.ConnectError, httpx.ConnectTimeout) as e:
+        logger.exception("ConnectError while calling %s", url)
+        raise RemoteServiceError(f"connecterror: {e}", kind="connect") from e
+    except httpx.TimeoutException as e:
+        logger.exception("Timeout while calling %s", url)
+        raise RemoteServiceError(f"readtimeout: {e}", kind="timeout") from e
+    except httpx.RequestError as e:
+        logger.exception("RequestError while calling %s", url)
+        raise RemoteServiceError(f"requesterror: {e}") from e
+
+    try:
+        body = resp.json()
+    except Exception:
+        body = {"text": resp.text}
+
+    if resp.status_code >= 400:
+        logger.error("Remote service %s returned status %s body=%s", url, resp.status_code, body)
+        raise RemoteServiceError(f"status={resp.status_code} body={body}", kind="status", status_code=resp.status_code, retry_after=_retry_after(resp))
+
+    return body
+
+
+async def stream_json_lines(url: str, timeout_seconds: float = 60.0, **kwargs: Any) -> AsyncIterator[Dict[str, Any]]:
+    """
+    POST to an NDJSON endpoint and yield each line as it arrives. The timeout
+    applies between chunks, so long streams are fine as long as they progress.
+    """
+    _stats["requests"] += 1
+    timeout = httpx.Timeout(timeout_seconds, read=timeout_seconds)
+    try:
+        async with get_client().stream("POST", url, timeout=timeout, extensions={"trace": _trace}, **kwargs) as resp:
+            if resp.status_code >= 400:
+                body = (await resp.aread()).decode("utf-8", "replace")
+                logger.error("Remote service %s returned status %s body=%s", url, resp.status_code, body)
+                raise RemoteServiceError(f"status={resp.status_code} body={body}", kind="status", status_code=resp.status_code, retry_after=_retry_after(resp))
+            async for line in resp.aiter_lines():
+                if line.strip():
+                    yield json.loads(line)
+    except (httpx.ConnectError, httpx.ConnectTimeout) as e:
+        logger.exception("ConnectError while calling %s", url)
+        raise RemoteServiceError(f"connecterror: {e}", kind="connect") from e
+    except httpx.TimeoutException as e:
+        logger.exception("Timeout while calling %s", url)
+        raise RemoteServiceError(f"readtimeout: {e}", kind="timeout") from e
+    except httpx.RequestError as e:
+        logger.exception("RequestError while calling %s", url)
+        raise RemoteServiceError(f"requesterror: {e}") from e
@@ -0,0 +1,143 @@
+import asyncio
+import logging
+import random
+import time
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, FrozenSet, TypeVar
+
+from utils.http import RemoteServiceError
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class CircuitOpenError(RemoteServiceError):
+    """Raised without calling the service while its circuit breaker is open."""
+
+    def __init__(self, service: str, retry_after: float):
+        super().__init__(f"{service} circuit open; retry in {retry_after:.0f}s", kind="circuit_open", retry_after=retry_after)
+        self.service = service
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    """
+    When and how long to wait before retrying a downstream call.
+
+    Connection failures are always safe to retry: the request never reached
+    the service. Timeouts are only retried when `retry_on_timeout` is set,
+    because the service may still be working on (and paying for) the first
+    attempt. Delays use decorrelated jitter: each one is drawn from
+    [base_delay, 3 * previous delay] and capped at max_delay.
+    """
+
+    max_attempts: int = 3
+    base_delay: float = 0.5
+    max_delay: float = 10.0
+    retry_on_timeout: bool = True
+    retry_statuses: FrozenSet[int] = frozenset({502, 503, 504})
+
+    def should_retry(self, error: RemoteServiceError) -> bool:
+        if error.kind == "connect":
+            return True
+        if error.kind == "timeout":
+            return self.retry_on_timeout
+        if error.kind == "status":
+            return error.status_code in self.retry_statuses
+        return False
+
+    def next_delay(self, previous: float) -> float:
+        return min(self.max_delay, random.uniform(self.base_delay, max(self.base_delay, previous * 3)))
+
+
+class CircuitBreaker:
+    """
+    Per-service circuit breaker.
+
+    - closed: calls go through; `failure_threshold` consecutive failures open it
+    - open: calls fail fast with CircuitOpenError for `reset_timeout` seconds
+    - half_open: one probe call is let through; success closes the circuit,
+      failure opens it again
+    """
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.name = name
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probe_in_flight = False
+        self.counters = {"opened": 0, "rejected": 0}
+
+    def before_call(self) -> None:
+        if self.state == "open":
+            remaining = self.opened_at + self.reset_timeout - time.monotonic()
+            if remaining > 0:
+                self.counters["rejected"] += 1
+                raise CircuitOpenError(self.name, remaining)
+            self.state = "half_open"
+        if self.state == "half_open":
+            if self._probe_in_flight:
+                self.counters["rejected"] += 1
+                raise CircuitOpenError(self.name, self.reset_timeout)
+            self._probe_in_flight = True
+
+    def record_success(self) -> None:
+        self.state = "closed"
+        self.failures = 0
+        self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        self._probe_in_flight = False
+        self.failures += 1
+        if self.state == "half_open" or self.failures >= self.failure_threshold:
+            if self.state != "open":
+                logger.warning("Opening circuit for %s after %s failures", self.name, self.failures)
+                self.counters["opened"] += 1
+            self.state = "open"
+            self.opened_at = time.monotonic()
+
+    def release(self) -> None:
+        """End a call that says nothing about the service's health (e.g. a 4xx)."""
+        self._probe_in_flight = False
+
+    def stats(self) -> Dict[str, Any]:
+        return {"state": self.state, "consecutive_failures": self.failures, **self.counters}
+
+
+def _is_service_failure(error: RemoteServiceError) -> bool:
+    # 4xx answers mean the service is up and rejected this particular request
+    return error.kind != "status" or error.status_code is None or error.status_code >= 500 or error.status_code == 429
+
+
+async def call_with_resilience(call: Callable[[], Awaitable[T]], policy: RetryPolicy, breaker: CircuitBreaker) -> T:
+    """
+    Run `call` under `breaker`, retrying per `policy`. A Retry-After header
+    on the failed response is honoured when it asks for a longer wait.
+    """
+    delay = policy.base_delay
+    attempt = 1
+    while True:
+        breaker.before_call()
+        try:
+            result = await call()
+        except RemoteServiceError as e:
+            if _is_service_failure(e):
+                breaker.record_failure()
+            else:
+                breaker.release()
+            if attempt >= policy.max_attempts or not policy.should_retry(e):
+                raise
+            delay = policy.next_delay(delay)
+            wait = max(delay, min(e.retry_after or 0.0, policy.max_delay))
+            logger.warning("%s attempt %s/%s failed (%s); retrying in %.2fs", breaker.name, attempt, policy.max_attempts, e, wait)
+            await asyncio.sleep(wait)
+            attempt += 1
+            continue
+        except BaseException:
+            breaker.release()
+            raise
+        breaker.record_success()
+        return result